@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Header, Query, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import asyncio
+
+# Import profiling support
+from ..profiling import SamplingProfiler, get_profile, profiling_authorized
+
+router = APIRouter()
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """
+    Require X-Admin-Token to match PROFILING_TOKEN; refused if no token is configured
+    """
+    if not profiling_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100)
+):
+    """
+    Sample every thread of the running app for a fixed duration and return folded stacks
+    """
+    profiler = SamplingProfiler(interval=interval_ms / 1000)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        folded = profiler.stop()
+    return PlainTextResponse(folded)
+
+@router.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def get_request_profile(profile_id: str):
+    """
+    Fetch the folded stacks captured for a single profiled request
+    """
+    folded = get_profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
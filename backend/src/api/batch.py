@@ -0,0 +1,271 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Set
+import asyncio
+import logging
+import os
+from sqlalchemy.orm import Session
+
+# Import models and services
+from ..models.project import Project
+from ..models.character import Character
+from ..models.product import Product
+from ..models.background import Background
+from ..models.story import Story
+from ..services.gemini_service import GeminiService
+from ..database import get_db, get_project, session_for_scope
+from ..metrics import GENERATION_QUEUE_DEPTH
+from ..profiling import run_in_threadpool
+from ..responses import json_dumps
+from ..tracing import tracer
+from .generate import GeneratedImage, GenerateRequest, load_component_image, resolve_styles, store_generated_image
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Server-side limits for a single batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+class BatchItem(BaseModel):
+    name: Optional[str] = None
+    story_text: Optional[str] = None
+    product_id: Optional[str] = None
+
+class BatchRequest(GenerateRequest):
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    project_id: Optional[str] = None
+    status: str
+    images: List[GeneratedImage] = []
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    source_project_id: str
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
+
+class BatchComponents(NamedTuple):
+    character: Optional[Character]
+    background: Optional[Background]
+    source_product: Optional[Product]
+    source_story: Optional[Story]
+    products: Dict[str, Product]
+
+def load_batch_components(db: Session, project_id: str, product_ids: Set[str]) -> BatchComponents:
+    """
+    Load the source project's components and the item products it owns
+
+    Products of other projects are left out, so they are reported as unknown.
+    """
+    with tracer.start_as_current_span("db.load_components"):
+        character = db.query(Character).filter(Character.project_id == project_id).first()
+        background = db.query(Background).filter(Background.project_id == project_id).first()
+        source_product = db.query(Product).filter(Product.project_id == project_id).first()
+        source_story = db.query(Story).filter(Story.project_id == project_id).first()
+
+        products: Dict[str, Product] = {}
+        if product_ids:
+            products = {
+                str(product.id): product
+                for product in db.query(Product).filter(
+                    Product.project_id == project_id, Product.id.in_(product_ids)
+                ).all()
+            }
+    return BatchComponents(character, background, source_product, source_story, products)
+
+def create_item_project(db: Session, name: str, character: Character, background: Background,
+                        product: Product, story_text: str) -> str:
+    """
+    Create a project for one batch item holding copies of the shared components
+
+    Everything is committed in one transaction, so a failure part way
+    through leaves no half-built project behind.
+    """
+    try:
+        project = Project(name=name)
+        db.add(project)
+        db.flush()
+        db.add_all([
+            Character(project_id=project.id, details=character.details, personality=character.personality,
+                      image_url=character.image_url),
+            Background(project_id=project.id, scene_details=background.scene_details, lighting=background.lighting,
+                       image_url=background.image_url),
+            Product(project_id=project.id, name=product.name, description=product.description,
+                    image_url=product.image_url, cutout_url=product.cutout_url),
+            Story(project_id=project.id, story_text=story_text),
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return str(project.id)
+
+@router.post(
+    "/projects/{project_id}/batch",
+    response_model=BatchResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def generate_batch(
+    project_id: str,
+    batch: BatchRequest,
+    request: Request,
+    stream: Optional[str] = Query(None, pattern="^ndjson$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate final images for many story and/or product variants of a project
+
+    Each item becomes its own project that reuses the source project's
+    character and background (and product and story unless the item
+    overrides them). Inputs are decoded once for the whole batch and fusions
+    run through one shared service with bounded concurrency. Variations,
+    styles and mode apply to every item as in a single generate call.
+    Failures are reported per item.
+
+    With ``stream=ndjson`` each item's result is sent as soon as it
+    finishes, followed by a summary, instead of holding the response until
+    the whole batch is done.
+    """
+    if not 1 <= len(batch.items) <= BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"A batch must contain between 1 and {BATCH_MAX_ITEMS} items")
+    styles, draft = resolve_styles(batch)
+
+    # Check if project exists
+    project = await run_in_threadpool(get_project, db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    product_ids = {item.product_id for item in batch.items if item.product_id}
+    character, background, source_product, source_story, products = await run_in_threadpool(
+        load_batch_components, db, project_id, product_ids
+    )
+
+    # Check that every item has all of its components
+    missing_components = []
+    if not character: missing_components.append("character")
+    if not background: missing_components.append("background")
+    if not source_product and any(not item.product_id for item in batch.items): missing_components.append("product")
+    if not source_story and any(not (item.story_text or "").strip() for item in batch.items): missing_components.append("story")
+    if missing_components:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required components: {', '.join(missing_components)}. Create them on the project or set them on every item."
+        )
+
+    unknown_products = sorted(product_ids - products.keys())
+    if unknown_products:
+        raise HTTPException(status_code=422, detail=f"Unknown product ids for this project: {', '.join(unknown_products)}")
+
+    # Decode shared inputs once for the whole batch
+    gemini_service = GeminiService()
+    if source_product is not None:
+        products.setdefault(str(source_product.id), source_product)
+
+    def decode_inputs():
+        character_png, background_png = gemini_service.decode_images(
+            load_component_image(character.image_url, "character"),
+            load_component_image(background.image_url, "background"),
+        )
+        # Prefer the transparent cutout made at upload time
+        product_images = {
+            key: gemini_service.decode_images(load_component_image(product.cutout_url or product.image_url, "product"))[0]
+            for key, product in products.items()
+        }
+        return character_png, background_png, product_images
+
+    try:
+        character_png, background_png, product_images = await run_in_threadpool(decode_inputs)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading batch inputs: {str(e)}")
+
+    concurrency = max(1, min(batch.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    # Each item writes through its own session, opened in the threadpool; the
+    # writes still go one at a time since SQLite allows a single writer
+    db_lock = asyncio.Lock()
+
+    def create_project_for(name: str, product: Product, story_text: str) -> str:
+        with session_for_scope(request.scope) as item_db:
+            return create_item_project(item_db, name, character, background, product, story_text)
+
+    def store_images(item_project_id: str, fused_images: List[dict]) -> List[GeneratedImage]:
+        with session_for_scope(request.scope) as item_db:
+            return [store_generated_image(item_db, item_project_id, img) for img in fused_images]
+
+    async def run_item(index: int, item: BatchItem) -> BatchItemResult:
+        product_key = item.product_id or str(source_product.id)
+        story_text = (item.story_text or "").strip() or source_story.story_text
+        item_project_id = None
+        try:
+            async with db_lock:
+                item_project_id = await run_in_threadpool(
+                    create_project_for, item.name or f"{project.name} #{index + 1}", products[product_key], story_text
+                )
+            async with semaphore:
+                with GENERATION_QUEUE_DEPTH.track_inprogress():
+                    fused_images = await run_in_threadpool(
+                        lambda: list(gemini_service.iter_fused_images(
+                            character_png, product_images[product_key], background_png, story_text, styles, draft
+                        ))
+                    )
+
+            for img in fused_images:
+                img.pop("image_data", None)
+            async with db_lock:
+                images = await run_in_threadpool(store_images, item_project_id, fused_images)
+            if not any("error" not in img for img in fused_images):
+                error = next((img["error"] for img in fused_images if "error" in img), "Failed to generate fused images")
+                return BatchItemResult(index=index, project_id=item_project_id, status="failed", images=images, error=error)
+            return BatchItemResult(index=index, project_id=item_project_id, status="succeeded", images=images)
+        except Exception as e:
+            logger.error("Batch item failed", extra={"project_id": project_id, "item": index}, exc_info=True)
+            return BatchItemResult(index=index, project_id=item_project_id, status="failed", error=str(e))
+
+    def log_finished(results: List[BatchItemResult]) -> int:
+        succeeded = sum(1 for result in results if result.status == "succeeded")
+        logger.info("Batch generation finished", extra={
+            "project_id": project_id, "items": len(results), "succeeded": succeeded, "concurrency": concurrency
+        })
+        return succeeded
+
+    if stream:
+        async def ndjson_results() -> AsyncIterator[bytes]:
+            results = []
+            tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(batch.items)]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    result = await finished
+                    results.append(result)
+                    yield json_dumps({"type": "item", **result.model_dump()}) + b"\n"
+            finally:
+                # The client went away or the stream was closed; stop the remaining items
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            succeeded = log_finished(results)
+            yield json_dumps({
+                "type": "done", "source_project_id": project_id,
+                "succeeded": succeeded, "failed": len(results) - succeeded,
+            }) + b"\n"
+
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(ndjson_results(), media_type="application/x-ndjson", headers=headers)
+
+    results = await asyncio.gather(*(run_item(index, item) for index, item in enumerate(batch.items)))
+    succeeded = log_finished(results)
+
+    return BatchResponse(
+        source_project_id=project_id,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        items=list(results)
+    )
@@ -1,196 +1,332 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Tuple
+import asyncio
 import uuid
 import base64
-from pathlib import Path
+import logging
+import os
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
 # Import models and services
-from ..models.image import Image
-from ..models.character import Character
-from ..models.product import Product
-from ..models.background import Background
-from ..models.story import Story
-from ..services.gemini_service import GeminiService
-from ..database import get_db, save_image, get_project
+from ..services.gemini_service import FUSION_STYLES, GeminiService
+from ..services.previews import preview_broker, preview_event
+from ..database import get_db, save_image, get_project, get_project_snapshot
+from ..metrics import GENERATION_QUEUE_DEPTH
+from ..profiling import profiled_iterator, run_in_threadpool
+from ..responses import json_dumps
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Comment lines keep idle preview streams open through proxies
+SSE_KEEPALIVE_SECONDS = 15
+
+# Server-side limits on what a single generate call may ask for
+MAX_VARIATIONS = int(os.getenv("MAX_VARIATIONS", "4"))
+MAX_STYLE_LENGTH = 200
+
+class GenerateRequest(BaseModel):
+    variations: Optional[int] = None
+    styles: Optional[List[str]] = None
+    mode: Literal["full", "draft"] = "full"
+
 class GeneratedImage(BaseModel):
     id: str
     prompt: str
     image_url: str
     fusion_style: Optional[str] = None
+    prompt_template_id: Optional[str] = None
+    draft: bool = False
 
 class GenerateResponse(BaseModel):
     images: List[GeneratedImage]
 
-@router.post("/projects/{project_id}/generate", response_model=GenerateResponse)
-async def generate_images(project_id: str, db: Session = Depends(get_db)):
-    """
-    Generate final fused images combining character, product, background, and story
+def load_component_image(image_url: str, component: str) -> bytes:
     """
-    # Check if project exists
-    project = get_project(db, project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    try:
-        # Retrieve project components from database
-        character = db.query(Character).filter(Character.project_id == project_id).first()
-        product = db.query(Product).filter(Product.project_id == project_id).first()
-        background = db.query(Background).filter(Background.project_id == project_id).first()
-        story = db.query(Story).filter(Story.project_id == project_id).first()
-
-        # Check if all required components exist
-        if not all([character, product, background, story]):
-            missing_components = []
-            if not character: missing_components.append("character")
-            if not product: missing_components.append("product")
-            if not background: missing_components.append("background")
-            if not story: missing_components.append("story")
-
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required components: {', '.join(missing_components)}. Please ensure all components are created first."
-            )
+    Resolve a component image URL to raw image bytes
 
-        # Prepare image data for fusion
-        character_image_data = None
-        product_image_data = None
-        background_image_data = None
+    Args:
+        image_url: Stored URL (data URI, static /uploads path, mock path or file path)
+        component: Component name ('character', 'product', 'background')
 
-        # Handle character image
-        if character.image_url.startswith('data:'):
+    Returns:
+        Binary image data, or placeholder data for mock images
+    """
+    with tracer.start_as_current_span("storage.read_image", attributes={"image.component": component}):
+        if image_url.startswith('data:'):
             # Base64 encoded image
-            header, encoded = character.image_url.split(',', 1)
-            character_image_data = base64.b64decode(encoded)
-        elif character.image_url.startswith('/mock-images/') or character.image_url.startswith('generated_') or character.image_url.startswith('/uploads/'):
-            # Mock or static file URL - read from the actual file path or use placeholder data
-            if character.image_url.startswith('/uploads/'):
-                actual_path = character.image_url.replace('/uploads/', 'uploads/')
-                try:
-                    with open(actual_path, "rb") as f:
-                        character_image_data = f.read()
-                    print(f"ℹ️  Read character image from file: {character.image_url}")
-                except FileNotFoundError:
-                    # If file doesn't exist, use placeholder data
-                    character_image_data = b"mock_character_image_data"
-                    print(f"ℹ️  Using mock character image data for: {character.image_url}")
-            else:
-                # Mock image - create placeholder data
-                character_image_data = b"mock_character_image_data"
-                print(f"ℹ️  Using mock character image data for: {character.image_url}")
-        else:
-            # File path
-            try:
-                with open(character.image_url, "rb") as f:
-                    character_image_data = f.read()
-            except FileNotFoundError:
-                raise HTTPException(status_code=404, detail="Character image file not found")
+            header, encoded = image_url.split(',', 1)
+            return base64.b64decode(encoded)
 
-        # Handle product image
-        if product.image_url.startswith('data:'):
-            # Base64 encoded image
-            header, encoded = product.image_url.split(',', 1)
-            product_image_data = base64.b64decode(encoded)
-        elif product.image_url.startswith('/mock-images/') or product.image_url.startswith('generated_') or product.image_url.startswith('/uploads/'):
+        if image_url.startswith('/mock-images/') or image_url.startswith('generated_') or image_url.startswith('/uploads/'):
             # Mock or static file URL - read from the actual file path or use placeholder data
-            if product.image_url.startswith('/uploads/'):
-                actual_path = product.image_url.replace('/uploads/', 'uploads/')
+            if image_url.startswith('/uploads/'):
+                actual_path = image_url.replace('/uploads/', 'uploads/')
                 try:
                     with open(actual_path, "rb") as f:
-                        product_image_data = f.read()
-                    print(f"ℹ️  Read product image from file: {product.image_url}")
+                        image_data = f.read()
+                    logger.debug("Read component image from file", extra={"component": component, "image_url": image_url})
+                    return image_data
                 except FileNotFoundError:
-                    # If file doesn't exist, use placeholder data
-                    product_image_data = b"mock_product_image_data"
-                    print(f"ℹ️  Using mock product image data for: {product.image_url}")
-            else:
-                # Mock image - create placeholder data
-                product_image_data = b"mock_product_image_data"
-                print(f"ℹ️  Using mock product image data for: {product.image_url}")
-        else:
-            # File path
-            try:
-                with open(product.image_url, "rb") as f:
-                    product_image_data = f.read()
-            except FileNotFoundError:
-                raise HTTPException(status_code=404, detail="Product image file not found")
+                    # If file doesn't exist, fall through to placeholder data
+                    pass
+            # Mock image - create placeholder data
+            logger.info("Using mock component image data", extra={"component": component, "image_url": image_url})
+            return f"mock_{component}_image_data".encode()
 
-        # Handle background image
-        if background.image_url.startswith('data:'):
-            # Base64 encoded image
-            header, encoded = background.image_url.split(',', 1)
-            background_image_data = base64.b64decode(encoded)
-        elif background.image_url.startswith('/mock-images/') or background.image_url.startswith('generated_') or background.image_url.startswith('/uploads/'):
-            # Mock or static file URL - read from the actual file path or use placeholder data
-            if background.image_url.startswith('/uploads/'):
-                actual_path = background.image_url.replace('/uploads/', 'uploads/')
-                try:
-                    with open(actual_path, "rb") as f:
-                        background_image_data = f.read()
-                    print(f"ℹ️  Read background image from file: {background.image_url}")
-                except FileNotFoundError:
-                    # If file doesn't exist, use placeholder data
-                    background_image_data = b"mock_background_image_data"
-                    print(f"ℹ️  Using mock background image data for: {background.image_url}")
-            else:
-                # Mock image - create placeholder data
-                background_image_data = b"mock_background_image_data"
-                print(f"ℹ️  Using mock background image data for: {background.image_url}")
-        else:
-            # File path
-            try:
-                with open(background.image_url, "rb") as f:
-                    background_image_data = f.read()
-            except FileNotFoundError:
-                raise HTTPException(status_code=404, detail="Background image file not found")
+        # File path
+        try:
+            with open(image_url, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"{component.capitalize()} image file not found")
 
-        # Initialize Gemini service
-        gemini_service = GeminiService()
+def load_fusion_inputs(db: Session, project_id: str) -> Tuple[bytes, bytes, bytes, str]:
+    """
+    Load the character, product and background images plus story text for fusion
+
+    Raises:
+        HTTPException: 400 listing any components the project is missing
+    """
+    with tracer.start_as_current_span("db.load_components"):
+        snapshot = get_project_snapshot(db, project_id)
 
-        # Generate fused images
-        fused_images = gemini_service.generate_final_images(
-            character_image_data=character_image_data,
-            product_image_data=product_image_data,
-            background_image_data=background_image_data,
-            story=story.story_text
+    # Check if all required components exist
+    missing_components = []
+    if not snapshot or not snapshot.character_image_url: missing_components.append("character")
+    if not snapshot or not snapshot.product_image_url: missing_components.append("product")
+    if not snapshot or not snapshot.background_image_url: missing_components.append("background")
+    if not snapshot or not snapshot.story_text: missing_components.append("story")
+    if missing_components:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required components: {', '.join(missing_components)}. Please ensure all components are created first."
         )
 
-        if not fused_images:
-            raise HTTPException(status_code=500, detail="Failed to generate fused images")
-
-        # Convert to response format and save to database
-        images = []
-        for img in fused_images:
-            image_id = str(uuid.uuid4())
-            image_url = img.get("image_url", "")
-            prompt = img.get("prompt", "")
-            fusion_style = img.get("fusion_style")
-
-            # Save generated image to database
-            db_image = save_image(
-                db=db,
-                project_id=project_id,
-                prompt=prompt,
-                image_url=image_url,
-                image_type="final",
-                fusion_style=fusion_style
+    # Prepare image data for fusion
+    return (
+        load_component_image(snapshot.character_image_url, "character"),
+        # Prefer the transparent cutout made at upload time
+        load_component_image(snapshot.product_cutout_url or snapshot.product_image_url, "product"),
+        load_component_image(snapshot.background_image_url, "background"),
+        snapshot.story_text,
+    )
+
+def resolve_styles(options: Optional[GenerateRequest]) -> Tuple[List[str], bool]:
+    """
+    Work out the fusion style for each variation and whether this is a draft
+
+    Styles are cycled when more variations than styles are requested. Draft
+    mode always produces a single variation using the first style.
+
+    Raises:
+        HTTPException: 422 when the request exceeds server limits
+    """
+    options = options or GenerateRequest()
+    styles = [style.strip() for style in options.styles or [] if style.strip()] or FUSION_STYLES
+    if any(len(style) > MAX_STYLE_LENGTH for style in styles):
+        raise HTTPException(status_code=422, detail=f"Fusion styles are limited to {MAX_STYLE_LENGTH} characters")
+
+    draft = options.mode == "draft"
+    count = 1 if draft else (options.variations if options.variations is not None else len(styles))
+    if not 1 <= count <= MAX_VARIATIONS:
+        raise HTTPException(status_code=422, detail=f"Between 1 and {MAX_VARIATIONS} variations can be generated per call")
+
+    return [styles[i % len(styles)] for i in range(count)], draft
+
+def store_generated_image(db: Session, project_id: str, img: dict) -> GeneratedImage:
+    """
+    Save a generated image row and convert it to the response format
+    """
+    image_url = img.get("image_url", "")
+    prompt = img.get("prompt", "")
+    fusion_style = img.get("fusion_style")
+    prompt_template_id = img.get("prompt_template_id")
+    draft = img.get("draft", False)
+
+    db_image = save_image(
+        db=db,
+        project_id=project_id,
+        prompt=prompt,
+        image_url=image_url,
+        image_type="draft" if draft else "final",
+        fusion_style=fusion_style,
+        prompt_template_id=prompt_template_id
+    )
+
+    return GeneratedImage(
+        id=str(db_image.id),  # Convert to string for API response
+        prompt=prompt,
+        image_url=image_url,
+        fusion_style=fusion_style,
+        prompt_template_id=prompt_template_id,
+        draft=draft
+    )
+
+def stream_events(db: Session, project_id: str, inputs: Tuple[bytes, bytes, bytes, str],
+                  styles: Optional[List[str]] = None, draft: bool = False) -> Iterator[Tuple[dict, Optional[bytes]]]:
+    """
+    Generate and save final images, yielding (event, image bytes) as each variation completes
+
+    Image events carry the saved image metadata plus its index; the stream
+    always ends with a "done" event or an "error" event. Every event, and a
+    blurred preview frame up front, is also published to the project's
+    preview subscribers.
+    """
+    count = 0
+    try:
+        if preview_broker.has_subscribers(project_id):
+            event = preview_event(*inputs[:3])
+            if event is not None:
+                preview_broker.publish(project_id, event)
+
+        gemini_service = GeminiService()
+        with GENERATION_QUEUE_DEPTH.track_inprogress():
+            for img in gemini_service.iter_final_images(*inputs, styles=styles, draft=draft):
+                image_data = img.pop("image_data", None)
+                event = {"type": "image", "index": count, **store_generated_image(db, project_id, img).model_dump()}
+                if "error" in img:
+                    event["error"] = img["error"]
+                count += 1
+                preview_broker.publish(project_id, event)
+                yield event, image_data
+    except GeneratorExit:
+        # Streaming client went away; release anyone watching the previews
+        preview_broker.publish(project_id, {"type": "error", "detail": "Generation cancelled"})
+        raise
+    except Exception as e:
+        logger.error("Error generating images", extra={"project_id": project_id}, exc_info=True)
+        event = {"type": "error", "detail": f"Error generating images: {str(e)}"}
+    else:
+        if count:
+            event = {"type": "done", "count": count}
+        else:
+            event = {"type": "error", "detail": "Failed to generate fused images"}
+
+    preview_broker.publish(project_id, event)
+    yield event, None
+
+def ndjson_stream(events: Iterator[Tuple[dict, Optional[bytes]]]) -> Iterator[bytes]:
+    """
+    Encode events as newline-delimited JSON with image bytes inlined as base64
+    """
+    for event, image_data in events:
+        if image_data is not None:
+            event = {**event, "content_type": "image/png", "data": base64.b64encode(image_data).decode("ascii")}
+        yield json_dumps(event) + b"\n"
+
+def multipart_stream(events: Iterator[Tuple[dict, Optional[bytes]]], boundary: str) -> Iterator[bytes]:
+    """
+    Encode events as multipart/mixed: a JSON part per event, followed by a
+    binary image/png part (Content-ID = image id) for each generated image
+    """
+    delimiter = f"--{boundary}\r\n".encode()
+    for event, image_data in events:
+        body = json_dumps(event)
+        yield delimiter + b"Content-Type: application/json\r\n\r\n" + body + b"\r\n"
+        if image_data is not None:
+            headers = f"Content-Type: image/png\r\nContent-ID: <{event['id']}>\r\nContent-Length: {len(image_data)}\r\n\r\n"
+            yield delimiter + headers.encode() + image_data + b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+@router.post(
+    "/projects/{project_id}/generate",
+    response_model=GenerateResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "multipart/mixed": {}}}},
+)
+async def generate_images(
+    project_id: str,
+    options: Optional[GenerateRequest] = None,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|multipart)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate final fused images combining character, product, background, and story
+
+    The optional body picks the number of variations and their fusion
+    styles, or ``mode: draft`` for one quick low-resolution variation.
+
+    With ``stream=ndjson`` or ``stream=multipart`` each variation is sent,
+    image bytes included, as soon as it is generated instead of returning
+    URLs once all variations are done.
+    """
+    styles, draft = resolve_styles(options)
+
+    # Check if project exists
+    project = get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        # Retrieve project components from database and read their images
+        # off the event loop
+        inputs = await run_in_threadpool(load_fusion_inputs, db, project_id)
+
+        if stream:
+            # Sync generators are iterated in the threadpool, one variation at a time
+            headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            events = profiled_iterator(stream_events(db, project_id, inputs, styles, draft))
+            if stream == "ndjson":
+                return StreamingResponse(ndjson_stream(events), media_type="application/x-ndjson", headers=headers)
+            boundary = uuid.uuid4().hex
+            return StreamingResponse(
+                multipart_stream(events, boundary),
+                media_type=f"multipart/mixed; boundary={boundary}",
+                headers=headers
             )
 
-            images.append(GeneratedImage(
-                id=str(db_image.id),  # Convert to string for API response
-                prompt=prompt,
-                image_url=image_url,
-                fusion_style=fusion_style
-            ))
+        # Generate and save fused images off the event loop so preview
+        # subscribers keep receiving events while this request waits
+        events = await run_in_threadpool(list, stream_events(db, project_id, inputs, styles, draft))
+        final_event = events[-1][0]
+        if final_event["type"] == "error":
+            raise HTTPException(status_code=500, detail=final_event["detail"])
 
+        images = [GeneratedImage(**event) for event, _ in events if event["type"] == "image"]
         return GenerateResponse(images=images)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating images: {str(e)}")
+
+async def sse_stream(project_id: str) -> AsyncIterator[str]:
+    """
+    Relay preview broker events for a project as server-sent events
+
+    Ends after the generation's "done" or "error" event.
+    """
+    queue = preview_broker.subscribe(project_id)
+    try:
+        yield ": subscribed\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json_dumps(event).decode()}\n\n"
+            if event["type"] in ("done", "error"):
+                break
+    finally:
+        preview_broker.unsubscribe(project_id, queue)
+
+@router.get("/projects/{project_id}/previews", responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_previews(project_id: str, db: Session = Depends(get_db)):
+    """
+    Server-sent events for the project's next generation: a blurred preview
+    frame as soon as it starts, each final image as it completes, then done
+    """
+    if not get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return StreamingResponse(
+        sse_stream(project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+# Import database helpers
+from ..database import get_db, get_project, get_image, list_images, select_image, IMAGE_FIELDS, DEFAULT_IMAGE_FIELDS
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..conditional import conditional_response, entity_tag
+
+router = APIRouter()
+
+class ImageListResponse(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+class ImageResponse(BaseModel):
+    id: str
+    project_id: str
+    image_url: str
+    image_type: str
+    fusion_style: Optional[str] = None
+    prompt_template_id: Optional[str] = None
+    prompt: str
+    selected: bool = False
+    retention_tier: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated ``fields`` parameter into image columns
+
+    Raises:
+        HTTPException: 422 if a field is not selectable
+    """
+    if not fields:
+        return list(DEFAULT_IMAGE_FIELDS)
+    selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in IMAGE_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(IMAGE_FIELDS)}"
+        )
+    return selected
+
+def _serialize(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, int):
+        # Ids are exposed as strings, as everywhere else in the API
+        return str(value)
+    return value
+
+def image_response(image) -> ImageResponse:
+    return ImageResponse(
+        id=str(image.id),
+        project_id=str(image.project_id),
+        image_url=image.image_url,
+        image_type=image.image_type,
+        fusion_style=image.fusion_style,
+        prompt_template_id=image.prompt_template_id,
+        prompt=image.prompt,
+        selected=image.selected_at is not None,
+        retention_tier=image.retention_tier,
+        created_at=image.created_at.isoformat(),
+        updated_at=image.updated_at.isoformat()
+    )
+
+@router.get("/projects/{project_id}/images", response_model=ImageListResponse)
+async def get_images(
+    project_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    image_type: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(IMAGE_FIELDS)}"),
+    db: Session = Depends(get_db)
+):
+    """
+    List a project's images, newest first
+
+    Only the requested ``fields`` are read from the database; by default
+    everything except the (potentially long) prompt text. Saving an image
+    moves the project's updated_at, so conditional requests are answered
+    without querying the images.
+    """
+    selected = parse_fields(fields)
+    project = get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    not_modified = conditional_response(
+        request, response,
+        entity_tag("images", project.id, project.updated_at.isoformat(), request.url.query),
+        project.updated_at
+    )
+    if not_modified:
+        return not_modified
+
+    try:
+        rows, next_cursor = list_images(db, project_id, limit, cursor, selected, image_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ImageListResponse(
+        items=[{field: _serialize(value) for field, value in row.items()} for row in rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/projects/{project_id}/images/{image_id}", response_model=ImageResponse)
+async def get_image_detail(project_id: str, image_id: str, request: Request, response: Response,
+                           db: Session = Depends(get_db)):
+    """
+    Get a single image of a project, including its prompt
+    """
+    image = get_image(db, project_id, image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    not_modified = conditional_response(
+        request, response, entity_tag("image", image.id, image.updated_at.isoformat()), image.updated_at
+    )
+    if not_modified:
+        return not_modified
+
+    return image_response(image)
+
+@router.post("/projects/{project_id}/images/{image_id}/select", response_model=ImageResponse)
+async def select_project_image(project_id: str, image_id: str, db: Session = Depends(get_db)):
+    """
+    Mark the variation the user picked
+
+    Selected images keep full retention; the others are downscaled and
+    later archived (see the retention settings).
+    """
+    image = select_image(db, project_id, image_id, selected=True)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_response(image)
+
+@router.delete("/projects/{project_id}/images/{image_id}/select", response_model=ImageResponse)
+async def unselect_project_image(project_id: str, image_id: str, db: Session = Depends(get_db)):
+    """
+    Undo a selection
+    """
+    image = select_image(db, project_id, image_id, selected=False)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_response(image)
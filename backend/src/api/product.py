@@ -10,7 +10,11 @@ from fastapi import Depends
 # Import models and services
 from ..models.product import Product
 from ..services.gemini_service import GeminiService
+from ..services.background_removal import create_cutout, cutout_enabled
+from ..services.image_guard import UnsafeImageError, inspect_image
 from ..database import get_db, save_product, get_project
+from ..metrics import IMAGE_BYTES_SAVED
+from ..profiling import run_in_threadpool
 
 router = APIRouter()
 
@@ -21,6 +25,7 @@ class ProductCreate(BaseModel):
 class ProductResponse(BaseModel):
     id: str
     image_url: str
+    cutout_url: Optional[str] = None
 
 @router.post("/projects/{project_id}/product/generate", response_model=ProductResponse)
 async def generate_product(project_id: str, product: ProductCreate, db: Session = Depends(get_db)):
@@ -90,6 +95,12 @@ async def upload_product(project_id: str, image: UploadFile = File(...), db: Ses
     if len(file_content) > max_size:
         raise HTTPException(status_code=400, detail="File too large. Maximum size: 10MB")
 
+    # Reject undecodable or oversized images (e.g. decompression bombs) from the header alone
+    try:
+        inspect_image(file_content)
+    except UnsafeImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
     try:
         # Generate product ID
         product_id = str(uuid.uuid4())
@@ -105,22 +116,32 @@ async def upload_product(project_id: str, image: UploadFile = File(...), db: Ses
 
         with open(file_path, "wb") as f:
             f.write(file_content)
+        IMAGE_BYTES_SAVED.labels(image_type="product").inc(len(file_content))
 
         # Create image URL for local file
         image_url = f"/uploads/products/{filename}"
 
+        # Separate the product from its backdrop once here rather than in every fusion
+        cutout_url = None
+        if cutout_enabled():
+            cutout_file = await run_in_threadpool(create_cutout, file_path, file_content)
+            if cutout_file is not None:
+                cutout_url = f"/uploads/products/{cutout_file.name}"
+
         # Save product to database
         db_product = save_product(
             db=db,
             project_id=project_id,
             name=image.filename,
             description="Uploaded product image",
-            image_url=image_url
+            image_url=image_url,
+            cutout_url=cutout_url
         )
 
         return ProductResponse(
             id=str(db_product.id),  # Convert to string for API response
-            image_url=image_url
+            image_url=image_url,
+            cutout_url=cutout_url
         )
 
     except Exception as e:
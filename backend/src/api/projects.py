@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 import uuid
 from sqlalchemy.orm import Session
 
 # Import models and database
 from ..models.project import Project
-from ..database import get_db, save_project
+from ..database import get_db, save_project, list_projects, get_project, get_project_components
+from ..conditional import conditional_response, entity_tag
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
@@ -18,6 +20,26 @@ class ProjectResponse(BaseModel):
     name: str
     created_at: str
 
+class ProjectListResponse(BaseModel):
+    items: List[ProjectResponse]
+    next_cursor: Optional[str] = None
+
+class ComponentSummary(BaseModel):
+    id: str
+    image_url: Optional[str] = None
+
+class ProjectDetailResponse(ProjectResponse):
+    character: Optional[ComponentSummary] = None
+    product: Optional[ComponentSummary] = None
+    background: Optional[ComponentSummary] = None
+    story_text: Optional[str] = None
+    image_count: int
+
+def _summary(component) -> Optional[ComponentSummary]:
+    if component is None:
+        return None
+    return ComponentSummary(id=str(component.id), image_url=component.image_url)
+
 @router.post("/projects", response_model=ProjectResponse, status_code=201)
 async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     """
@@ -40,3 +62,60 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating project: {str(e)}")
+
+@router.get("/projects", response_model=ProjectListResponse)
+async def get_projects(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    List projects, newest first
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next page.
+    """
+    try:
+        projects, next_cursor = list_projects(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ProjectListResponse(
+        items=[
+            ProjectResponse(id=str(project.id), name=project.name, created_at=project.created_at.isoformat())
+            for project in projects
+        ],
+        next_cursor=next_cursor
+    )
+
+@router.get("/projects/{project_id}", response_model=ProjectDetailResponse)
+async def get_project_detail(project_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Get a project with a summary of its components
+
+    Conditional requests are answered from the project's cached snapshot
+    without loading its components.
+    """
+    project = get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    not_modified = conditional_response(
+        request, response, entity_tag("project", project.id, project.updated_at.isoformat()), project.updated_at
+    )
+    if not_modified:
+        return not_modified
+
+    components = get_project_components(db, project_id)
+    if not components:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    project = components["project"]
+    return ProjectDetailResponse(
+        id=str(project.id),
+        name=project.name,
+        created_at=project.created_at.isoformat(),
+        character=_summary(components["character"]),
+        product=_summary(components["product"]),
+        background=_summary(components["background"]),
+        story_text=components["story"].story_text if components["story"] else None,
+        image_count=components["image_count"]
+    )
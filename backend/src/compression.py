@@ -0,0 +1,256 @@
+"""
+Response compression negotiated from Accept-Encoding
+
+gzip is always available. brotli (``br``) and zstd come from the ``brotli``
+and ``zstandard`` packages; both are in requirements.txt, and an install
+without them falls back to negotiating gzip only. Among the encodings the
+client accepts with the highest q-value the server prefers zstd, then br,
+then gzip. Levels favour latency over ratio: responses are compressed
+per request, not ahead of time.
+
+Only text-like content types are compressed, and only bodies of at least
+COMPRESSION_MIN_SIZE bytes. Images (already compressed), server-sent events
+(held back by buffering proxies) and multipart image streams pass through
+untouched. Streamed bodies, such as the NDJSON generate stream, are
+compressed chunk by chunk with a flush after each one so clients still see
+every event as soon as it is sent.
+"""
+import logging
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+Headers = List[Tuple[bytes, bytes]]
+
+COMPRESSIBLE_TYPES = (
+    b"application/json",
+    b"application/x-ndjson",
+    b"application/javascript",
+    b"application/xml",
+    b"image/svg+xml",
+    b"text/",
+)
+# Compressible by type but streamed event by event, or mostly binary
+SKIPPED_TYPES = (b"text/event-stream", b"multipart/")
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+def compression_enabled() -> bool:
+    return os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders() -> Dict[bytes, type]:
+    """Supported encodings in server preference order"""
+    encoders = {}
+    if zstandard is not None:
+        encoders[b"zstd"] = _ZstdEncoder
+    if brotli is not None:
+        encoders[b"br"] = _BrotliEncoder
+    encoders[b"gzip"] = _GzipEncoder
+    return encoders
+
+
+def negotiate(accept_encoding: bytes, encoders: Dict[bytes, type]) -> Optional[bytes]:
+    """
+    Pick the encoding for an Accept-Encoding header value, or None for identity
+
+    The highest q-value wins; ties go to the earlier entry of ``encoders``.
+    """
+    weights: Dict[bytes, float] = {}
+    for item in accept_encoding.lower().split(b","):
+        name, _, params = item.partition(b";")
+        name = name.strip()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(b";"):
+            key, _, value = param.strip().partition(b"=")
+            if key == b"q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    wildcard = weights.get(b"*", 0.0)
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: bytes) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(SKIPPED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Pure ASGI layer compressing eligible responses; see the module docstring"""
+
+    def __init__(self, app, min_size: Optional[int] = None, encoders: Optional[Dict[bytes, type]] = None):
+        self.app = app
+        self.min_size = int(os.getenv("COMPRESSION_MIN_SIZE", "1024")) if min_size is None else min_size
+        self.encoders = available_encoders() if encoders is None else encoders
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = b""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value
+                break
+        encoding = negotiate(accept_encoding, self.encoders) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSend(send, encoding, self.encoders[encoding], self.min_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSend:
+    """Send wrapper that decides per response whether, and then how, to compress"""
+
+    def __init__(self, send, encoding: bytes, encoder_class: type, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.encoder_class = encoder_class
+        self.min_size = min_size
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            await self._start(message)
+        elif message_type == "http.response.body" and not self.passthrough:
+            await self._body(message)
+        else:
+            await self.send(message)
+
+    async def _start(self, message):
+        headers: Headers = message.setdefault("headers", [])
+        content_type = content_length = None
+        for key, value in headers:
+            key = key.lower()
+            if key == b"content-type":
+                content_type = value
+            elif key == b"content-length":
+                content_length = value
+            elif key == b"content-encoding":
+                self.passthrough = True
+
+        compressible = content_type is not None and is_compressible(content_type)
+        if compressible:
+            headers.append((b"vary", b"Accept-Encoding"))
+        if (
+            self.passthrough
+            or not compressible
+            or message["status"] in (204, 304)
+            or (content_length is not None and int(content_length) < self.min_size)
+        ):
+            self.passthrough = True
+            await self.send(message)
+            return
+        # Hold the start until the first body chunk shows whether it's worth it
+        self.start_message = message
+
+    async def _body(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.min_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            self.encoder = self.encoder_class()
+            self._rewrite_headers()
+
+        chunk = self.encoder.compress(body) + (self.encoder.flush() if more_body else self.encoder.finish())
+        if self.start_message is not None:
+            if not more_body:
+                # Whole body in one message, so the encoded length is known
+                self.start_message["headers"].append((b"content-length", str(len(chunk)).encode("latin-1")))
+            await self.send(self.start_message)
+            self.start_message = None
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _rewrite_headers(self):
+        headers: Headers = []
+        for key, value in self.start_message["headers"]:
+            lower = key.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                # The encoded bytes differ, so a strong validator no longer holds
+                value = b"W/" + value
+            headers.append((key, value))
+        headers.append((b"content-encoding", self.encoding))
+        self.start_message["headers"] = headers
@@ -0,0 +1,72 @@
+"""
+HTTP validators and conditional GET handling
+
+Read endpoints derive a weak ETag and a Last-Modified date from the
+``updated_at`` of the row(s) they return, and answer ``If-None-Match`` /
+``If-Modified-Since`` with a bodyless 304 before loading anything heavier.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def entity_tag(*parts) -> str:
+    """Weak ETag over the given version parts, e.g. a row id and its updated_at"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether the client's cached copy is current
+
+    If-None-Match takes precedence over If-Modified-Since and uses weak
+    comparison, per RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(request: Request, response: Response, etag: str,
+                         last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Set validators on ``response``; return a 304 to send instead if the client's copy is current
+
+    ``Cache-Control: no-cache`` lets clients keep the body but makes them
+    revalidate on every use.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,19 +1,32 @@
 """
 Database configuration and session management for Nano Stories
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
+from opentelemetry.trace import Status, StatusCode
+import logging
 import os
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from typing import Generator
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 
+from .models.base import utcnow
 from .models.project import Project
 from .models.character import Character
 from .models.product import Product
 from .models.background import Background
 from .models.story import Story
 from .models.image import Image
+from .models.idempotency_key import IdempotencyKey
+from .metrics import DB_QUERY_DURATION
+from .pagination import encode_cursor, keyset_page
+from .project_cache import ProjectSnapshot, project_cache, project_cache_enabled
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 # Database URL - use SQLite for development, can be changed for production
@@ -27,16 +40,72 @@ engine = create_engine(
     echo=False  # Set to True for SQL query logging during development
 )
 
+def _statement_operation(statement: str) -> str:
+    """First keyword of a SQL statement, e.g. SELECT or INSERT"""
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    operation = _statement_operation(statement)
+    span = tracer.start_span(f"db.{operation.lower()}", attributes={
+        "db.system": conn.dialect.name,
+        "db.operation": operation,
+        "db.statement": statement,
+    })
+    conn.info.setdefault("query_start_time", []).append((time.perf_counter(), operation, span))
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query_duration(conn, cursor, statement, parameters, context, executemany):
+    start_time, operation, span = conn.info["query_start_time"].pop()
+    DB_QUERY_DURATION.labels(operation=operation).observe(time.perf_counter() - start_time)
+    span.end()
+
+@event.listens_for(Engine, "handle_error")
+def _record_query_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        start_time, operation, span = conn.info["query_start_time"].pop()
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
 # Create SessionLocal class for database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def upgrade_schema(bind: Engine):
+    """
+    Add nullable columns and indexes introduced since an existing database was created
+
+    create_all only creates missing tables; this covers additive model
+    changes for databases created by an earlier version.
+    """
+    from .models.base import Base
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info("Added column", extra={"table": table.name, "column": column.name})
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes and {column.name for column in index.columns} <= columns:
+                    index.create(conn)
+                    logger.info("Added index", extra={"table": table.name, "index": index.name})
+
 def create_tables():
     """
     Create all database tables
     """
     from .models.base import Base
     Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully")
+    upgrade_schema(engine)
+    logger.info("Database tables created")
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -48,15 +117,29 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+@contextmanager
+def session_for_scope(scope) -> Generator[Session, None, None]:
+    """
+    Database session for code running outside of FastAPI dependencies (ASGI
+    middleware, mounted apps), honouring the app's ``get_db`` override
+    """
+    app = scope.get("app")
+    provider = app.dependency_overrides.get(get_db, get_db) if app is not None else get_db
+    sessions = provider()
+    try:
+        yield next(sessions)
+    finally:
+        sessions.close()
+
 def init_database():
     """
     Initialize database and create tables
     """
     try:
         create_tables()
-        print("Database initialized successfully")
+        logger.info("Database initialized")
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database", exc_info=True)
         raise
 
 # Database operations helper functions
@@ -68,9 +151,54 @@ def save_project(db: Session, name: str) -> Project:
     db.refresh(project)
     return project
 
-def get_project(db: Session, project_id: str) -> Project:
+def _load_project_snapshot(db: Session, project_id: str) -> Optional[ProjectSnapshot]:
+    project = db.query(Project.id, Project.name, Project.created_at, Project.updated_at).filter(Project.id == project_id).first()
+    if project is None:
+        return None
+
+    character = db.query(Character.image_url).filter(Character.project_id == project_id).first()
+    product = db.query(Product.image_url, Product.cutout_url).filter(Product.project_id == project_id).first()
+    background = db.query(Background.image_url).filter(Background.project_id == project_id).first()
+    story = db.query(Story.story_text).filter(Story.project_id == project_id).first()
+    return ProjectSnapshot(
+        id=project.id,
+        name=project.name,
+        created_at=project.created_at,
+        updated_at=project.updated_at,
+        character_image_url=character.image_url if character else None,
+        product_image_url=product.image_url if product else None,
+        product_cutout_url=product.cutout_url if product else None,
+        background_image_url=background.image_url if background else None,
+        story_text=story.story_text if story else None
+    )
+
+def get_project_snapshot(db: Session, project_id: str) -> Optional[ProjectSnapshot]:
+    """Get a project and the values of its components, from the project cache when possible"""
+    if not project_cache_enabled():
+        return _load_project_snapshot(db, project_id)
+
+    snapshot = project_cache.get(project_id)
+    if snapshot is None:
+        version = project_cache.version
+        snapshot = _load_project_snapshot(db, project_id)
+        # Unknown ids aren't cached; the project may be created next
+        if snapshot is not None:
+            project_cache.put(snapshot, version)
+    return snapshot
+
+def get_project(db: Session, project_id: str) -> Optional[ProjectSnapshot]:
     """Get project by ID"""
-    return db.query(Project).filter(Project.id == project_id).first()
+    with tracer.start_as_current_span("db.get_project"):
+        return get_project_snapshot(db, project_id)
+
+def touch_project(db: Session, project_id: str):
+    """
+    Bump a project's updated_at as part of the current transaction
+
+    Child rows change what the project's read endpoints return, so their
+    saves move the project's validators (ETag / Last-Modified) too.
+    """
+    db.query(Project).filter(Project.id == project_id).update({Project.updated_at: utcnow()}, synchronize_session=False)
 
 def save_character(db: Session, project_id: str, details: str, personality: str = None, image_url: str = None) -> Character:
     """Save a character to database"""
@@ -81,20 +209,26 @@ def save_character(db: Session, project_id: str, details: str, personality: str
         image_url=image_url
     )
     db.add(character)
+    touch_project(db, project_id)
     db.commit()
+    project_cache.invalidate(project_id)
     db.refresh(character)
     return character
 
-def save_product(db: Session, project_id: str, name: str = None, description: str = None, image_url: str = None) -> Product:
+def save_product(db: Session, project_id: str, name: str = None, description: str = None, image_url: str = None,
+                 cutout_url: str = None) -> Product:
     """Save a product to database"""
     product = Product(
         project_id=project_id,
         name=name,
         description=description,
-        image_url=image_url
+        image_url=image_url,
+        cutout_url=cutout_url
     )
     db.add(product)
+    touch_project(db, project_id)
     db.commit()
+    project_cache.invalidate(project_id)
     db.refresh(product)
     return product
 
@@ -107,7 +241,9 @@ def save_background(db: Session, project_id: str, scene_details: str, lighting:
         image_url=image_url
     )
     db.add(background)
+    touch_project(db, project_id)
     db.commit()
+    project_cache.invalidate(project_id)
     db.refresh(background)
     return background
 
@@ -118,23 +254,30 @@ def save_story(db: Session, project_id: str, story_text: str) -> Story:
         story_text=story_text
     )
     db.add(story)
+    touch_project(db, project_id)
     db.commit()
+    project_cache.invalidate(project_id)
     db.refresh(story)
     return story
 
-def save_image(db: Session, project_id: str, image_url: str, prompt: str, image_type: str, fusion_style: str = None) -> Image:
+def save_image(db: Session, project_id: str, image_url: str, prompt: str, image_type: str, fusion_style: str = None,
+               prompt_template_id: str = None) -> Image:
     """Save a generated image to database"""
-    image = Image(
-        project_id=project_id,
-        image_url=image_url,
-        prompt=prompt,
-        image_type=image_type,
-        fusion_style=fusion_style
-    )
-    db.add(image)
-    db.commit()
-    db.refresh(image)
-    return image
+    with tracer.start_as_current_span("db.save_image", attributes={"image.type": image_type}):
+        image = Image(
+            project_id=project_id,
+            image_url=image_url,
+            prompt=prompt,
+            image_type=image_type,
+            fusion_style=fusion_style,
+            prompt_template_id=prompt_template_id
+        )
+        db.add(image)
+        touch_project(db, project_id)
+        db.commit()
+        project_cache.invalidate(project_id)
+        db.refresh(image)
+        return image
 
 def get_project_components(db: Session, project_id: str) -> dict:
     """Get all components for a project"""
@@ -146,7 +289,6 @@ def get_project_components(db: Session, project_id: str) -> dict:
     product = db.query(Product).filter(Product.project_id == project_id).first()
     background = db.query(Background).filter(Background.project_id == project_id).first()
     story = db.query(Story).filter(Story.project_id == project_id).first()
-    images = db.query(Image).filter(Image.project_id == project_id).all()
 
     return {
         "project": project,
@@ -154,25 +296,76 @@ def get_project_components(db: Session, project_id: str) -> dict:
         "product": product,
         "background": background,
         "story": story,
-        "images": images
+        "image_count": count_images(db, project_id)
     }
 
+def count_images(db: Session, project_id: str) -> int:
+    """Number of images in a project, counted in the database (index-only on project_id)"""
+    return db.query(func.count(Image.id)).filter(Image.project_id == project_id).scalar()
+
 def get_character_image_url(db: Session, project_id: str) -> str:
     """Get character image URL for a project"""
-    character = db.query(Character).filter(Character.project_id == project_id).first()
-    return character.image_url if character else None
+    snapshot = get_project_snapshot(db, project_id)
+    return snapshot.character_image_url if snapshot else None
 
 def get_product_image_url(db: Session, project_id: str) -> str:
     """Get product image URL for a project"""
-    product = db.query(Product).filter(Product.project_id == project_id).first()
-    return product.image_url if product else None
+    snapshot = get_project_snapshot(db, project_id)
+    return snapshot.product_image_url if snapshot else None
 
 def get_background_image_url(db: Session, project_id: str) -> str:
     """Get background image URL for a project"""
-    background = db.query(Background).filter(Background.project_id == project_id).first()
-    return background.image_url if background else None
+    snapshot = get_project_snapshot(db, project_id)
+    return snapshot.background_image_url if snapshot else None
 
 def get_story_text(db: Session, project_id: str) -> str:
     """Get story text for a project"""
-    story = db.query(Story).filter(Story.project_id == project_id).first()
-    return story.story_text if story else None
+    snapshot = get_project_snapshot(db, project_id)
+    return snapshot.story_text if snapshot else None
+
+# Columns that image listings may select; ``prompt`` is opt-in
+IMAGE_FIELDS = ("id", "project_id", "image_url", "image_type", "fusion_style", "prompt_template_id",
+                "prompt", "selected_at", "retention_tier", "created_at", "updated_at")
+DEFAULT_IMAGE_FIELDS = tuple(field for field in IMAGE_FIELDS if field != "prompt")
+
+def _page(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Split a limit+1 result into the page and the cursor for the next one"""
+    page = list(rows[:limit])
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return page, next_cursor
+
+def list_projects(db: Session, limit: int, cursor: Optional[str] = None) -> Tuple[List[Project], Optional[str]]:
+    """List projects newest first, one keyset page at a time"""
+    query = keyset_page(db.query(Project), Project.created_at, Project.id, cursor, limit)
+    return _page(query.all(), limit)
+
+def list_images(db: Session, project_id: str, limit: int, cursor: Optional[str] = None,
+                fields: Sequence[str] = DEFAULT_IMAGE_FIELDS, image_type: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List a project's images newest first, selecting only ``fields``
+
+    Rows are fetched as plain column tuples, so unselected columns (by
+    default the prompt text) are never read from the database.
+    """
+    selected = list(dict.fromkeys(["id", "created_at", *fields]))
+    query = db.query(*(getattr(Image, field) for field in selected)).filter(Image.project_id == project_id)
+    if image_type:
+        query = query.filter(Image.image_type == image_type)
+    rows, next_cursor = _page(keyset_page(query, Image.created_at, Image.id, cursor, limit).all(), limit)
+    return [{field: getattr(row, field) for field in fields} for row in rows], next_cursor
+
+def get_image(db: Session, project_id: str, image_id: str) -> Optional[Image]:
+    """Get a single image of a project"""
+    return db.query(Image).filter(Image.project_id == project_id, Image.id == image_id).first()
+
+def select_image(db: Session, project_id: str, image_id: str, selected: bool = True) -> Optional[Image]:
+    """Mark an image as the one the user picked (or unpick it); selected images are kept at full retention"""
+    image = get_image(db, project_id, image_id)
+    if image is None:
+        return None
+    image.selected_at = (image.selected_at or utcnow()) if selected else None
+    touch_project(db, project_id)
+    db.commit()
+    project_cache.invalidate(project_id)
+    db.refresh(image)
+    return image
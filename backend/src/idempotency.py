@@ -0,0 +1,265 @@
+"""
+Idempotency-Key support for mutating requests
+
+A client that sends ``Idempotency-Key: <unique value>`` with a POST, PUT,
+PATCH or DELETE can safely retry it. The first request claims the key and
+runs normally; its response is stored against the key. Retries then get:
+
+- the stored response, replayed with ``Idempotent-Replayed: true``, once the
+  original has finished;
+- 409 while the original is still running;
+- 422 if the key was used for a different request (method, path, query or
+  body differ).
+
+Responses with a 5xx status, interrupted streams and bodies larger than
+IDEMPOTENCY_MAX_RESPONSE_BYTES are not stored; the key is released so a
+retry runs again. Keys expire after IDEMPOTENCY_TTL_SECONDS. A key claimed
+by a request that never finished (e.g. the process died) is taken over
+after IDEMPOTENCY_LOCK_SECONDS.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import session_for_scope
+from .models.base import utcnow
+from .models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+MUTATING_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# (status, headers as captured, body) and (status, headers as stored JSON, body)
+CapturedResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+StoredResponse = Tuple[int, str, Optional[bytes]]
+
+# Added per response by outer layers, so never stored
+_UNSTORED_HEADERS = frozenset((b"content-length", b"x-request-id"))
+
+
+def request_fingerprint(scope, body: bytes) -> str:
+    """
+    Hash identifying a request for key reuse checks
+
+    Multipart boundaries are generated per request by most clients, so they
+    are removed from the body before hashing.
+    """
+    for key, value in scope["headers"]:
+        if key == b"content-type" and value.startswith(b"multipart/"):
+            boundary = value.partition(b"boundary=")[2].split(b";")[0].strip(b'"')
+            if boundary:
+                body = body.replace(boundary, b"")
+            break
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def claim_key(db: Session, key: str, fingerprint: str, ttl_seconds: float,
+              lock_seconds: float) -> Tuple[str, Optional[IdempotencyKey]]:
+    """
+    Try to claim ``key`` for a new request
+
+    Returns:
+        ("claimed", None), ("replay", record), ("in_progress", None) or ("mismatch", None)
+    """
+    now = utcnow()
+    record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+    if record is not None and (
+        record.created_at < now - timedelta(seconds=ttl_seconds)
+        or (record.status == IN_PROGRESS and record.updated_at < now - timedelta(seconds=lock_seconds))
+    ):
+        db.delete(record)
+        db.commit()
+        record = None
+
+    if record is None:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.created_at < now - timedelta(seconds=ttl_seconds)
+        ).delete(synchronize_session=False)
+        db.add(IdempotencyKey(key=key, fingerprint=fingerprint, status=IN_PROGRESS))
+        try:
+            db.commit()
+            return "claimed", None
+        except IntegrityError:
+            # Claimed concurrently by another request with the same key
+            db.rollback()
+            record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+            if record is None:
+                return "in_progress", None
+
+    if record.fingerprint != fingerprint:
+        return "mismatch", None
+    if record.status == IN_PROGRESS:
+        return "in_progress", None
+    return "replay", record
+
+
+def complete_key(db: Session, key: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+    """Store the response of the request holding ``key``"""
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+        IdempotencyKey.status: COMPLETED,
+        IdempotencyKey.response_status: status,
+        IdempotencyKey.response_headers: json.dumps([
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in headers if name.lower() not in _UNSTORED_HEADERS
+        ]),
+        IdempotencyKey.response_body: body,
+        IdempotencyKey.updated_at: utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+
+
+def release_key(db: Session, key: str):
+    """Forget ``key`` so the next request with it runs again"""
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete(synchronize_session=False)
+    db.commit()
+
+
+def _error(status_code: int, detail: str, error_code: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detail, "error_code": error_code})
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI layer implementing Idempotency-Key; see the module docstring"""
+
+    def __init__(self, app, ttl_seconds: Optional[float] = None, lock_seconds: Optional[float] = None,
+                 max_response_bytes: Optional[int] = None):
+        self.app = app
+        self.ttl_seconds = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")) if ttl_seconds is None else ttl_seconds
+        self.lock_seconds = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "600")) if lock_seconds is None else lock_seconds
+        self.max_response_bytes = (
+            int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(16 * 1024 * 1024)))
+            if max_response_bytes is None else max_response_bytes
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        key = next((value for name, value in scope["headers"] if name == IDEMPOTENCY_HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = _error(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters", "INVALID_IDEMPOTENCY_KEY")
+            await response(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        fingerprint = request_fingerprint(scope, body)
+        outcome, stored = await run_in_threadpool(self._claim, scope, key, fingerprint)
+        if outcome == "replay":
+            await self._replay(*stored, send)
+            return
+
+        if outcome == "mismatch":
+            response = _error(422, "Idempotency-Key was already used for a different request", "IDEMPOTENCY_KEY_REUSED")
+            await response(scope, receive, send)
+            return
+        if outcome == "in_progress":
+            response = _error(409, "A request with this Idempotency-Key is still in progress", "IDEMPOTENCY_KEY_IN_PROGRESS")
+            response.headers["Retry-After"] = "1"
+            await response(scope, receive, send)
+            return
+
+        await self._run(scope, receive, send, key, body)
+
+    def _claim(self, scope, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """Claim ``key`` in the threadpool; a replay carries its stored response, detached from the session"""
+        with session_for_scope(scope) as db:
+            outcome, record = claim_key(db, key, fingerprint, self.ttl_seconds, self.lock_seconds)
+            if outcome != "replay":
+                return outcome, None
+            return outcome, (record.response_status, record.response_headers, record.response_body)
+
+    @staticmethod
+    def _finish(scope, key: str, response: Optional[CapturedResponse]):
+        with session_for_scope(scope) as db:
+            if response is not None:
+                complete_key(db, key, *response)
+            else:
+                release_key(db, key)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def _run(self, scope, receive, send, key: str, body: bytes):
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        # Copied on the way out: outer layers rewrite the message they're sent
+        start: Optional[Tuple[int, List[Tuple[bytes, bytes]]]] = None
+        chunks: List[bytes] = []
+        size = 0
+        complete = too_large = False
+
+        async def send_wrapper(message):
+            nonlocal start, size, complete, too_large
+            if message["type"] == "http.response.start":
+                start = message["status"], list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_response_bytes:
+                    too_large = True
+                    chunks.clear()
+                elif not too_large:
+                    chunks.append(chunk)
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            response = None
+            if complete and not too_large and start is not None and start[0] < 500:
+                response = start[0], start[1], b"".join(chunks)
+            elif too_large:
+                logger.info("Response too large to store for Idempotency-Key", extra={"bytes": size})
+            # SQLite writes block, so keep them off the event loop; shielded so a
+            # cancelled request still completes or releases its key
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self._finish, scope, key, response)
+
+    @staticmethod
+    async def _replay(status: int, stored_headers: str, body: Optional[bytes], send):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(stored_headers)]
+        body = body or b""
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
@@ -0,0 +1,159 @@
+"""
+Structured, non-blocking logging configuration
+
+Records are emitted as single-line JSON. Handlers on the request path only
+enqueue records; formatting and stream writes happen on a background
+listener thread so a slow stdout never stalls the event loop.
+
+Environment:
+    LOG_LEVEL     - root level (default INFO)
+    LOG_LEVELS    - per-logger levels, e.g. "backend.src.services=DEBUG,httpx=WARNING"
+    LOG_SAMPLING  - per-logger sample rates for records below WARNING,
+                    e.g. "backend.src.middleware=0.1"
+    LOG_FORMAT    - "json" (default) or "text"
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes present on every LogRecord; anything else was passed via ``extra``
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_logger_map(value: Optional[str]) -> Dict[str, str]:
+    """Parse "name=value,name=value" into a dict, ignoring malformed entries"""
+    result = {}
+    for item in (value or "").split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip() and setting.strip():
+            result[name.strip()] = setting.strip()
+    return result
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records from high-volume loggers
+
+    Warnings and errors are never dropped. The most specific configured
+    logger prefix wins.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first so "a.b" beats "a"
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that defers all formatting to the listener thread
+
+    The stock handler formats (including tracebacks) on the calling thread;
+    since the queue is in-process we can hand the record over as-is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one line of JSON including any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def setup_logging():
+    """
+    Route all logging through a queue to a background JSON writer
+
+    Safe to call more than once; only the first call configures handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+    else:
+        formatter = JsonFormatter()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    queue_handler = DeferredQueueHandler(log_queue)
+    # Sample first so dropped records cost as little as possible
+    sample_rates = {name: float(rate) for name, rate in parse_logger_map(os.getenv("LOG_SAMPLING")).items()}
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    for name, level in parse_logger_map(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,14 +1,23 @@
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import uuid
 from datetime import datetime
 
+# Configure logging before anything else logs
+from .logging_config import setup_logging
+setup_logging()
+
 # Import database setup
 from .database import init_database
 
 # Import middleware
 from .middleware import setup_middleware
+from .metrics import metrics_response
+from .tracing import setup_tracing
+from .profiling import profiling_enabled
+from .responses import FastJSONResponse
+from .services.storage_gc import start_reaper
+from .services.retention import RestoringStaticFiles, start_retention
+from .services.image_pool import image_pool
 
 # Import API routers
 from .api.projects import router as projects_router
@@ -17,33 +26,38 @@ from .api.product import router as product_router
 from .api.background import router as background_router
 from .api.story import router as story_router
 from .api.generate import router as generate_router
+from .api.batch import router as batch_router
+from .api.images import router as images_router
+from .api.admin import router as admin_router
 
 app = FastAPI(
     title="Brand Storytelling API",
     description="API for brand storytelling web application",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Configure tracing before any spans are created
+setup_tracing()
+
 # Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
-# Configure CORS with more specific settings
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://[::]:3000", "*"],  # Allow frontend server
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-    max_age=86400  # Cache preflight for 24 hours
-)
+app.mount("/uploads", RestoringStaticFiles(directory="uploads"), name="uploads")
 
-# Setup custom middleware (logging, error handling)
+# Setup custom middleware (logging, metrics, tracing, CORS, error handling)
 setup_middleware(app)
 
-# Initialize database on startup
+# Initialize database, warm the image workers and start the storage jobs on startup
 @app.on_event("startup")
 async def startup_event():
     init_database()
+    image_pool.start()
+    app.state.background_jobs = [job for job in (start_reaper(), start_retention()) if job is not None]
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for job in app.state.background_jobs:
+        job.cancel()
+    image_pool.shutdown()
 
 # Include API routers
 app.include_router(projects_router, prefix="/api/v1", tags=["projects"])
@@ -52,6 +66,12 @@ app.include_router(product_router, prefix="/api/v1", tags=["product"])
 app.include_router(background_router, prefix="/api/v1", tags=["background"])
 app.include_router(story_router, prefix="/api/v1", tags=["story"])
 app.include_router(generate_router, prefix="/api/v1", tags=["generate"])
+app.include_router(batch_router, prefix="/api/v1", tags=["batch"])
+app.include_router(images_router, prefix="/api/v1", tags=["images"])
+
+# Profiling endpoints exist only when explicitly enabled
+if profiling_enabled():
+    app.include_router(admin_router, prefix="/api/v1", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -60,3 +80,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
@@ -0,0 +1,112 @@
+"""
+Prometheus metrics for request handling, upstream generation, storage and database
+"""
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from fastapi import Response
+
+# Buckets sized for image generation: fast JSON calls through multi-second fusions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GEMINI_REQUEST_DURATION = Histogram(
+    "gemini_request_duration_seconds",
+    "Upstream Gemini call duration by service method",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GEMINI_ERRORS = Counter(
+    "gemini_errors_total",
+    "Failed upstream Gemini calls by service method",
+    ["method"],
+)
+
+IMAGE_BYTES_SAVED = Counter(
+    "image_bytes_saved_total",
+    "Bytes of image data written to local storage",
+    ["image_type"],
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement duration by statement type",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+GENERATION_QUEUE_DEPTH = Gauge(
+    "generation_queue_depth",
+    "Final image generations waiting or in progress",
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result; hit ratio is hit / (hit + miss)",
+    ["cache", "result"],
+)
+
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Entries currently held by in-process caches",
+    ["cache"],
+)
+
+STORAGE_GC_FILES_DELETED = Counter(
+    "storage_gc_files_deleted_total",
+    "Orphaned upload files deleted by the storage reaper",
+)
+
+STORAGE_GC_BYTES_RECLAIMED = Counter(
+    "storage_gc_bytes_reclaimed_total",
+    "Bytes freed by the storage reaper",
+)
+
+RETENTION_BYTES_SAVED = Counter(
+    "retention_bytes_saved_total",
+    "Bytes freed by moving unselected images to a lower retention tier",
+    ["tier"],
+)
+
+ARCHIVE_RESTORES = Counter(
+    "archive_restores_total",
+    "Archived images restored on access",
+)
+
+IMAGE_POOL_TASK_DURATION = Histogram(
+    "image_pool_task_duration_seconds",
+    "CPU-bound image task duration, in a worker process or inline",
+    ["task", "mode"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache lookup as a hit or a miss"""
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def route_label(scope) -> str:
+    """
+    Low-cardinality route label for a handled request
+
+    Uses the matched route template (e.g. /api/v1/projects/{project_id}) rather
+    than the raw path so that IDs don't explode the label space.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mounted apps such as /uploads static files
+        return f"{scope.get('root_path', '')}/{{path}}"
+    return "unmatched"
+
+
+def metrics_response() -> Response:
+    """Render all metrics in the Prometheus text exposition format"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,81 +1,219 @@
 """
-Middleware for error handling and logging
+Middleware for error handling, logging, metrics, tracing, profiling and CORS
+
+Everything that runs on every request lives in one pure-ASGI layer so each
+request pays for a single pass over its headers and a single wrapped send.
 """
 import logging
+import os
 import time
-from typing import Callable
+import uuid
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import Request, Response, HTTPException
-from fastapi.responses import JSONResponse
-import traceback
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        # logging.FileHandler('logs/app.log'),
-        logging.StreamHandler()
-    ]
-)
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from opentelemetry import propagate, trace
+
+from .compression import CompressionMiddleware, compression_enabled
+from .idempotency import IdempotencyMiddleware
+from .logging_config import request_id_var
+from .metrics import REQUEST_DURATION, route_label
+from .profiling import RequestProfiler, profiling_authorized, profiling_enabled, store_profile
+from .tracing import tracer, tracing_active
 
 logger = logging.getLogger(__name__)
 
-class RequestLoggingMiddleware:
-    """Middleware for logging HTTP requests and responses"""
+DEFAULT_CORS_ORIGINS = "*"
+CORS_METHODS = ("GET", "POST", "PUT", "DELETE", "OPTIONS")
 
-    def __init__(self, app):
-        self.app = app
+# Incoming headers the middleware cares about; everything else is skipped
+_TRACE_HEADERS = frozenset((b"traceparent", b"tracestate", b"baggage"))
 
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            await self.app(scope, receive, send)
-            return
+Headers = List[Tuple[bytes, bytes]]
 
-        start_time = time.time()
+class CORSPolicy:
+    """
+    CORS rules resolved once at startup into ready-to-send header lists
 
-        # Log request
-        method = scope["method"]
-        path = scope["path"]
-        query_string = scope["query_string"].decode()
-        client = scope.get("client", ("unknown", 0))
+    Allowed origins are always echoed back (never ``*``) because credentials
+    are allowed; listing ``*`` therefore allows every origin and makes any
+    specific origins redundant.
+    """
+
+    def __init__(self, allow_origins: Iterable[str], allow_methods: Iterable[str] = CORS_METHODS,
+                 allow_credentials: bool = True, max_age: int = 86400):
+        origins = [origin.strip() for origin in allow_origins if origin.strip()]
+        self.allow_all_origins = "*" in origins
+        self.allowed_origins = frozenset(origin.encode("latin-1") for origin in origins if origin != "*")
+        self.allowed_methods = frozenset(method.encode("latin-1") for method in allow_methods)
+
+        common: Headers = [(b"vary", b"Origin")]
+        if allow_credentials:
+            common.append((b"access-control-allow-credentials", b"true"))
+        self.simple_headers = common
+        self.preflight_headers = common + [
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+        ]
+
+    @classmethod
+    def from_env(cls) -> "CORSPolicy":
+        """Build the policy from CORS_ALLOW_ORIGINS (comma-separated, default *)"""
+        return cls(os.getenv("CORS_ALLOW_ORIGINS", DEFAULT_CORS_ORIGINS).split(","))
+
+    def is_allowed(self, origin: bytes) -> bool:
+        return self.allow_all_origins or origin in self.allowed_origins
 
-        logger.info(f"Request: {method} {path}{query_string} from {client[0]}:{client[1]}")
+    def response_headers(self, origin: bytes) -> Headers:
+        """Headers to add to a normal response for an allowed origin"""
+        return [(b"access-control-allow-origin", origin)] + self.simple_headers
 
-        # Process request
-        await self.app(scope, receive, send)
+    def preflight_response(self, origin: bytes, request_method: bytes, request_headers: Optional[bytes]) -> Response:
+        """Answer an OPTIONS preflight without touching the application"""
+        if not self.is_allowed(origin):
+            return PlainTextResponse("Disallowed CORS origin", status_code=400)
+        if request_method not in self.allowed_methods:
+            return PlainTextResponse("Disallowed CORS method", status_code=400)
 
-        # Log response time
-        process_time = time.time() - start_time
-        logger.info(".2f")
+        response = PlainTextResponse("OK", status_code=200)
+        headers = response.raw_headers
+        headers.append((b"access-control-allow-origin", origin))
+        headers.extend(self.preflight_headers)
+        if request_headers:
+            # All request headers are allowed
+            headers.append((b"access-control-allow-headers", request_headers))
+        return response
 
-class ErrorHandlingMiddleware:
-    """Middleware for handling and logging errors"""
+class AppMiddleware:
+    """
+    Single ASGI layer for request ids, logging, metrics, tracing, profiling,
+    CORS and last-resort error responses
+    """
 
-    def __init__(self, app):
+    def __init__(self, app, cors: Optional[CORSPolicy] = None, profiling: Optional[bool] = None):
         self.app = app
+        self.cors = cors if cors is not None else CORSPolicy.from_env()
+        # Resolved once so the per-request profiling hook costs nothing when disabled
+        self.profiling = profiling_enabled() if profiling is None else profiling
+        self._duration_metrics: Dict[Tuple[str, str, int], object] = {}
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        try:
-            await self.app(scope, receive, send)
-        except Exception as e:
-            # Log the error
-            logger.error(f"Unhandled error: {str(e)}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-
-            # Return error response
-            error_response = JSONResponse(
-                status_code=500,
-                content={
-                    "detail": "Internal server error",
-                    "error_id": f"ERR_{int(time.time())}"
-                }
-            )
-
-            await error_response(scope, receive, send)
+        start_time = time.perf_counter()
+        method = scope["method"]
+
+        # Single pass over the request headers
+        origin = request_id = profile_header = admin_token = None
+        preflight_method = preflight_headers = None
+        trace_carrier = {}
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value
+            elif key == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+            elif key == b"x-profile":
+                profile_header = value
+            elif key == b"x-admin-token":
+                admin_token = value.decode("latin-1")
+            elif key == b"access-control-request-method":
+                preflight_method = value
+            elif key == b"access-control-request-headers":
+                preflight_headers = value
+            elif key in _TRACE_HEADERS:
+                trace_carrier[key.decode("latin-1")] = value.decode("latin-1")
+
+        if method == "OPTIONS" and origin is not None and preflight_method is not None:
+            response = self.cors.preflight_response(origin, preflight_method, preflight_headers)
+            await response(scope, receive, send)
+            return
+
+        # Correlate every log line of this request, reusing the caller's id if given
+        request_id = request_id or os.urandom(16).hex()
+        request_id_token = request_id_var.set(request_id)
+        extra_headers: Headers = [(b"x-request-id", request_id.encode("latin-1"))]
+        if origin is not None and self.cors.is_allowed(origin):
+            extra_headers.extend(self.cors.response_headers(origin))
+
+        # Profile this request when an admin asks to. The id is generated here:
+        # request ids come from the client and could overwrite stored profiles
+        profiler = None
+        if (self.profiling and (profile_header == b"1" or b"profile=1" in scope["query_string"].split(b"&"))
+                and profiling_authorized(admin_token)):
+            profiler = RequestProfiler(os.urandom(16).hex())
+            profiler.start()
+            extra_headers.append((b"x-profile-id", profiler.profile_id.encode("latin-1")))
+
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+                message.setdefault("headers", []).extend(extra_headers)
+            await send(message)
+
+        # Process request, continuing any trace started by the caller; skip
+        # span bookkeeping entirely while tracing is disabled
+        if tracing_active():
+            context = propagate.extract(trace_carrier) if trace_carrier else None
+            span_context = tracer.start_as_current_span(method, context=context, kind=trace.SpanKind.SERVER)
+        else:
+            span_context = nullcontext()
+        with span_context as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception:
+                # Traceback is formatted by the log listener, off the request path
+                logger.error("Unhandled error", exc_info=True)
+                if response_started:
+                    raise
+                error_response = JSONResponse(
+                    status_code=500,
+                    content={
+                        "detail": "Internal server error",
+                        "error_id": request_id
+                    }
+                )
+                await error_response(scope, receive, send_wrapper)
+            finally:
+                if profiler is not None:
+                    store_profile(profiler.profile_id, profiler.stop())
+
+                # Log response time and record it per route
+                process_time = time.perf_counter() - start_time
+                route = route_label(scope)
+                self._observe_duration(method, route, status_code, process_time)
+                if span is not None and span.is_recording():
+                    span.update_name(f"{method} {route}")
+                    span.set_attribute("http.method", method)
+                    span.set_attribute("http.route", route)
+                    span.set_attribute("http.status_code", status_code)
+                if logger.isEnabledFor(logging.INFO):
+                    client = scope.get("client") or ("unknown", 0)
+                    logger.info("Request completed", extra={
+                        "method": method,
+                        "path": scope["path"],
+                        "route": route,
+                        "status": status_code,
+                        "duration_ms": round(process_time * 1000, 2),
+                        "client": f"{client[0]}:{client[1]}",
+                    })
+                request_id_var.reset(request_id_token)
+
+    def _observe_duration(self, method: str, route: str, status_code: int, seconds: float):
+        # Cache labelled children; .labels() takes a lock and builds a key on every call
+        key = (method, route, status_code)
+        histogram = self._duration_metrics.get(key)
+        if histogram is None:
+            histogram = REQUEST_DURATION.labels(method=method, route=route, status=str(status_code))
+            self._duration_metrics[key] = histogram
+        histogram.observe(seconds)
 
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Custom handler for HTTP exceptions"""
@@ -104,14 +242,13 @@ async def validation_exception_handler(request: Request, exc):
 
 async def general_exception_handler(request: Request, exc: Exception):
     """Custom handler for general exceptions"""
-    logger.error(f"General exception: {str(exc)} - {request.method} {request.url}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
+    logger.error("General exception", extra={"method": request.method, "url": str(request.url)}, exc_info=exc)
 
     return JSONResponse(
         status_code=500,
         content={
             "detail": "An unexpected error occurred",
-            "error_id": f"ERR_{int(time.time())}",
+            "error_id": request_id_var.get() or uuid.uuid4().hex,
             "error_code": "INTERNAL_ERROR"
         }
     )
@@ -119,11 +256,15 @@ async def general_exception_handler(request: Request, exc: Exception):
 def setup_middleware(app):
     """Setup all middleware for the FastAPI app"""
 
-    # Add request logging middleware
-    app.add_middleware(RequestLoggingMiddleware)
+    # Idempotency-Key handling, innermost so stored responses are uncompressed
+    app.add_middleware(IdempotencyMiddleware)
+
+    # Response compression, inside the main layer so its timings include it
+    if compression_enabled():
+        app.add_middleware(CompressionMiddleware)
 
-    # Add error handling middleware
-    app.add_middleware(ErrorHandlingMiddleware)
+    # Request ids, logging, metrics, tracing, profiling, CORS and error handling
+    app.add_middleware(AppMiddleware)
 
     # Add exception handlers
     app.add_exception_handler(HTTPException, http_exception_handler)
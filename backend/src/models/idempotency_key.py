@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Text, LargeBinary, Index
+from .base import BaseModel
+
+class IdempotencyKey(BaseModel):
+    __tablename__ = "idempotency_keys"
+    # Expired keys are purged by age
+    __table_args__ = (Index("ix_idempotency_keys_created", "created_at"),)
+
+    key: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)  # Client-supplied Idempotency-Key
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)  # SHA-256 of method, path, query and body
+    status: Mapped[str] = mapped_column(String, nullable=False)  # 'in_progress' or 'completed'
+    response_status: Mapped[int] = mapped_column(Integer, nullable=True)
+    response_headers: Mapped[str] = mapped_column(Text, nullable=True)  # JSON list of [name, value] pairs
+    response_body: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key='{self.key}', status='{self.status}')>"
@@ -1,15 +1,26 @@
+from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index
 from .base import BaseModel
 
 class Image(BaseModel):
     __tablename__ = "images"
+    __table_args__ = (
+        # Supports per-project listing newest first with keyset pagination
+        Index("ix_images_project_created", "project_id", "created_at", "id"),
+        # Looks up the row behind an /uploads URL, e.g. to restore an archived file
+        Index("ix_images_image_url", "image_url"),
+    )
 
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"), nullable=False)
     prompt: Mapped[str] = mapped_column(Text, nullable=False)  # Generated prompt used
     image_url: Mapped[str] = mapped_column(String, nullable=False)  # Generated image URL
     image_type: Mapped[str] = mapped_column(String, nullable=False)  # Type: 'character', 'background', 'final'
     fusion_style: Mapped[str] = mapped_column(String, nullable=True)  # For final images: fusion style used
+    prompt_template_id: Mapped[str] = mapped_column(String, nullable=True)  # Template the prompt was rendered from, e.g. 'fusion@v1'
+    selected_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # When the user picked this variation; exempt from retention
+    retention_tier: Mapped[str] = mapped_column(String, nullable=True)  # None (full size), 'downscaled' or 'archived'
+    archive_url: Mapped[str] = mapped_column(String, nullable=True)  # Pack holding the file while archived
 
     # Relationship
     project = relationship("Project", back_populates="images")
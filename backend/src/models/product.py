@@ -9,6 +9,7 @@ class Product(BaseModel):
     name: Mapped[str] = mapped_column(String, nullable=True)
     description: Mapped[str] = mapped_column(String, nullable=True)
     image_url: Mapped[str] = mapped_column(String, nullable=True)  # URL to uploaded image file
+    cutout_url: Mapped[str] = mapped_column(String, nullable=True)  # Transparent-background version, if one was made
     filename: Mapped[str] = mapped_column(String, nullable=True)
     content_type: Mapped[str] = mapped_column(String, nullable=True)
 
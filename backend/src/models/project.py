@@ -1,9 +1,10 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from .base import BaseModel
 
 class Project(BaseModel):
     __tablename__ = "projects"
+    __table_args__ = (Index("ix_projects_created", "created_at", "id"),)
 
     name: Mapped[str] = mapped_column(String, nullable=False)
 
@@ -0,0 +1,52 @@
+"""
+Keyset (cursor) pagination helpers
+
+Lists are ordered newest first by ``(created_at, id)``. A cursor is an
+opaque token encoding the last row returned; the next page is everything
+strictly after it in that order. Unlike OFFSET this costs the same on page
+1000 as on page 1, and rows inserted meanwhile don't shift pages.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(query: Query, created_column, id_column, cursor: Optional[str], limit: int) -> Query:
+    """
+    Restrict ``query`` to one page after ``cursor``, newest first
+
+    Fetches ``limit + 1`` rows so the caller can tell whether another page
+    exists without a COUNT.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id),
+        ))
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
@@ -0,0 +1,206 @@
+"""
+Opt-in sampling profiler producing flamegraph-compatible folded stacks
+
+Profiling is enabled with PROFILING_ENABLED=true and also needs
+PROFILING_TOKEN: the admin endpoints and the per-request hook are refused
+unless the caller presents it as X-Admin-Token. When disabled nothing in
+this module runs on the request path.
+
+A profiled request samples the event loop only while one of its own tasks
+is running there, plus any threadpool threads while they work on the
+request (see ``run_in_threadpool`` and ``profiled_iterator``).
+"""
+import asyncio
+import hmac
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, Set, TypeVar
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+T = TypeVar("T")
+
+# Per-request profiles kept for retrieval through the admin API
+_recent_profiles: "OrderedDict[str, str]" = OrderedDict()
+_recent_profiles_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    """Whether the profiling endpoints and per-request hook are switched on"""
+    return os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def profiling_authorized(token: Optional[str]) -> bool:
+    """Whether ``token`` matches PROFILING_TOKEN; always False when no token is configured"""
+    expected = os.getenv("PROFILING_TOKEN")
+    if not expected or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+class SamplingProfiler:
+    """
+    Periodically samples thread stacks from a background thread
+
+    Output is in the "folded" format understood by flamegraph.pl, speedscope
+    and similar tools: one line per unique stack, frames separated by ``;``
+    from root to leaf, followed by the sample count.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Set[int]] = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the folded stacks"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.folded()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread_id and self._includes(thread_id):
+                    self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    def _includes(self, thread_id: int) -> bool:
+        return self.thread_ids is None or thread_id in self.thread_ids
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        frames = []
+        while frame is not None:
+            frames.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+
+_active_profiler: ContextVar[Optional["RequestProfiler"]] = ContextVar("active_profiler", default=None)
+
+
+class RequestProfiler(SamplingProfiler):
+    """
+    Samples the work of one request, wherever it runs
+
+    Must be started and stopped from the request's task on the event loop.
+    The loop thread is sampled only while the running task belongs to this
+    request (the task or a child task inheriting its context), so requests
+    interleaved on the loop stay out of the profile. Threads are sampled
+    while attached through ``attach_thread``. Every stack is rooted at
+    ``request:<profile_id>`` so profiles can be merged and still told apart.
+    """
+
+    def __init__(self, profile_id: str, interval: float = 0.005):
+        super().__init__(interval, thread_ids=set())
+        self.profile_id = profile_id
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.current_task()
+        self._token = None
+
+    def start(self):
+        self._token = _active_profiler.set(self)
+        super().start()
+
+    def stop(self) -> str:
+        folded = super().stop()
+        _active_profiler.reset(self._token)
+        return folded
+
+    def _includes(self, thread_id: int) -> bool:
+        if thread_id in self.thread_ids:
+            return True
+        if thread_id != self._loop_thread_id:
+            return False
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return False
+        get_context = getattr(task, "get_context", None)
+        if get_context is None:
+            return task is self._task
+        return get_context().get(_active_profiler) is self
+
+    def _collapse(self, frame) -> str:
+        return f"request:{self.profile_id};{super()._collapse(frame)}"
+
+    @contextmanager
+    def attach_thread(self):
+        """Sample the calling thread until the block exits"""
+        thread_id = threading.get_ident()
+        self.thread_ids.add(thread_id)
+        try:
+            yield
+        finally:
+            self.thread_ids.discard(thread_id)
+
+
+async def run_in_threadpool(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Starlette's ``run_in_threadpool``, attaching the worker thread to the request's profile"""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+
+    def attached():
+        with profiler.attach_thread():
+            return func(*args, **kwargs)
+
+    return await _run_in_threadpool(attached)
+
+
+def profiled_iterator(iterator: Iterator[T]) -> Iterator[T]:
+    """
+    Wrap a sync iterator handed to a streaming response so each step is sampled
+
+    Starlette advances sync iterators in the threadpool, a step at a time.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return iterator
+
+    def attached():
+        try:
+            while True:
+                with profiler.attach_thread():
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    return attached()
+
+
+def store_profile(profile_id: str, folded: str):
+    """Keep a per-request profile, evicting the oldest beyond PROFILING_MAX_STORED"""
+    max_stored = int(os.getenv("PROFILING_MAX_STORED", "50"))
+    with _recent_profiles_lock:
+        _recent_profiles[profile_id] = folded
+        while len(_recent_profiles) > max_stored:
+            _recent_profiles.popitem(last=False)
+
+
+def get_profile(profile_id: str) -> Optional[str]:
+    with _recent_profiles_lock:
+        return _recent_profiles.get(profile_id)
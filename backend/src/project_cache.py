@@ -0,0 +1,110 @@
+"""
+In-process cache of project snapshots
+
+A project's components change only at a few wizard steps, while every
+generate call needs all of them. Snapshots hold the plain values those
+reads use (never ORM instances, which are bound to a session) and are
+keyed by project id. The ``save_*`` helpers in ``database`` invalidate a
+project's entry after committing, so readers in this process never see a
+stale snapshot; PROJECT_CACHE_TTL_SECONDS bounds staleness across worker
+processes, which don't share invalidations.
+
+Size is bounded by PROJECT_CACHE_MAX_ENTRIES with least-recently-used
+eviction. Disable with PROJECT_CACHE_ENABLED=false.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from .metrics import CACHE_ENTRIES, record_cache_lookup
+
+
+class ProjectSnapshot(NamedTuple):
+    id: int
+    name: str
+    created_at: datetime
+    updated_at: datetime
+    character_image_url: Optional[str] = None
+    product_image_url: Optional[str] = None
+    product_cutout_url: Optional[str] = None
+    background_image_url: Optional[str] = None
+    story_text: Optional[str] = None
+
+
+def project_cache_enabled() -> bool:
+    return os.getenv("PROJECT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class ProjectCache:
+    """
+    Bounded LRU map of project id -> snapshot
+
+    Loading a snapshot races with writers: a save can commit and invalidate
+    between the database read and ``put``. ``version`` is taken before the
+    read and ``put`` drops the snapshot if any invalidation happened since.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # project id -> (expires at, snapshot)
+        self._entries: "OrderedDict[str, Tuple[float, ProjectSnapshot]]" = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProjectCache":
+        return cls(
+            max_entries=int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("PROJECT_CACHE_TTL_SECONDS", "300")),
+        )
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, project_id) -> Optional[ProjectSnapshot]:
+        key = str(project_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            CACHE_ENTRIES.labels(cache="project").set(len(self._entries))
+        record_cache_lookup("project", entry is not None)
+        return entry[1] if entry is not None else None
+
+    def put(self, snapshot: ProjectSnapshot, version: int):
+        """Store ``snapshot`` unless something was invalidated since ``version``"""
+        key = str(snapshot.id)
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.labels(cache="project").set(len(self._entries))
+
+    def invalidate(self, project_id):
+        with self._lock:
+            self._version += 1
+            self._entries.pop(str(project_id), None)
+            CACHE_ENTRIES.labels(cache="project").set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            CACHE_ENTRIES.labels(cache="project").set(0)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+project_cache = ProjectCache.from_env()
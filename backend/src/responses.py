@@ -0,0 +1,46 @@
+"""
+JSON encoding for API responses
+
+When orjson is installed (it is in requirements.txt) responses and streamed
+events are encoded with it; it is several times faster than the standard
+library on large lists such as image listings with prompts. Without it, or
+with JSON_ENCODER=stdlib, the standard library encoder is used with the same
+compact output.
+"""
+import json
+import logging
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_enabled() -> bool:
+    encoder = os.getenv("JSON_ENCODER", "orjson").lower()
+    if encoder == "orjson" and orjson is None:
+        logger.warning("JSON_ENCODER=orjson but orjson is not installed; using the standard library encoder")
+    return encoder == "orjson" and orjson is not None
+
+
+USE_ORJSON = _orjson_enabled()
+
+
+def json_dumps(value: Any) -> bytes:
+    """Encode ``value`` as compact UTF-8 JSON"""
+    if USE_ORJSON:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class for the API routers; see the module docstring"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
@@ -0,0 +1,130 @@
+"""
+CPU background removal for uploaded product photos
+
+Product shots are usually taken against a plain backdrop, so a classical
+approach works without any model weights: estimate the backdrop colour from
+the image border, mark pixels close to it, and treat only the region of such
+pixels connected to the border as background (so product areas that happen
+to share the backdrop colour survive). The mask is computed on a downscaled
+copy and upscaled with soft edges. Images where this doesn't find a sensible
+foreground are left alone.
+"""
+import logging
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageOps
+
+from ..metrics import IMAGE_BYTES_SAVED
+from ..tracing import tracer
+from .image_guard import guarded_open
+from .image_pool import image_pool
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of the working copy the mask is computed on
+MASK_WORKING_SIZE = 256
+# Longest edge of the stored cutout; fusion inputs never need more
+CUTOUT_MAX_SIZE = 2048
+# Max per-channel distance from the backdrop colour still counted as backdrop
+BACKDROP_TOLERANCE = int(os.getenv("CUTOUT_TOLERANCE", "40"))
+# Foreground must cover this fraction of the frame for the cutout to be kept
+MIN_FOREGROUND, MAX_FOREGROUND = 0.02, 0.95
+
+
+def cutout_enabled() -> bool:
+    return os.getenv("PRODUCT_CUTOUT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def cutout_path(image_path: Path) -> Path:
+    """Where the cutout for ``image_path`` is stored: alongside it, as PNG"""
+    return image_path.with_name(f"{image_path.stem}.cutout.png")
+
+
+def _backdrop_color(image: Image.Image) -> Tuple[int, ...]:
+    """Per-channel median of the outermost pixels"""
+    width, height = image.size
+    pixels = image.load()
+    border = [pixels[x, y] for x in range(width) for y in (0, height - 1)]
+    border += [pixels[x, y] for y in range(1, height - 1) for x in (0, width - 1)]
+    return tuple(sorted(channel)[len(channel) // 2] for channel in zip(*border))
+
+
+def foreground_mask(image: Image.Image, tolerance: int = BACKDROP_TOLERANCE) -> Optional[Image.Image]:
+    """
+    Estimate a soft foreground mask ("L", same size as ``image``)
+
+    Returns:
+        The mask, or None if no plausible foreground was found
+    """
+    small = image.convert("RGB")
+    small.thumbnail((MASK_WORKING_SIZE, MASK_WORKING_SIZE))
+
+    # Largest per-channel distance from the backdrop colour
+    backdrop = Image.new("RGB", small.size, _backdrop_color(small))
+    distance = ImageChops.difference(small, backdrop).split()
+    distance = ImageChops.lighter(ImageChops.lighter(distance[0], distance[1]), distance[2])
+    candidate = distance.point(lambda value: 255 if value > tolerance else 0)
+
+    # Pad with backdrop so one flood fill from a corner reaches every
+    # backdrop region that touches the border
+    padded = ImageOps.expand(candidate, border=1, fill=0)
+    ImageDraw.floodfill(padded, (0, 0), 128)
+    mask = padded.crop((1, 1, padded.width - 1, padded.height - 1)).point(lambda value: 0 if value == 128 else 255)
+
+    coverage = mask.histogram()[255] / (mask.width * mask.height)
+    if not MIN_FOREGROUND <= coverage <= MAX_FOREGROUND:
+        return None
+
+    # Drop the 1px halo of backdrop-tinted edge pixels, then soften the edge
+    mask = mask.filter(ImageFilter.MinFilter(3)).filter(ImageFilter.GaussianBlur(0.8))
+    return mask.resize(image.size, Image.BILINEAR)
+
+
+def remove_background(image_data: bytes) -> Optional[bytes]:
+    """
+    Produce a transparent-background PNG of the product in ``image_data``
+
+    Returns:
+        PNG bytes, or None if the image already has transparency or no
+        foreground could be separated
+    """
+    with tracer.start_as_current_span("image.remove_background"):
+        image = guarded_open(image_data, CUTOUT_MAX_SIZE)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            return None
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        mask = foreground_mask(image)
+        if mask is None:
+            return None
+
+        image.putalpha(mask)
+        buffer = BytesIO()
+        # Favour encode speed; the cutout is an intermediate asset
+        image.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+
+def create_cutout(image_path: Path, image_data: bytes) -> Optional[Path]:
+    """
+    Write the cutout for an uploaded image next to it
+
+    Failures are logged and treated as "no cutout"; the original upload is
+    always usable on its own.
+    """
+    try:
+        cutout = image_pool.call(remove_background, image_data)
+    except Exception:
+        logger.warning("Background removal failed", extra={"image_path": str(image_path)}, exc_info=True)
+        return None
+    if cutout is None:
+        logger.info("No cutout produced for product image", extra={"image_path": str(image_path)})
+        return None
+
+    path = cutout_path(image_path)
+    with open(path, "wb") as f:
+        f.write(cutout)
+    IMAGE_BYTES_SAVED.labels(image_type="product_cutout").inc(len(cutout))
+    return path
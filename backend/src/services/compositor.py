@@ -0,0 +1,104 @@
+"""
+Local pre-compositing of generation inputs
+
+Places the character and product onto the background with PIL so the fusion
+model can be sent one reference image instead of three. Layouts are chosen
+per fusion style. Layers with transparency (e.g. product cutouts) are pasted
+through their own alpha; opaque layers get a feathered mask so their edges
+blend into the scene.
+"""
+import os
+from typing import Dict, NamedTuple, Optional
+
+from PIL import Image, ImageDraw, ImageFilter
+
+# Longest edge of the composite sent upstream
+COMPOSITE_MAX_SIZE = int(os.getenv("COMPOSITE_MAX_SIZE", "1024"))
+
+
+class Placement(NamedTuple):
+    """Where a layer goes, as fractions of the canvas"""
+    center_x: float  # horizontal centre of the layer
+    bottom: float    # bottom edge of the layer
+    height: float    # layer height
+
+
+class Layout(NamedTuple):
+    character: Placement
+    product: Placement
+
+
+DEFAULT_LAYOUT = Layout(
+    character=Placement(center_x=0.33, bottom=0.95, height=0.6),
+    product=Placement(center_x=0.7, bottom=0.9, height=0.35),
+)
+
+# Layout presets keyed by fusion style
+LAYOUTS: Dict[str, Layout] = {
+    "seamlessly integrated composition": DEFAULT_LAYOUT,
+    "dramatic storytelling scene": Layout(
+        character=Placement(center_x=0.4, bottom=1.0, height=0.8),
+        product=Placement(center_x=0.78, bottom=0.95, height=0.28),
+    ),
+    "professional brand presentation": Layout(
+        character=Placement(center_x=0.22, bottom=0.95, height=0.5),
+        product=Placement(center_x=0.6, bottom=0.85, height=0.5),
+    ),
+}
+
+
+def layout_for(style: Optional[str]) -> Layout:
+    return LAYOUTS.get(style, DEFAULT_LAYOUT)
+
+
+def feathered_mask(size, feather: Optional[float] = None) -> Image.Image:
+    """Opaque rounded-rectangle mask whose edges fade out over ``feather`` pixels"""
+    width, height = size
+    if feather is None:
+        feather = max(1.0, min(width, height) * 0.06)
+    inset = int(feather)
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle(
+        (inset, inset, width - 1 - inset, height - 1 - inset), radius=inset * 2, fill=255
+    )
+    return mask.filter(ImageFilter.GaussianBlur(feather / 2))
+
+
+def _layer_with_mask(image: Image.Image, height: int) -> Image.Image:
+    """Scale ``image`` to ``height`` and return it as RGBA with a blending mask"""
+    width = max(1, round(image.width * height / image.height))
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    layer = image.convert("RGBA").resize((width, height), Image.LANCZOS)
+    if not has_alpha:
+        layer.putalpha(feathered_mask(layer.size))
+    return layer
+
+
+def composite(character: Optional[Image.Image], product: Optional[Image.Image], background: Image.Image,
+              style: Optional[str] = None, max_size: int = COMPOSITE_MAX_SIZE) -> Image.Image:
+    """
+    Place the character and product onto the background using the style's layout
+
+    A missing (None) character or product layer is left out.
+
+    Returns:
+        RGB image no larger than ``max_size`` on its longest edge
+    """
+    canvas = background.convert("RGBA")
+    if max(canvas.size) > max_size:
+        canvas.thumbnail((max_size, max_size), Image.LANCZOS)
+    width, height = canvas.size
+
+    layout = layout_for(style)
+    for image, placement in ((character, layout.character), (product, layout.product)):
+        if image is None:
+            continue
+        layer = _layer_with_mask(image, max(1, round(height * placement.height)))
+        left = round(width * placement.center_x - layer.width / 2)
+        top = round(height * placement.bottom) - layer.height
+        # alpha_composite can't take negative offsets, so clip the layer to the canvas first
+        box = (max(0, -left), max(0, -top), min(layer.width, width - left), min(layer.height, height - top))
+        if box[2] > box[0] and box[3] > box[1]:
+            canvas.alpha_composite(layer.crop(box), (left + box[0], top + box[1]))
+
+    return canvas.convert("RGB")
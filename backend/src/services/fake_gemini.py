@@ -0,0 +1,70 @@
+"""
+Local fake Gemini provider for load testing and offline development
+"""
+import hashlib
+import os
+import time
+from io import BytesIO
+from typing import Any
+
+from google.genai import types
+from PIL import Image
+
+
+class _FakeModels:
+    """Mimics the ``client.models`` surface used by GeminiService"""
+
+    def __init__(self, latency_seconds: float, image_size: int):
+        self.latency_seconds = latency_seconds
+        self.image_size = image_size
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        """
+        Return a response shaped like a real Gemini image response
+
+        The image is a solid PNG whose colour is derived from the text prompt, so
+        identical prompts always produce identical bytes.
+        """
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        prompt = contents if isinstance(contents, str) else next(
+            (item for item in contents if isinstance(item, str)), ""
+        )
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+        buffer = BytesIO()
+        Image.new("RGB", (self.image_size, self.image_size), color=tuple(digest[:3])).save(buffer, format="PNG")
+
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role="model",
+                        parts=[
+                            types.Part(text="Here is the generated image."),
+                            types.Part(inline_data=types.Blob(data=buffer.getvalue(), mime_type="image/png")),
+                        ],
+                    )
+                )
+            ]
+        )
+
+
+class FakeGeminiClient:
+    """Drop-in replacement for ``genai.Client`` that never leaves the process"""
+
+    def __init__(self, latency_seconds: float = 0.0, image_size: int = 512):
+        self.models = _FakeModels(latency_seconds, image_size)
+
+    @classmethod
+    def from_env(cls) -> "FakeGeminiClient":
+        """
+        Build a fake client from environment configuration
+
+        GEMINI_FAKE_LATENCY_MS simulates upstream latency per call and
+        GEMINI_FAKE_IMAGE_SIZE sets the edge length of generated images.
+        """
+        latency_ms = float(os.getenv("GEMINI_FAKE_LATENCY_MS", "0"))
+        image_size = int(os.getenv("GEMINI_FAKE_IMAGE_SIZE", "512"))
+        return cls(latency_seconds=latency_ms / 1000, image_size=image_size)
@@ -1,13 +1,59 @@
 import os
 from dotenv import load_dotenv
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from google import genai
 from google.genai import types
+import logging
 import uuid
 from pathlib import Path
 import base64
+import time
 from io import BytesIO
-from PIL import Image
+
+from ..metrics import GEMINI_ERRORS, GEMINI_REQUEST_DURATION, IMAGE_BYTES_SAVED
+from ..tracing import tracer
+
+from .compositor import composite
+from .fake_gemini import FakeGeminiClient
+from .image_guard import guarded_open, inspect_image
+from .image_pool import image_pool
+from .prompt_cache import prompt_cache, prompt_cache_enabled
+from .prompts import get_template, normalize_label
+
+logger = logging.getLogger(__name__)
+
+# Fusion approaches used when the caller doesn't choose, one variation each
+FUSION_STYLES = [
+    "seamlessly integrated composition",
+    "dramatic storytelling scene",
+    "professional brand presentation"
+]
+
+# Longest edge of inputs and output for draft-mode generations
+DRAFT_SIZE = int(os.getenv("DRAFT_IMAGE_SIZE", "512"))
+
+
+def normalize_png(image_data: bytes, max_size: Optional[int] = None) -> bytes:
+    """
+    Decode ``image_data`` within the image guard limits and re-encode it as PNG
+
+    Capped at ``max_size`` on the longest edge if given. Module-level, like
+    ``composite_reference_jpeg``, so it can run in the image pool.
+
+    Raises:
+        UnsafeImageError: if the input is not a decodable image within limits
+    """
+    buffer = BytesIO()
+    guarded_open(image_data, max_size).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def composite_reference_jpeg(character_data: bytes, product_data: bytes, background_data: bytes, style: str) -> bytes:
+    """Composite encoded inputs for ``style`` into a single JPEG reference image"""
+    reference = composite(guarded_open(character_data), guarded_open(product_data), guarded_open(background_data), style)
+    buffer = BytesIO()
+    reference.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
 
 class GeminiService:
     """Service for handling Gemini API interactions for image generation"""
@@ -15,18 +61,27 @@ class GeminiService:
     def __init__(self):
         load_dotenv()
         self.api_key = os.getenv("GOOGLE_API_KEY")
-        print(f"🔍 Gemini Service: API key loaded, length: {len(self.api_key) if self.api_key else 0}")
-        if not self.api_key or self.api_key == "your_actual_google_api_key_here" or len(self.api_key.strip()) < 20:
-            print("⚠️  Gemini Service: Using mock mode (invalid API key)")
+        self.provider = os.getenv("GEMINI_PROVIDER", "gemini").lower()
+        # Drafts may use a faster (cheaper) model than full generations
+        self.draft_model = os.getenv("GEMINI_DRAFT_MODEL")
+        # Send one locally composited reference image instead of three inputs
+        self.precomposite = os.getenv("FUSION_PRECOMPOSITE", "false").lower() in ("1", "true", "yes")
+        logger.debug("Gemini API key loaded", extra={"api_key_length": len(self.api_key) if self.api_key else 0})
+        if self.provider == "fake":
+            logger.info("Gemini service using local fake provider")
+            self.client = FakeGeminiClient.from_env()
+            self.model = "gemini-2.0-flash-exp"
+        elif not self.api_key or self.api_key == "your_actual_google_api_key_here" or len(self.api_key.strip()) < 20:
+            logger.warning("Gemini service using mock mode (invalid API key)")
             self.client = None
             self.model = "gemini-2.0-flash-exp"
         else:
             try:
                 self.client = genai.Client(api_key=self.api_key)
                 self.model = "gemini-2.0-flash-exp"
-                print("✅ Gemini Service: Client initialized successfully")
-            except Exception as e:
-                print(f"❌ Gemini Service: Failed to initialize client: {e}")
+                logger.info("Gemini client initialized")
+            except Exception:
+                logger.error("Failed to initialize Gemini client", exc_info=True)
                 self.client = None
 
         # Ensure uploads directories exist
@@ -73,8 +128,10 @@ class GeminiService:
         file_path = Path(dir_path) / filename
 
         # Save image
-        with open(file_path, "wb") as f:
-            f.write(image_data)
+        with tracer.start_as_current_span("storage.save_image", attributes={"image.type": image_type, "image.bytes": len(image_data)}):
+            with open(file_path, "wb") as f:
+                f.write(image_data)
+        IMAGE_BYTES_SAVED.labels(image_type=image_type).inc(len(image_data))
 
         # Return URL path
         url_path = f"/uploads/{image_type}s/{filename}"
@@ -82,6 +139,35 @@ class GeminiService:
             url_path = f"/uploads/final/{filename}"  # Use "final" without 's' for consistency
         return url_path
 
+    def _generate_content(self, method: str, contents, model: Optional[str] = None):
+        """
+        Call the Gemini API, recording latency and failures for ``method``
+
+        Args:
+            method: Name of the calling service method, used as the metric label
+            contents: Prompt and optional images to send
+            model: Model override, defaults to the service model
+
+        Returns:
+            Raw Gemini API response
+        """
+        model = model or self.model
+        start_time = time.perf_counter()
+        with tracer.start_as_current_span("gemini.generate_content", attributes={"gemini.method": method, "gemini.model": model}):
+            try:
+                return self.client.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=types.GenerateContentConfig(
+                        response_modalities=['Text', 'Image']
+                    )
+                )
+            except Exception:
+                GEMINI_ERRORS.labels(method=method).inc()
+                raise
+            finally:
+                GEMINI_REQUEST_DURATION.labels(method=method).observe(time.perf_counter() - start_time)
+
     def generate_character_image(self, details: str, personality: str) -> Optional[str]:
         """
         Generate a character image based on details and personality
@@ -94,22 +180,25 @@ class GeminiService:
             URL of generated image or None if failed
         """
         # Check if we have a valid API key
-        if not self.api_key or self.api_key == "your_actual_google_api_key_here":
-            print("ℹ️  Using mock image generation (no valid API key configured)")
+        if self.client is None:
+            logger.info("Using mock character image (no Gemini client)")
             # Return a mock image URL for testing purposes
             return "/uploads/mock-images/placeholder.png"
 
-        prompt = f"Create a photorealistic image of a character: {details}. Personality: {personality}. Professional appearance suitable for brand storytelling."
+        template = get_template("character")
+        prompt = template.render(details=details, personality=personality)
+
+        # Reuse the image from a near-identical earlier request
+        cache_inputs = (details, personality)
+        if prompt_cache_enabled():
+            cached_url = prompt_cache.lookup(template.id, cache_inputs)
+            if cached_url:
+                logger.info("Reusing cached character image", extra={"image_url": cached_url})
+                return cached_url
 
         try:
             # Generate image with Gemini
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=['Text', 'Image']
-                )
-            )
+            response = self._generate_content("generate_character_image", prompt)
 
             # Extract and save the generated image
             for part in response.candidates[0].content.parts:
@@ -120,15 +209,17 @@ class GeminiService:
                     # Save locally and return URL
                     filename = f"character_{uuid.uuid4()}.png"
                     local_url = self._save_image_locally(image_data, "character", filename)
-                    print(f"✅ Character image saved locally: {local_url}")
+                    logger.info("Character image saved", extra={"image_url": local_url})
+                    if prompt_cache_enabled():
+                        prompt_cache.store(template.id, cache_inputs, local_url)
                     return local_url
 
             # If no image data found, return placeholder
-            print("⚠️  No image data in response, using placeholder")
+            logger.warning("No image data in Gemini response, using placeholder")
             return "/uploads/mock-images/placeholder.png"
 
-        except Exception as e:
-            print(f"Error generating character image: {e}")
+        except Exception:
+            logger.error("Error generating character image", exc_info=True)
             return "/uploads/mock-images/placeholder.png"
 
     def generate_product_image(self, name: str, description: str) -> Optional[str]:
@@ -143,22 +234,16 @@ class GeminiService:
             URL of generated image or None if failed
         """
         # Check if we have a valid API key
-        if not self.api_key or self.api_key == "your_actual_google_api_key_here" or len(self.api_key.strip()) < 20 or self.client is None:
-            print("ℹ️  Using mock product image generation (no valid API key or client)")
+        if self.client is None:
+            logger.info("Using mock product image (no Gemini client)")
             # Return a mock image URL for testing purposes
             return f"/uploads/mock-images/placeholder.png"
 
-        prompt = f"Create a photorealistic image of the product: {name}. Description: {description}. High-quality product photography suitable for brand storytelling."
+        prompt = get_template("product").render(name=name, description=description)
 
         try:
             # Generate image with Gemini
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=['Text', 'Image']
-                )
-            )
+            response = self._generate_content("generate_product_image", prompt)
 
             # Extract and save the generated image
             for part in response.candidates[0].content.parts:
@@ -169,15 +254,15 @@ class GeminiService:
                     # Save locally and return URL
                     filename = f"product_{uuid.uuid4()}.png"
                     local_url = self._save_image_locally(image_data, "product", filename)
-                    print(f"✅ Product image saved locally: {local_url}")
+                    logger.info("Product image saved", extra={"image_url": local_url})
                     return local_url
 
             # If no image data found, return placeholder
-            print("⚠️  No image data in response, using placeholder")
+            logger.warning("No image data in Gemini response, using placeholder")
             return "/uploads/mock-images/placeholder.png"
 
-        except Exception as e:
-            print(f"Error generating product image: {e}")
+        except Exception:
+            logger.error("Error generating product image", exc_info=True)
             return "/uploads/mock-images/placeholder.png"
 
     def generate_background_image(self, scene_details: str, lighting: str) -> Optional[str]:
@@ -192,21 +277,24 @@ class GeminiService:
             URL of generated image or None if failed
         """
         # Check if we have a valid API key
-        if not self.api_key or self.api_key == "your_actual_google_api_key_here" or len(self.api_key.strip()) < 20 or self.client is None:
-            print("ℹ️  Using mock background image generation (no valid API key or client)")
+        if self.client is None:
+            logger.info("Using mock background image (no Gemini client)")
             # Return a mock image URL for testing purposes
             return "/'upload's/mock-images/placeholder.png"
 
-        prompt = f"Create a photorealistic background image: {scene_details}. Lighting: {lighting}. Suitable for brand storytelling and professional presentation."
+        template = get_template("background")
+        prompt = template.render(scene_details=scene_details, lighting=lighting)
+
+        # Reuse the image from a near-identical earlier request
+        cache_inputs = (scene_details, lighting)
+        if prompt_cache_enabled():
+            cached_url = prompt_cache.lookup(template.id, cache_inputs)
+            if cached_url:
+                logger.info("Reusing cached background image", extra={"image_url": cached_url})
+                return cached_url
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=['Text', 'Image']
-                )
-            )
+            response = self._generate_content("generate_background_image", prompt)
 
             # Extract and save the generated image
             for part in response.candidates[0].content.parts:
@@ -217,19 +305,22 @@ class GeminiService:
                     # Save locally and return URL
                     filename = f"background_{uuid.uuid4()}.png"
                     local_url = self._save_image_locally(image_data, "background", filename)
-                    print(f"✅ Background image saved locally: {local_url}")
+                    logger.info("Background image saved", extra={"image_url": local_url})
+                    if prompt_cache_enabled():
+                        prompt_cache.store(template.id, cache_inputs, local_url)
                     return local_url
 
             # If no image data found, return placeholder
-            print("⚠️  No image data in response, using placeholder")
+            logger.warning("No image data in Gemini response, using placeholder")
             return "/uploads/mock-images/placeholder.png"
 
-        except Exception as e:
-            print(f"Error generating background image: {e}")
+        except Exception:
+            logger.error("Error generating background image", exc_info=True)
             return "/uploads/mock-images/placeholder.png"
 
     def generate_final_images(self, character_image_data: bytes, product_image_data: bytes,
-                            background_image_data: bytes, story: str) -> List[dict]:
+                            background_image_data: bytes, story: str,
+                            styles: Optional[List[str]] = None, draft: bool = False) -> List[dict]:
         """
         Generate final brand storytelling images by fusing character, product, and background images with story
 
@@ -238,93 +329,144 @@ class GeminiService:
             product_image_data: Binary data of uploaded product image
             background_image_data: Binary data of generated background image
             story: Brand story narrative
+            styles: Fusion style per variation, defaults to FUSION_STYLES
+            draft: Generate quick low-resolution drafts (inputs and output capped at DRAFT_SIZE)
 
         Returns:
             List of dicts with fused image URLs and prompts
         """
-        # Check if we're using mock data
-        is_mock_data = (
-            character_image_data == b"mock_character_image_data" or
-            product_image_data == b"mock_product_image_data" or
-            background_image_data == b"mock_background_image_data" or
-            character_image_data in [b"mock_char", b"mock_character"] or
-            product_image_data in [b"mock_prod", b"mock_product"] or
-            background_image_data in [b"mock_bg", b"mock_background"]
-        )
-
         images = []
+        for image in self.iter_final_images(character_image_data, product_image_data,
+                                            background_image_data, story, styles, draft):
+            image.pop("image_data", None)
+            images.append(image)
+        return images
+
+    def iter_final_images(self, character_image_data: bytes, product_image_data: bytes,
+                          background_image_data: bytes, story: str,
+                          styles: Optional[List[str]] = None, draft: bool = False) -> Iterator[dict]:
+        """
+        Generate final fused images, yielding each variation as soon as it completes
+
+        Takes the same arguments as ``generate_final_images``. Successful
+        variations also carry the raw PNG bytes under ``image_data`` so
+        callers can deliver them without reading the saved file back.
 
-        # Real image fusion code (currently unreachable due to early return above)
+        Yields:
+            Dicts with fused image URL, prompt, fusion style and image data
+        """
         try:
-            character_img = Image.open(BytesIO(character_image_data))
-            product_img = Image.open(BytesIO(product_image_data))
-            background_img = Image.open(BytesIO(background_image_data))
-        except Exception as e:
-            print(f"Error loading images for fusion: {e}")
-            return []
-
-        # Create 3 variations with different fusion approaches
-        fusion_styles = [
-            "seamlessly integrated composition",
-            "dramatic storytelling scene",
-            "professional brand presentation"
-        ]
+            character_png, product_png, background_png = self.decode_images(
+                character_image_data, product_image_data, background_image_data
+            )
+        except Exception:
+            logger.error("Error loading images for fusion", exc_info=True)
+            return
 
-        for i, style in enumerate(fusion_styles, 1):
-            prompt = f"""Create a compelling brand storytelling image by fusing these elements:
+        yield from self.iter_fused_images(character_png, product_png, background_png, story, styles, draft)
+
+    def decode_images(self, *image_data: bytes) -> List[bytes]:
+        """
+        Validate and normalize fusion inputs to PNG bytes in the image pool
+
+        Decoding happens in a worker process; only the re-encoded PNGs come
+        back, so they can be shared across calls and threads.
 
-Story: {story}
+        Raises:
+            UnsafeImageError: if an input is not a decodable image within limits
+        """
+        with tracer.start_as_current_span("image.decode"):
+            return [image_pool.call(normalize_png, data) for data in image_data]
+
+    def iter_fused_images(self, character_png: bytes, product_png: bytes,
+                          background_png: bytes, story: str,
+                          styles: Optional[List[str]] = None, draft: bool = False) -> Iterator[dict]:
+        """
+        Fuse inputs already normalized by ``decode_images``, yielding each variation as it completes
+
+        Same output as ``iter_final_images``; callers generating many stories
+        from the same components decode them once and call this directly.
+        """
+        # One variation per fusion style
+        fusion_styles = styles or FUSION_STYLES
+        model = None
+        if draft:
+            # Smaller inputs mean a smaller upload and a faster model turn
+            character_png, product_png, background_png = (
+                self._downscale_bytes(data, DRAFT_SIZE) for data in (character_png, product_png, background_png)
+            )
+            model = self.draft_model
 
-Fusion Style: {style}
+        template = get_template("fusion-reference" if self.precomposite else "fusion")
 
-Combine the character, product, and background into a single, cohesive image that tells the brand story. Ensure all elements are harmoniously integrated and the composition supports the narrative effectively."""
+        for i, style in enumerate(fusion_styles, 1):
+            # Style presets are compiled once and reused across calls
+            style = normalize_label(style)
+            prompt = template.preset(style=style).render(story=story)
 
             try:
-                # Use Gemini's multi-image fusion capability
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=[
-                        prompt,
-                        character_img,
-                        product_img,
-                        background_img
-                    ],
-                    config=types.GenerateContentConfig(
-                        response_modalities=['Text', 'Image']
-                    )
-                )
+                if self.precomposite:
+                    contents = [prompt, self._composite_reference(character_png, product_png, background_png, style)]
+                else:
+                    # Use Gemini's multi-image fusion capability
+                    contents = [prompt] + [
+                        types.Part.from_bytes(data=data, mime_type="image/png")
+                        for data in (character_png, product_png, background_png)
+                    ]
+                response = self._generate_content("generate_final_images", contents, model)
 
                 # Extract and save the fused image
                 for part in response.candidates[0].content.parts:
                     if part.inline_data:
                         # Convert inline data to bytes
                         image_data = part.inline_data.data
+                        if draft:
+                            image_data = self._downscale_bytes(image_data, DRAFT_SIZE)
 
                         # Save locally and return URL
-                        filename = f"final_{uuid.uuid4()}.png"
+                        filename = f"{'draft' if draft else 'final'}_{uuid.uuid4()}.png"
                         local_url = self._save_image_locally(image_data, "final", filename)
-                        print(f"✅ Final fused image saved locally: {local_url}")
+                        logger.info("Final fused image saved", extra={"image_url": local_url, "fusion_style": style, "draft": draft})
 
-                        images.append({
+                        yield {
                             "id": f"fused_img_{i}",
                             "prompt": prompt,
                             "image_url": local_url,
-                            "fusion_style": style
-                        })
+                            "fusion_style": style,
+                            "prompt_template_id": template.id,
+                            "draft": draft,
+                            "image_data": image_data
+                        }
                         break
 
             except Exception as e:
-                print(f"Error generating fused image {i}: {e}")
+                logger.error("Error generating fused image", extra={"variation": i, "fusion_style": style}, exc_info=True)
                 # Add placeholder for failed fusion
-                images.append({
+                yield {
                     "id": f"fused_img_{i}",
                     "prompt": prompt,
                     "image_url": "/uploads/mock-images/placeholder.png",
                     "fusion_style": style,
+                    "prompt_template_id": template.id,
+                    "draft": draft,
                     "error": str(e)
-                })
+                }
 
-        return images
+    def _downscale_bytes(self, image_data: bytes, max_size: int) -> bytes:
+        """Re-encode image bytes as a PNG no larger than ``max_size``"""
+        info = inspect_image(image_data)
+        if max(info.width, info.height) <= max_size:
+            return image_data
+        return image_pool.call(normalize_png, image_data, max_size)
+
+    def _composite_reference(self, character_png: bytes, product_png: bytes,
+                             background_png: bytes, style: str) -> types.Part:
+        """
+        Composite the inputs for ``style`` into a single JPEG reference image part
+        """
+        with tracer.start_as_current_span("image.composite", attributes={"fusion.style": style}):
+            reference = image_pool.call(composite_reference_jpeg, character_png, product_png, background_png, style)
+        return types.Part.from_bytes(data=reference, mime_type="image/jpeg")
 
     def _extract_image_url(self, response) -> Optional[str]:
         """
@@ -342,7 +484,7 @@ Combine the character, product, and background into a single, cohesive image tha
                     # In production, upload to cloud storage and return public URL
                     # For now, return a placeholder filename
                     return f"generated_image_{hash(str(part.inline_data.data))}.png"
-        except Exception as e:
-            print(f"Error extracting image URL: {e}")
+        except Exception:
+            logger.error("Error extracting image URL", exc_info=True)
 
         return None
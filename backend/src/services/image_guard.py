@@ -0,0 +1,125 @@
+"""
+Guarded image decoding
+
+Every image that comes from outside the process (uploads, stored component
+images, model output) is decoded through here. The header is parsed first,
+which costs almost nothing, and files are rejected before any pixel data
+is decoded when:
+
+- the format isn't one we handle (PNG, JPEG, WebP);
+- either edge exceeds IMAGE_MAX_DIMENSION, or the pixel count exceeds
+  IMAGE_MAX_PIXELS (decompression bombs: a few KB of PNG can declare
+  gigapixels);
+- the decoded bitmap would need more than IMAGE_MAX_DECODE_MB of memory.
+
+When the caller only needs a bounded size, JPEGs are decoded at a reduced
+DCT scale (``draft``), so a 48MP photo never exists at full resolution in
+memory, and the memory budget is checked against the reduced size.
+
+Pillow's own global pixel limit is set to the same value as a backstop for
+any decode that doesn't go through here.
+"""
+import math
+import os
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from PIL import Image, UnidentifiedImageError
+
+from ..tracing import tracer
+
+ALLOWED_FORMATS = frozenset(("PNG", "JPEG", "MPO", "WEBP"))
+MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "16384"))
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+MAX_DECODE_BYTES = int(float(os.getenv("IMAGE_MAX_DECODE_MB", "256")) * 1024 * 1024)
+
+# Pillow raises DecompressionBombError above twice this for any decode
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+# Bytes per pixel of Pillow's in-memory storage; multi-band modes use 4
+_BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "I;16": 2, "I;16B": 2, "I;16L": 2}
+
+
+class UnsafeImageError(ValueError):
+    """Raised for images that are not decoded because they are invalid or too large"""
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+    mode: str
+
+
+def decoded_size(width: int, height: int, mode: str) -> int:
+    """Approximate memory, in bytes, of a decoded ``mode`` bitmap"""
+    return width * height * _BYTES_PER_PIXEL.get(mode, 4)
+
+
+def _check(image: Image.Image) -> ImageInfo:
+    if image.format not in ALLOWED_FORMATS:
+        raise UnsafeImageError(f"Unsupported image format: {image.format or 'unknown'}")
+    width, height = image.size
+    if width < 1 or height < 1 or max(width, height) > MAX_DIMENSION:
+        raise UnsafeImageError(f"Image dimensions {width}x{height} are out of range (max {MAX_DIMENSION}px per edge)")
+    if width * height > MAX_PIXELS:
+        raise UnsafeImageError(f"Image has {width * height} pixels; the limit is {MAX_PIXELS}")
+    return ImageInfo(image.format, width, height, image.mode)
+
+
+def _open(image_data: bytes) -> Image.Image:
+    try:
+        return Image.open(BytesIO(image_data))
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise UnsafeImageError(str(e)) from e
+
+
+def inspect_image(image_data: bytes) -> ImageInfo:
+    """
+    Validate an image from its header alone, without decoding pixels
+
+    Raises:
+        UnsafeImageError: if the image must not be decoded
+    """
+    image = _open(image_data)
+    try:
+        info = _check(image)
+    finally:
+        image.close()
+    if decoded_size(info.width, info.height, info.mode) > MAX_DECODE_BYTES:
+        raise UnsafeImageError(f"Decoding a {info.width}x{info.height} image would exceed the memory budget")
+    return info
+
+
+def guarded_open(image_data: bytes, max_size: Optional[int] = None) -> Image.Image:
+    """
+    Decode an image within the configured limits
+
+    Args:
+        image_data: Encoded image bytes
+        max_size: If given, the result is no larger than this on its
+            longest edge, and JPEGs are decoded at reduced scale to get there
+
+    Returns:
+        A loaded image, detached from ``image_data``
+
+    Raises:
+        UnsafeImageError: if the image must not be decoded
+    """
+    with tracer.start_as_current_span("image.guarded_decode"):
+        image = _open(image_data)
+        info = _check(image)
+        if max_size is not None and max(info.width, info.height) > max_size:
+            # draft keeps both edges at least the requested size, so ask for
+            # the aspect-preserving target; a no-op for formats other than JPEG
+            scale = max_size / max(info.width, info.height)
+            image.draft(image.mode, (math.ceil(info.width * scale), math.ceil(info.height * scale)))
+        if decoded_size(*image.size, image.mode) > MAX_DECODE_BYTES:
+            raise UnsafeImageError(f"Decoding a {info.width}x{info.height} image would exceed the memory budget")
+        try:
+            image.load()
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+            raise UnsafeImageError(f"Could not decode image: {e}") from e
+        if max_size is not None:
+            image.thumbnail((max_size, max_size))
+        return image
@@ -0,0 +1,209 @@
+"""
+Process pool for CPU-bound image work
+
+Pillow holds the GIL for much of its decode, resize and encode work, so
+running it in the request thread pool still competes with the event loop and
+with every other request for one core. Work submitted here runs in separate
+worker processes instead.
+
+Tasks are plain module-level functions over bytes (e.g. ``remove_background``
+or ``render_preview``): they are pickled by reference and the worker imports
+them. Byte arguments and results of at least IMAGE_POOL_SHM_MIN_BYTES travel
+through ``multiprocessing.shared_memory`` blocks rather than the pool's pipe.
+This is not zero-copy: the sender copies the payload into the block and the
+receiver copies it back out into ``bytes``, because Pillow and the task
+functions want immutable bytes that outlive the block. It still avoids
+pickling the payload and streaming it through the pipe in chunks.
+
+The pool is started with the app (IMAGE_POOL_WORKERS processes, default up
+to 4, ``0`` disables). Workers are spawned and warmed at startup, importing
+Pillow and the image modules up front so the first request doesn't pay for it.
+Until it is started, after shutdown, or if a worker dies, tasks run inline
+in the calling thread.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, NamedTuple, Optional, TypeVar
+
+from PIL import Image
+
+from ..metrics import IMAGE_POOL_TASK_DURATION
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SHM_MIN_BYTES = int(os.getenv("IMAGE_POOL_SHM_MIN_BYTES", "65536"))
+
+# Imported by each worker at startup; these define the tasks run here
+WARM_MODULES = ("background_removal", "previews", "gemini_service")
+
+
+def pool_workers() -> int:
+    """Configured worker count; 0 means image work runs inline"""
+    default = min(4, os.cpu_count() or 1)
+    return max(0, int(os.getenv("IMAGE_POOL_WORKERS", str(default))))
+
+
+class SharedBytes(NamedTuple):
+    """Picklable handle to bytes held in a shared memory block"""
+    name: str
+    size: int
+
+
+def _share(data: bytes) -> SharedBytes:
+    block = SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    block.close()
+    return SharedBytes(block.name, len(data))
+
+
+def _read(handle: SharedBytes, unlink: bool = False) -> bytes:
+    block = SharedMemory(name=handle.name)
+    try:
+        return bytes(block.buf[:handle.size])
+    finally:
+        block.close()
+        if unlink:
+            block.unlink()
+
+
+def _release(handle: SharedBytes):
+    try:
+        block = SharedMemory(name=handle.name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def _warm_worker():
+    Image.init()
+    for name in WARM_MODULES:
+        importlib.import_module(f"{__package__}.{name}")
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def _invoke(fn: Callable[..., Any], args: tuple, shm_min_bytes: int) -> Any:
+    """Worker side: resolve shared arguments, run ``fn`` and share a large result"""
+    args = tuple(_read(arg) if isinstance(arg, SharedBytes) else arg for arg in args)
+    result = fn(*args)
+    if isinstance(result, bytes) and len(result) >= shm_min_bytes:
+        return _share(result)
+    return result
+
+
+class ImagePool:
+    """
+    Warm worker processes for image tasks, with a shared-memory transport
+
+    ``call`` blocks until the task finishes, so callers keep their existing
+    shape: request handlers run it in the thread pool as before, and the
+    thread just waits while the work happens on another core.
+    """
+
+    def __init__(self, workers: int, shm_min_bytes: int = SHM_MIN_BYTES):
+        self.workers = workers
+        self.shm_min_bytes = shm_min_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ImagePool":
+        return cls(pool_workers())
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self, wait: bool = False):
+        """
+        Spawn and warm the workers; a no-op if disabled or already running
+
+        Args:
+            wait: Block until every worker has finished warming up
+        """
+        with self._lock:
+            if self._executor is not None or self.workers < 1:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=_warm_worker,
+            )
+            # Workers are spawned on demand; one task each brings them all up now
+            pending = [self._executor.submit(_ready) for _ in range(self.workers)]
+        logger.info("Image worker pool starting", extra={"workers": self.workers})
+        if wait:
+            for future in pending:
+                future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def call(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run ``fn(*args)`` in a worker process, or inline if the pool isn't running
+
+        ``fn`` must be importable at module level; exceptions it raises are
+        re-raised here.
+        """
+        executor = self._executor
+        task = fn.__name__
+        started = time.perf_counter()
+        with tracer.start_as_current_span("image_pool.task", attributes={"image_pool.task": task}):
+            if executor is None:
+                mode = "inline"
+                result = fn(*args)
+            else:
+                mode = "process"
+                result = self._call_in_worker(executor, fn, args)
+        IMAGE_POOL_TASK_DURATION.labels(task=task, mode=mode).observe(time.perf_counter() - started)
+        return result
+
+    def _call_in_worker(self, executor: ProcessPoolExecutor, fn: Callable[..., T], args: tuple) -> T:
+        shared: List[SharedBytes] = []
+        packed = []
+        for arg in args:
+            if isinstance(arg, (bytes, bytearray, memoryview)) and len(arg) >= self.shm_min_bytes:
+                handle = _share(arg)
+                shared.append(handle)
+                arg = handle
+            packed.append(arg)
+        try:
+            result = executor.submit(_invoke, fn, tuple(packed), self.shm_min_bytes).result()
+        except BrokenProcessPool:
+            logger.error("Image worker pool broke; running task inline and restarting the pool", exc_info=True)
+            self._restart(executor)
+            return fn(*args)
+        finally:
+            for handle in shared:
+                _release(handle)
+        if isinstance(result, SharedBytes):
+            return _read(result, unlink=True)
+        return result
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+
+image_pool = ImagePool.from_env()
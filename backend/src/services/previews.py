@@ -0,0 +1,129 @@
+"""
+Progressive preview frames for in-flight generations
+
+Gemini image responses are not progressive, so the preview is a fast local
+blurred composite of the three inputs, published the moment generation starts
+and followed by an event per finished variation. Events are fanned out per
+project to any number of subscribers (the SSE endpoint) through an in-process
+broker; nothing is rendered when a project has no subscribers.
+"""
+import asyncio
+import base64
+import logging
+import os
+import threading
+from collections import defaultdict
+from io import BytesIO
+from typing import Dict, Optional, Set, Tuple
+
+from PIL import Image, ImageFilter
+
+from .compositor import composite
+from .image_guard import guarded_open
+from .image_pool import image_pool
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SIZE = int(os.getenv("PREVIEW_SIZE", "256"))
+PREVIEW_BLUR_RADIUS = float(os.getenv("PREVIEW_BLUR_RADIUS", "6"))
+# Per-subscriber backlog; the oldest events are dropped when a client falls behind
+PREVIEW_QUEUE_SIZE = 32
+
+
+class PreviewBroker:
+    """
+    Fan out generation events to subscribers, keyed by project
+
+    ``publish`` is safe to call from worker threads; events are handed to each
+    subscriber's event loop with ``call_soon_threadsafe``.
+    """
+
+    def __init__(self, queue_size: int = PREVIEW_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, project_id: str) -> asyncio.Queue:
+        """Register a queue on the running event loop for ``project_id`` events"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[project_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, project_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is None:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[project_id]
+
+    def has_subscribers(self, project_id: str) -> bool:
+        return bool(self._subscribers.get(project_id))
+
+    def publish(self, project_id: str, event: dict):
+        """Deliver ``event`` to every current subscriber of ``project_id``"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_dropping_oldest, queue, event)
+            except RuntimeError:
+                # Subscriber's loop already closed; it unsubscribes on its way out
+                pass
+
+
+def _put_dropping_oldest(queue: asyncio.Queue, event: dict):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+preview_broker = PreviewBroker()
+
+
+def _load_thumbnail(image_data: bytes, size: int) -> Optional[Image.Image]:
+    """Decode just enough of an image to produce a ``size`` thumbnail"""
+    try:
+        return guarded_open(image_data, size)
+    except Exception:
+        return None
+
+
+def render_preview(character_image_data: bytes, product_image_data: bytes,
+                   background_image_data: bytes, style: Optional[str] = None,
+                   size: int = PREVIEW_SIZE, blur_radius: float = PREVIEW_BLUR_RADIUS) -> bytes:
+    """
+    Render a blurred low-resolution composite of the generation inputs
+
+    Uses the same layout as the pre-composite sent upstream. Inputs that
+    can't be decoded (e.g. mock data) are skipped.
+
+    Returns:
+        JPEG bytes no larger than ``size`` on either edge
+    """
+    background = _load_thumbnail(background_image_data, size)
+    if background is None:
+        background = Image.new("RGB", (size, size), (128, 128, 128))
+    preview = composite(
+        _load_thumbnail(character_image_data, size),
+        _load_thumbnail(product_image_data, size),
+        background,
+        style=style,
+        max_size=size,
+    ).filter(ImageFilter.GaussianBlur(blur_radius))
+    buffer = BytesIO()
+    preview.save(buffer, format="JPEG", quality=60)
+    return buffer.getvalue()
+
+
+def preview_event(character_image_data: bytes, product_image_data: bytes,
+                  background_image_data: bytes) -> Optional[dict]:
+    """Build a "preview" event, or None if the composite could not be rendered"""
+    try:
+        data = image_pool.call(render_preview, character_image_data, product_image_data, background_image_data)
+    except Exception:
+        logger.warning("Failed to render generation preview", exc_info=True)
+        return None
+    return {"type": "preview", "content_type": "image/jpeg", "data": base64.b64encode(data).decode("ascii")}
@@ -0,0 +1,150 @@
+"""
+Near-duplicate prompt cache for component image generation
+
+Prompts are keyed by their template id plus the user inputs that filled
+it. Each input is embedded as a hashed character n-gram vector (no model
+weights, pure Python), and a lookup hits when every input is at least
+``threshold`` cosine-similar to a cached entry's. So "a friendly barista in a
+cafe" reuses the image made for "friendly barista in a café", while a
+different personality or lighting still misses.
+
+Enabled with PROMPT_CACHE_ENABLED=true. Entries live in process memory,
+bounded by PROMPT_CACHE_MAX_ENTRIES with least-recently-used eviction.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..metrics import record_cache_lookup
+
+# Sparse vector: hashed feature index -> weight
+Vector = Dict[int, float]
+
+VECTOR_DIMENSIONS = 1 << 16
+NGRAM_SIZE = 3
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def prompt_cache_enabled() -> bool:
+    return os.getenv("PROMPT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _canonical(text: str) -> List[str]:
+    """Words of ``text`` with accents, punctuation and case removed"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", stripped.casefold()).split()
+
+
+def _feature_index(feature: str) -> Tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    # Random sign keeps hash collisions from only ever adding similarity
+    return value % VECTOR_DIMENSIONS, 1.0 if value >> 63 else -1.0
+
+
+def embed(text: str) -> Vector:
+    """
+    L2-normalized hashed vector of word unigrams and character n-grams
+
+    N-grams are taken per word with boundary markers, so small spelling
+    differences (café / caf / cafe) keep most of their features.
+    """
+    vector: Vector = {}
+    for word in _canonical(text):
+        features = [f"w:{word}"]
+        padded = f"<{word}>"
+        features += [padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))]
+        for feature in features:
+            index, sign = _feature_index(feature)
+            vector[index] = vector.get(index, 0.0) + sign
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {index: weight / norm for index, weight in vector.items()} if norm else {}
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+class SemanticPromptCache:
+    """
+    In-process index of generated images keyed by prompt inputs
+
+    Exact canonical matches are a dict lookup; otherwise entries in the same
+    namespace (template id) are scanned and the most similar one above the
+    threshold wins.
+    """
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # (namespace, canonical inputs) -> (vectors, image_url)
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[List[Vector], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SemanticPromptCache":
+        return cls(
+            threshold=float(os.getenv("PROMPT_CACHE_THRESHOLD", "0.85")),
+            max_entries=int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    @staticmethod
+    def _key(namespace: str, inputs: Sequence[str]) -> Tuple[str, Tuple[str, ...]]:
+        return namespace, tuple(" ".join(_canonical(value)) for value in inputs)
+
+    def lookup(self, namespace: str, inputs: Sequence[str]) -> Optional[str]:
+        """
+        Image URL cached for inputs similar to ``inputs``, or None
+
+        Entries whose file has since been removed are dropped and miss.
+        """
+        key = self._key(namespace, inputs)
+        vectors = [embed(value) for value in inputs]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                best_score = self.threshold
+                for candidate_key, (candidate_vectors, image_url) in self._entries.items():
+                    if candidate_key[0] != namespace:
+                        continue
+                    score = min(cosine(a, b) for a, b in zip(vectors, candidate_vectors))
+                    if score >= best_score:
+                        best_score, key, entry = score, candidate_key, (candidate_vectors, image_url)
+
+            if entry is not None and not Path(entry[1].lstrip("/")).is_file():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        record_cache_lookup(f"{namespace.split('@')[0]}_prompt", entry is not None)
+        return entry[1] if entry is not None else None
+
+    def store(self, namespace: str, inputs: Sequence[str], image_url: str):
+        key = self._key(namespace, inputs)
+        vectors = [embed(value) for value in inputs]
+        with self._lock:
+            self._entries[key] = (vectors, image_url)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+prompt_cache = SemanticPromptCache.from_env()
@@ -0,0 +1,175 @@
+"""
+Versioned prompt templates
+
+Every prompt sent upstream is rendered from a registered template. Templates
+are parsed once at import; fusion style presets are compiled once per style.
+User input is normalized before substitution (Unicode form, whitespace,
+trailing punctuation and casing) so that inputs differing only in formatting
+render byte-identical prompts, which is what lets prompt-keyed caches hit.
+
+Changing a template's wording means registering a new version rather than
+editing the old one, so the ``prompt_template_id`` stored with an image
+always identifies the exact text that produced it.
+"""
+import re
+import threading
+import unicodedata
+from string import Formatter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+# (literal text, field name or None)
+Segment = Tuple[str, Optional[str]]
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """
+    Canonical form of free text: NFKC, single spaces, no trailing full stop,
+    first letter capitalized (the rest keeps its case, e.g. brand names)
+    """
+    value = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", value or "")).strip().rstrip(" .")
+    return value[:1].upper() + value[1:]
+
+
+def normalize_label(value: Optional[str]) -> str:
+    """Canonical form of short descriptors such as styles, lighting or traits"""
+    return normalize_text(value).casefold()
+
+
+class PromptTemplate:
+    """
+    A prompt with ``{field}`` placeholders, parsed once into literal segments
+
+    Fields listed in ``labels`` are normalized with ``normalize_label``;
+    all others with ``normalize_text``.
+    """
+
+    def __init__(self, name: str, version: int, text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.version = version
+        self.id = f"{name}@v{version}"
+        self.labels: FrozenSet[str] = frozenset(labels)
+        self._segments = self._compile(text)
+        self.fields = frozenset(field for _, field in self._segments if field)
+        self._presets: Dict[Tuple[Tuple[str, str], ...], "PromptTemplate"] = {}
+        self._presets_lock = threading.Lock()
+
+    @staticmethod
+    def _compile(text: str) -> List[Segment]:
+        segments = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            if format_spec or conversion:
+                raise ValueError(f"Prompt templates only support plain {{field}} placeholders, got {field!r}")
+            segments.append((literal, field or None))
+        return segments
+
+    def normalize(self, field: str, value: Optional[str]) -> str:
+        return normalize_label(value) if field in self.labels else normalize_text(value)
+
+    def render(self, **values: Optional[str]) -> str:
+        """Render the prompt; every field must be given"""
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Missing prompt fields for {self.id}: {', '.join(sorted(missing))}")
+        return "".join(
+            literal + (self.normalize(field, values[field]) if field else "")
+            for literal, field in self._segments
+        )
+
+    def preset(self, **values: Optional[str]) -> "PromptTemplate":
+        """
+        Template with some fields fixed, compiled once per distinct set of values
+
+        Keeps the parent's id: a preset renders exactly what the parent would.
+        """
+        key = tuple(sorted((field, self.normalize(field, value)) for field, value in values.items()))
+        with self._presets_lock:
+            preset = self._presets.get(key)
+            if preset is None:
+                preset = self._bind(dict(key))
+                self._presets[key] = preset
+        return preset
+
+    def _bind(self, fixed: Dict[str, str]) -> "PromptTemplate":
+        preset = PromptTemplate.__new__(PromptTemplate)
+        preset.name, preset.version, preset.id, preset.labels = self.name, self.version, self.id, self.labels
+        segments: List[Segment] = []
+        pending = ""
+        for literal, field in self._segments:
+            pending += literal
+            if field in fixed:
+                pending += fixed[field]
+            elif field:
+                segments.append((pending, field))
+                pending = ""
+        segments.append((pending, None))
+        preset._segments = segments
+        preset.fields = self.fields - fixed.keys()
+        preset._presets, preset._presets_lock = {}, threading.Lock()
+        return preset
+
+    def __repr__(self):
+        return f"<PromptTemplate(id='{self.id}')>"
+
+
+_TEMPLATES: Dict[str, Dict[int, PromptTemplate]] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    versions = _TEMPLATES.setdefault(template.name, {})
+    if template.version in versions:
+        raise ValueError(f"Prompt template {template.id} is already registered")
+    versions[template.version] = template
+    return template
+
+
+def get_template(name: str, version: Optional[int] = None) -> PromptTemplate:
+    """Look up a template by name, defaulting to its latest version"""
+    versions = _TEMPLATES[name]
+    return versions[max(versions) if version is None else version]
+
+
+def get_template_by_id(template_id: str) -> PromptTemplate:
+    """Look up a template by the id stored on image rows, e.g. ``fusion@v1``"""
+    name, _, version = template_id.rpartition("@v")
+    return get_template(name, int(version))
+
+
+register(PromptTemplate(
+    "character", 1,
+    "Create a photorealistic image of a character: {details}. Personality: {personality}. "
+    "Professional appearance suitable for brand storytelling.",
+    labels=["personality"],
+))
+
+register(PromptTemplate(
+    "product", 1,
+    "Create a photorealistic image of the product: {name}. Description: {description}. "
+    "High-quality product photography suitable for brand storytelling.",
+))
+
+register(PromptTemplate(
+    "background", 1,
+    "Create a photorealistic background image: {scene_details}. Lighting: {lighting}. "
+    "Suitable for brand storytelling and professional presentation.",
+    labels=["lighting"],
+))
+
+_FUSION_TEXT = """Create a compelling brand storytelling image by fusing these elements:
+
+Story: {story}
+
+Fusion Style: {style}
+
+Combine the character, product, and background into a single, cohesive image that tells the brand story. Ensure all elements are harmoniously integrated and the composition supports the narrative effectively."""
+
+register(PromptTemplate("fusion", 1, _FUSION_TEXT, labels=["style"]))
+
+# Used when the inputs are sent as one locally composited reference image
+register(PromptTemplate(
+    "fusion-reference", 1,
+    _FUSION_TEXT + "\n\nThe reference image is a rough layout with the character and product already "
+    "placed on the background. Use it for placement, then render the final image photorealistically.",
+    labels=["style"],
+))
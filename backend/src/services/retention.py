@@ -0,0 +1,277 @@
+"""
+Retention tiers for generated images the user didn't select
+
+Each generate call produces several variations and the user keeps one
+(``Image.selected_at``). Unselected final and draft images step down tiers:
+
+- full size, until RETENTION_DOWNSCALE_DAYS after creation;
+- ``downscaled``: re-encoded in place with the longest edge at most
+  RETENTION_DOWNSCALE_SIZE;
+- ``archived``, RETENTION_ARCHIVE_DAYS after that: moved out of
+  ``uploads/`` into a tar pack in ``uploads/archive/`` (``Image.archive_url``).
+  Packs are stored uncompressed; the PNG/JPEG payloads already are.
+
+Archived files come back transparently: a request for one through
+``/uploads`` extracts it from its pack (``RestoringStaticFiles``), and it
+steps down again RETENTION_ARCHIVE_DAYS after the restore.
+
+Files are only removed after the database records where they went, so an
+interrupted run leaves duplicates, never missing images. Pack files are
+referenced by ``archive_url``, which keeps them safe from the storage reaper
+until every image in them is gone.
+"""
+import asyncio
+import logging
+import os
+import tarfile
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from PIL import Image as PILImage
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from starlette.exceptions import HTTPException
+
+from ..database import session_for_scope, touch_project
+from ..project_cache import project_cache
+from ..metrics import ARCHIVE_RESTORES, RETENTION_BYTES_SAVED
+from ..models.base import utcnow
+from ..models.image import Image
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path("uploads")
+URL_PREFIX = "/uploads/"
+ARCHIVE_SUBDIR = "archive"
+RETAINED_TYPES = ("final", "draft")
+# Directories under uploads/ those image types are saved to; only files in
+# them are ever downscaled or archived
+RETAINED_DIRS = ("final",)
+
+DOWNSCALED = "downscaled"
+ARCHIVED = "archived"
+
+DOWNSCALE_DAYS = float(os.getenv("RETENTION_DOWNSCALE_DAYS", "7"))
+ARCHIVE_DAYS = float(os.getenv("RETENTION_ARCHIVE_DAYS", "30"))
+DOWNSCALE_SIZE = int(os.getenv("RETENTION_DOWNSCALE_SIZE", "1024"))
+PACK_MAX_FILES = int(os.getenv("RETENTION_PACK_MAX_FILES", "500"))
+
+
+class RetentionReport(NamedTuple):
+    downscaled: int
+    archived: int
+    bytes_saved: int
+
+
+def path_for(image_url: str, root: Path = UPLOADS_DIR) -> Optional[Path]:
+    """Local file for an /uploads URL, or None for other kinds of URL"""
+    if not image_url or not image_url.startswith(URL_PREFIX):
+        return None
+    return root / image_url[len(URL_PREFIX):]
+
+
+def _replace_atomically(path: Path, write):
+    """Write a sibling temp file with ``write(file)`` and move it over ``path``"""
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def downscale_file(path: Path, max_size: int = DOWNSCALE_SIZE) -> int:
+    """
+    Shrink an image in place to fit ``max_size``, keeping its format
+
+    Returns:
+        Bytes saved (0 if the image was already small enough)
+    """
+    before = path.stat().st_size
+    with PILImage.open(path) as image:
+        if max(image.size) <= max_size:
+            return 0
+        image_format = image.format
+        image.thumbnail((max_size, max_size), PILImage.LANCZOS)
+        _replace_atomically(path, lambda f: image.save(f, format=image_format, optimize=True))
+    return max(0, before - path.stat().st_size)
+
+
+def _eligible(db: Session):
+    """
+    Unselected generated images whose file belongs to that image alone
+
+    Failed variations point at the shared placeholder under mock-images, and
+    a file any other row references is not this image's to shrink or move.
+    """
+    shared = select(Image.image_url).group_by(Image.image_url).having(func.count(Image.id) > 1)
+    return db.query(Image).filter(
+        Image.image_type.in_(RETAINED_TYPES),
+        Image.selected_at.is_(None),
+        or_(*(Image.image_url.startswith(f"{URL_PREFIX}{directory}/") for directory in RETAINED_DIRS)),
+        Image.image_url.not_in(shared),
+    )
+
+
+def _commit_tier_change(db: Session, images: Iterable[Image]):
+    """Commit tier changes, moving the affected projects' validators"""
+    project_ids = {image.project_id for image in images}
+    for project_id in project_ids:
+        touch_project(db, project_id)
+    db.commit()
+    for project_id in project_ids:
+        project_cache.invalidate(project_id)
+
+
+def _downscale_due(db: Session, root: Path, cutoff, max_size: int) -> Tuple[int, int]:
+    downscaled = saved = 0
+    images = _eligible(db).filter(Image.retention_tier.is_(None), Image.created_at < cutoff).all()
+    for image in images:
+        path = path_for(image.image_url, root)
+        if path is None:
+            continue
+        try:
+            saved += downscale_file(path, max_size) if path.is_file() else 0
+        except OSError:
+            logger.warning("Could not downscale image", extra={"image_id": image.id, "path": str(path)}, exc_info=True)
+            continue
+        image.retention_tier = DOWNSCALED
+        downscaled += 1
+    _commit_tier_change(db, images)
+    RETENTION_BYTES_SAVED.labels(tier=DOWNSCALED).inc(saved)
+    return downscaled, saved
+
+
+def _archive_due(db: Session, root: Path, cutoff, pack_max_files: int) -> Tuple[int, int]:
+    archived = saved = 0
+    images = []
+    for image in _eligible(db).filter(Image.retention_tier == DOWNSCALED, Image.updated_at < cutoff).all():
+        path = path_for(image.image_url, root)
+        if path is not None and path.is_file():
+            images.append(image)
+    archive_dir = root / ARCHIVE_SUBDIR
+    for start in range(0, len(images), pack_max_files):
+        batch = images[start:start + pack_max_files]
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        pack = archive_dir / f"pack-{utcnow():%Y%m%d-%H%M%S-%f}.tar"
+
+        def write_pack(f):
+            with tarfile.open(fileobj=f, mode="w") as tar:
+                for image in batch:
+                    tar.add(path_for(image.image_url, root), arcname=image.image_url[len(URL_PREFIX):])
+
+        _replace_atomically(pack, write_pack)
+        pack_url = URL_PREFIX + pack.relative_to(root).as_posix()
+        for image in batch:
+            image.retention_tier = ARCHIVED
+            image.archive_url = pack_url
+        _commit_tier_change(db, batch)
+
+        # Only now that the rows point at the pack are the originals removed
+        for image in batch:
+            path = path_for(image.image_url, root)
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            saved += size
+        archived += len(batch)
+        saved -= pack.stat().st_size
+
+    saved = max(0, saved)
+    RETENTION_BYTES_SAVED.labels(tier=ARCHIVED).inc(saved)
+    return archived, saved
+
+
+def apply_retention(db: Session, root: Path = UPLOADS_DIR, downscale_days: float = DOWNSCALE_DAYS,
+                    archive_days: float = ARCHIVE_DAYS, max_size: int = DOWNSCALE_SIZE,
+                    pack_max_files: int = PACK_MAX_FILES) -> RetentionReport:
+    """Move unselected images that are due to their next tier"""
+    with tracer.start_as_current_span("storage.retention"):
+        now = utcnow()
+        # Archive first, so images downscaled in this run wait a full period
+        archived, archive_saved = _archive_due(db, root, now - timedelta(days=archive_days), pack_max_files)
+        downscaled, downscale_saved = _downscale_due(db, root, now - timedelta(days=downscale_days), max_size)
+        report = RetentionReport(downscaled, archived, archive_saved + downscale_saved)
+        logger.info("Retention run finished", extra=report._asdict())
+        return report
+
+
+def restore_image(db: Session, image: Image, root: Path = UPLOADS_DIR) -> bool:
+    """
+    Extract an archived image back to its URL's path
+
+    Returns:
+        Whether the file is in place afterwards
+    """
+    path, pack = path_for(image.image_url, root), path_for(image.archive_url, root)
+    if path is None or pack is None:
+        return False
+    with tracer.start_as_current_span("storage.restore_image"):
+        if not path.is_file():
+            try:
+                with tarfile.open(pack, mode="r") as tar:
+                    member = tar.extractfile(image.image_url[len(URL_PREFIX):])
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    _replace_atomically(path, lambda f: f.write(member.read()))
+            except (OSError, KeyError, tarfile.TarError):
+                logger.error("Could not restore archived image", extra={"image_id": image.id, "pack": str(pack)}, exc_info=True)
+                return False
+        image.retention_tier = DOWNSCALED
+        image.archive_url = None
+        _commit_tier_change(db, [image])
+        ARCHIVE_RESTORES.inc()
+        logger.info("Restored archived image", extra={"image_id": image.id})
+        return True
+
+
+def restore_url(db: Session, image_url: str, root: Path = UPLOADS_DIR) -> bool:
+    """Restore the archived image stored at ``image_url``, if there is one"""
+    image = db.query(Image).filter(Image.image_url == image_url, Image.retention_tier == ARCHIVED).first()
+    return image is not None and restore_image(db, image, root)
+
+
+class RestoringStaticFiles(StaticFiles):
+    """StaticFiles for ``/uploads`` that restores archived images on a miss"""
+
+    async def get_response(self, path: str, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+
+        # Only retained images are ever archived; other misses (typos,
+        # scanners) never reach the database
+        relative = path.lstrip("/")
+        if relative.split("/", 1)[0] not in RETAINED_DIRS:
+            raise HTTPException(status_code=404)
+        root = Path(self.directory)
+
+        def restore() -> bool:
+            with session_for_scope(scope) as db:
+                return restore_url(db, URL_PREFIX + relative, root)
+
+        # A concurrent request may have restored the file first, leaving no
+        # archived row for this one to find
+        if not await run_in_threadpool(restore) and not (root / relative).is_file():
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+
+def start_retention() -> Optional[asyncio.Task]:
+    """Start the periodic retention run if RETENTION_INTERVAL_SECONDS is positive"""
+    from .storage_gc import run_periodically
+    interval = float(os.getenv("RETENTION_INTERVAL_SECONDS", "86400"))
+    if interval <= 0:
+        return None
+    return asyncio.create_task(run_periodically(apply_retention, interval))
@@ -0,0 +1,190 @@
+"""
+Reaper for orphaned files under uploads/
+
+Generated and uploaded images are written before the row that references
+them, failed generations never get a row, and deleting a project removes
+rows but not files. The reaper lists files under ``uploads/``, collects every
+``/uploads/...`` URL stored in any ``*_url`` column of any table, and deletes
+files that nothing references.
+
+Files younger than STORAGE_GC_GRACE_SECONDS are never touched, so work in
+flight is safe. Deletions happen in batches of STORAGE_GC_BATCH_SIZE with a
+pause in between, and each batch is re-checked against the database right
+before deleting. The placeholder images in ``uploads/mock-images`` are
+always kept.
+
+Runs every STORAGE_GC_INTERVAL_SECONDS in the app (0 disables), or once from
+the command line:
+
+    python -m backend.src.services.storage_gc --dry-run
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Sequence, Set
+
+from sqlalchemy import String
+from sqlalchemy.orm import Session
+
+from ..metrics import STORAGE_GC_BYTES_RECLAIMED, STORAGE_GC_FILES_DELETED
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path("uploads")
+URL_PREFIX = "/uploads/"
+# Subdirectories of uploads/ that hold files no row points at by design
+EXEMPT_DIRS = frozenset(("mock-images",))
+
+GRACE_SECONDS = float(os.getenv("STORAGE_GC_GRACE_SECONDS", "86400"))
+BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "100"))
+BATCH_PAUSE_SECONDS = float(os.getenv("STORAGE_GC_BATCH_PAUSE_SECONDS", "0.5"))
+
+
+class GCReport(NamedTuple):
+    scanned: int
+    orphaned: int
+    deleted: int
+    bytes_reclaimed: int
+    errors: int
+
+
+def url_columns():
+    """Every string column named ``*_url`` on the mapped models"""
+    from ..models.base import Base
+    return [
+        column
+        for mapper in Base.registry.mappers
+        for column in mapper.columns
+        if column.name.endswith("_url") and isinstance(column.type, String)
+    ]
+
+
+def url_for(path: Path, root: Path = UPLOADS_DIR) -> str:
+    """The URL a stored file is referenced by, e.g. /uploads/final/x.png"""
+    return URL_PREFIX + path.relative_to(root).as_posix()
+
+
+def referenced_urls(db: Session, urls: Optional[Sequence[str]] = None) -> Set[str]:
+    """
+    Upload URLs referenced by any row, optionally limited to ``urls``
+    """
+    referenced = set()
+    for column in url_columns():
+        query = db.query(column).filter(column.isnot(None))
+        if urls is None:
+            query = query.filter(column.startswith(URL_PREFIX)).distinct()
+        else:
+            query = query.filter(column.in_(urls))
+        referenced.update(value for (value,) in query)
+    return referenced
+
+
+def candidate_files(root: Path = UPLOADS_DIR, grace_seconds: float = GRACE_SECONDS) -> Iterator[Path]:
+    """Files under ``root`` last modified before the grace period"""
+    cutoff = time.time() - grace_seconds
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if not (directory == root and entry.name in EXEMPT_DIRS):
+                    pending.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                yield Path(entry.path)
+
+
+def collect_garbage(db: Session, root: Path = UPLOADS_DIR, dry_run: bool = False,
+                    grace_seconds: float = GRACE_SECONDS, batch_size: int = BATCH_SIZE,
+                    pause_seconds: float = BATCH_PAUSE_SECONDS) -> GCReport:
+    """
+    Delete unreferenced files under ``root``; with ``dry_run`` only report them
+    """
+    with tracer.start_as_current_span("storage.gc", attributes={"storage.dry_run": dry_run}):
+        # List files before reading references, so a row written meanwhile is seen
+        candidates = list(candidate_files(root, grace_seconds))
+        referenced = referenced_urls(db)
+        orphans = [path for path in candidates if url_for(path, root) not in referenced]
+
+        deleted = reclaimed = errors = 0
+        for start in range(0, len(orphans), batch_size):
+            batch = orphans[start:start + batch_size]
+            if start and not dry_run:
+                time.sleep(pause_seconds)
+            # A file can be referenced again, e.g. by a prompt cache hit or a batch copy
+            still_referenced = referenced_urls(db, [url_for(path, root) for path in batch])
+            for path in batch:
+                if url_for(path, root) in still_referenced:
+                    continue
+                try:
+                    size = path.stat().st_size
+                    if not dry_run:
+                        path.unlink()
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    errors += 1
+                    logger.warning("Could not delete orphaned file", extra={"path": str(path)}, exc_info=True)
+                    continue
+                deleted += 1
+                reclaimed += size
+
+        if not dry_run:
+            STORAGE_GC_FILES_DELETED.inc(deleted)
+            STORAGE_GC_BYTES_RECLAIMED.inc(reclaimed)
+        report = GCReport(len(candidates), len(orphans), deleted, reclaimed, errors)
+        logger.info("Storage garbage collection finished", extra={"dry_run": dry_run, **report._asdict()})
+        return report
+
+
+def run_with_session(job: Callable[[Session], Any]) -> Any:
+    """Run ``job`` with its own database session"""
+    from ..database import SessionLocal
+    db = SessionLocal()
+    try:
+        return job(db)
+    finally:
+        db.close()
+
+
+async def run_periodically(job: Callable[[Session], Any], interval_seconds: float):
+    """Background task: run ``job`` every ``interval_seconds``, off the event loop"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(run_with_session, job)
+        except Exception:
+            logger.error("Periodic storage job failed", extra={"job": job.__name__}, exc_info=True)
+
+
+def start_reaper() -> Optional[asyncio.Task]:
+    """Start the periodic reaper if STORAGE_GC_INTERVAL_SECONDS is positive"""
+    interval = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "3600"))
+    if interval <= 0:
+        return None
+    return asyncio.create_task(run_periodically(collect_garbage, interval))
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete orphaned files under uploads/")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them")
+    parser.add_argument("--grace-seconds", type=float, default=GRACE_SECONDS)
+    args = parser.parse_args(argv)
+
+    report = run_with_session(lambda db: collect_garbage(db, dry_run=args.dry_run, grace_seconds=args.grace_seconds))
+    action = "Would delete" if args.dry_run else "Deleted"
+    print(f"Scanned {report.scanned} files; {action} {report.deleted} orphans ({report.bytes_reclaimed} bytes)")
+
+
+if __name__ == "__main__":
+    main()
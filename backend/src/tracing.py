@@ -0,0 +1,69 @@
+"""
+OpenTelemetry tracing setup
+
+Spans are created unconditionally through ``tracer``; until ``setup_tracing``
+installs a provider they are no-ops, so instrumentation costs almost nothing
+when tracing is disabled.
+"""
+import logging
+import os
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("nano_stories")
+
+
+def tracing_active() -> bool:
+    """Whether a real tracer provider is installed (spans are otherwise no-ops)"""
+    return not isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider)
+
+
+def _file_exporter(path: str) -> ConsoleSpanExporter:
+    """Exporter that appends one JSON span per line to ``path``"""
+    return ConsoleSpanExporter(
+        out=open(path, "a", encoding="utf-8"),
+        formatter=lambda span: span.to_json(indent=None) + "\n",
+    )
+
+
+def _otlp_exporter():
+    """OTLP/HTTP exporter; endpoint comes from OTEL_EXPORTER_OTLP_ENDPOINT"""
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logger.warning("OTLP exporter requested but opentelemetry-exporter-otlp-proto-http is not installed")
+        return None
+    return OTLPSpanExporter()
+
+
+def setup_tracing():
+    """
+    Install a tracer provider based on environment configuration
+
+    OTEL_TRACES_EXPORTER selects the exporter:
+        none  - tracing disabled (default)
+        file  - JSON lines written to OTEL_TRACES_FILE (default traces.jsonl)
+        otlp  - export to a local or remote OpenTelemetry collector
+    """
+    exporter_name = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+    if exporter_name == "file":
+        exporter = _file_exporter(os.getenv("OTEL_TRACES_FILE", "traces.jsonl"))
+    elif exporter_name == "otlp":
+        exporter = _otlp_exporter()
+    else:
+        exporter = None
+
+    if exporter is None:
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "nano-stories-api")})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing enabled with {exporter_name} exporter")
@@ -0,0 +1,126 @@
+"""
+Micro-benchmarks for image, storage and database hot paths
+
+Run through ``python run_tests.py benchmark`` to compare against the stored
+baseline, or ``python run_tests.py benchmark --save-baseline`` to record one.
+"""
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.src.api.generate import load_component_image
+from backend.src.database import save_image, save_project
+from backend.src.models.base import Base
+from backend.src.services.gemini_service import GeminiService
+
+IMAGE_SIZE = (1024, 1024)
+
+
+def _encoded(format: str) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", IMAGE_SIZE, color=(30, 144, 255)).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def png_bytes():
+    return _encoded("PNG")
+
+
+@pytest.fixture(scope="module")
+def jpeg_bytes():
+    return _encoded("JPEG")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run inside a scratch directory so uploads land in tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GEMINI_PROVIDER", "fake")
+    return tmp_path
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestImageCodecBenchmarks:
+    """Decode and encode of the formats we accept and produce"""
+
+    def test_decode_png(self, benchmark, png_bytes):
+        benchmark(lambda: Image.open(BytesIO(png_bytes)).load())
+
+    def test_decode_jpeg(self, benchmark, jpeg_bytes):
+        benchmark(lambda: Image.open(BytesIO(jpeg_bytes)).load())
+
+    def test_encode_png(self, benchmark):
+        image = Image.new("RGB", IMAGE_SIZE, color=(30, 144, 255))
+        benchmark(lambda: image.save(BytesIO(), format="PNG"))
+
+    def test_encode_jpeg(self, benchmark):
+        image = Image.new("RGB", IMAGE_SIZE, color=(30, 144, 255))
+        benchmark(lambda: image.save(BytesIO(), format="JPEG"))
+
+
+class TestStorageBenchmarks:
+    """Writing generated images to local storage"""
+
+    def test_save_image_locally(self, benchmark, workdir, png_bytes):
+        service = GeminiService()
+        url = benchmark(service._save_image_locally, png_bytes, "final")
+        assert url.startswith("/uploads/final/")
+
+
+class TestDatabaseBenchmarks:
+    """Database helper writes"""
+
+    def test_save_project(self, benchmark, db):
+        project = benchmark(save_project, db, "Benchmark project")
+        assert project.id is not None
+
+    def test_save_image(self, benchmark, db):
+        project = save_project(db, "Benchmark project")
+        image = benchmark(
+            save_image, db, project.id, "/uploads/final/bench.png",
+            "A compelling brand storytelling image", "final", "dramatic storytelling scene",
+        )
+        assert image.id is not None
+
+
+class TestComponentImageLoadingBenchmarks:
+    """Each branch of the generate endpoint's component image loading"""
+
+    def test_load_from_uploads(self, benchmark, workdir, png_bytes):
+        (workdir / "uploads" / "characters").mkdir(parents=True)
+        (workdir / "uploads" / "characters" / "bench.png").write_bytes(png_bytes)
+        data = benchmark(load_component_image, "/uploads/characters/bench.png", "character")
+        assert data == png_bytes
+
+    def test_load_from_data_uri(self, benchmark, png_bytes):
+        data_uri = "data:image/png;base64," + base64.b64encode(png_bytes).decode()
+        data = benchmark(load_component_image, data_uri, "product")
+        assert data == png_bytes
+
+    def test_load_from_file_path(self, benchmark, workdir, png_bytes):
+        (workdir / "bench.png").write_bytes(png_bytes)
+        data = benchmark(load_component_image, str(workdir / "bench.png"), "background")
+        assert data == png_bytes
+
+    def test_load_mock_placeholder(self, benchmark, workdir):
+        data = benchmark(load_component_image, "/mock-images/placeholder.png", "background")
+        assert data == b"mock_background_image_data"
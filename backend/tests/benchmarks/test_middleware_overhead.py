@@ -0,0 +1,92 @@
+"""
+Per-request overhead of the ASGI middleware layer
+
+The bare and wrapped benchmarks run the same trivial ASGI app; the difference
+between their means is the cost every request (including static image
+fetches) pays for the middleware.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from backend.src.middleware import AppMiddleware, CORSPolicy
+
+# Generous default so shared CI runners don't flake; tighten locally
+OVERHEAD_BUDGET_US = float(os.getenv("MIDDLEWARE_OVERHEAD_BUDGET_US", "250"))
+
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/uploads/final/example.png",
+    "root_path": "",
+    "query_string": b"",
+    "client": ("127.0.0.1", 50000),
+    "headers": [
+        (b"host", b"localhost:8000"),
+        (b"origin", b"http://localhost:3000"),
+        (b"accept", b"image/png"),
+        (b"user-agent", b"benchmark"),
+    ],
+}
+
+
+async def _bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"image/png")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+def _runner(app, iterations: int = 200):
+    """Drive ``iterations`` requests per loop turn to amortize loop overhead"""
+    loop = asyncio.new_event_loop()
+
+    async def batch():
+        for _ in range(iterations):
+            await app(dict(SCOPE), _receive, _send)
+
+    def run():
+        loop.run_until_complete(batch())
+
+    return run, loop
+
+
+@pytest.fixture
+def wrapped_app():
+    return AppMiddleware(_bare_app, cors=CORSPolicy(["http://localhost:3000"]), profiling=False)
+
+
+def test_bare_app_baseline(benchmark):
+    run, loop = _runner(_bare_app)
+    benchmark(run)
+    loop.close()
+
+
+def test_middleware_wrapped_app(benchmark, wrapped_app):
+    run, loop = _runner(wrapped_app)
+    benchmark(run)
+    loop.close()
+
+
+def test_middleware_overhead_within_budget(wrapped_app):
+    iterations = 2000
+
+    def per_request_us(app):
+        run, loop = _runner(app, iterations)
+        run()  # warm up
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        loop.close()
+        return elapsed / iterations * 1_000_000
+
+    overhead = per_request_us(wrapped_app) - per_request_us(_bare_app)
+    assert overhead < OVERHEAD_BUDGET_US, f"Middleware overhead {overhead:.1f}us per request exceeds {OVERHEAD_BUDGET_US}us"
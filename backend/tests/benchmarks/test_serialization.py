@@ -0,0 +1,66 @@
+"""
+Response serialization cost for list-heavy endpoints
+
+Compares FastAPI's stock JSONResponse with the default FastJSONResponse on
+an image listing page that includes prompts, and times the full GET through
+the app.
+"""
+from datetime import datetime
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from backend.src.database import save_image, save_project
+from backend.src.pagination import MAX_PAGE_SIZE
+from backend.src.responses import FastJSONResponse
+
+PROMPT = (
+    "Create a compelling brand storytelling image by fusing these elements: a barista in a sunlit café "
+    "pouring latte art, the product on the counter, warm morning light. "
+) * 4
+
+
+@pytest.fixture(scope="module")
+def image_page():
+    now = datetime(2025, 9, 7, 10, 0, 0)
+    return {
+        "items": [
+            {
+                "id": str(i), "project_id": "1", "image_url": f"/uploads/final_{i}.png", "image_type": "final",
+                "fusion_style": "cinematic", "prompt_template_id": "fusion@v1", "prompt": PROMPT,
+                "created_at": now.isoformat(), "updated_at": now.isoformat(),
+            }
+            for i in range(MAX_PAGE_SIZE)
+        ],
+        "next_cursor": "WyIyMDI1LTA5LTA3VDEwOjAwOjAwIiwxXQ",
+    }
+
+
+def test_render_image_page_stdlib(benchmark, image_page):
+    benchmark(JSONResponse, image_page)
+
+
+def test_render_image_page_fast(benchmark, image_page):
+    benchmark(FastJSONResponse, image_page)
+
+
+def test_fast_render_matches_stdlib(image_page):
+    import json
+    assert json.loads(FastJSONResponse(image_page).body) == json.loads(JSONResponse(image_page).body)
+
+
+@pytest.fixture
+def seeded_project(db_session_factory) -> str:
+    """A project holding a full page of images with prompts"""
+    db = db_session_factory()
+    project_id = str(save_project(db, "Benchmark").id)
+    for i in range(MAX_PAGE_SIZE):
+        save_image(db, project_id, f"/uploads/final_{i}.png", PROMPT, "final", "cinematic", "fusion@v1")
+    db.close()
+    return project_id
+
+
+def test_list_images_with_prompts(benchmark, client, seeded_project):
+    url = f"/api/v1/projects/{seeded_project}/images?limit={MAX_PAGE_SIZE}&fields=id,image_url,prompt,created_at"
+    response = benchmark(client.get, url)
+    assert len(response.json()["items"]) == MAX_PAGE_SIZE
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness for the storytelling wizard flow
+
+Drives the full project -> character -> product upload -> background -> story
+-> generate sequence at a configurable concurrency and reports throughput,
+per-endpoint latency percentiles and error rates as JSON.
+
+By default the real FastAPI app is exercised in-process against a scratch
+SQLite database and the local fake Gemini provider. Pass --base-url to target
+a running deployment instead.
+
+Usage:
+    python backend/tests/performance/load_harness.py --flows 200 --concurrency 20 --output load-report.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+API_PREFIX = "/api/v1"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _product_image_bytes() -> bytes:
+    """Encode a small PNG used as the uploaded product photo"""
+    buffer = BytesIO()
+    Image.new("RGB", (256, 256), color=(200, 120, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class LoadRecorder:
+    """Collects latency samples and failures per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.flows_succeeded = 0
+        self.flows_failed = 0
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Issue a request, record its latency and return it if successful"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return response
+
+    def report(self, config: dict, duration: float) -> dict:
+        """Build the machine-readable summary"""
+        total_requests = sum(len(samples) for samples in self.latencies.values())
+        total_flows = self.flows_succeeded + self.flows_failed
+
+        endpoints = {}
+        for endpoint, samples in self.latencies.items():
+            endpoints[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(samples),
+                "mean_ms": sum(samples) / len(samples),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "max_ms": max(samples),
+            }
+
+        return {
+            "config": config,
+            "duration_seconds": duration,
+            "flows": {
+                "total": total_flows,
+                "succeeded": self.flows_succeeded,
+                "failed": self.flows_failed,
+                "error_rate": self.flows_failed / total_flows if total_flows else 0.0,
+            },
+            "throughput": {
+                "flows_per_second": total_flows / duration if duration else 0.0,
+                "requests_per_second": total_requests / duration if duration else 0.0,
+            },
+            "endpoints": endpoints,
+        }
+
+
+async def run_flow(client: httpx.AsyncClient, recorder: LoadRecorder, index: int, product_image: bytes) -> bool:
+    """Run one complete wizard flow, stopping at the first failed step"""
+    response = await recorder.call(
+        client, "POST /projects", "POST", f"{API_PREFIX}/projects",
+        json={"name": f"Load test project {index}"},
+    )
+    if response is None:
+        return False
+    project_url = f"{API_PREFIX}/projects/{response.json()['id']}"
+
+    steps = [
+        ("POST /projects/{project_id}/character", f"{project_url}/character", {
+            "json": {"details": f"A friendly barista number {index}", "personality": "warm and energetic"},
+        }),
+        ("POST /projects/{project_id}/product/upload", f"{project_url}/product/upload", {
+            "files": {"image": ("product.png", product_image, "image/png")},
+        }),
+        ("POST /projects/{project_id}/background", f"{project_url}/background", {
+            "json": {"scene_details": "A sunlit corner cafe", "lighting": "golden hour"},
+        }),
+        ("POST /projects/{project_id}/story", f"{project_url}/story", {
+            "json": {"story_text": f"Every morning starts with our coffee, story {index}."},
+        }),
+        ("POST /projects/{project_id}/generate", f"{project_url}/generate", {}),
+    ]
+    for endpoint, url, kwargs in steps:
+        if await recorder.call(client, endpoint, "POST", url, **kwargs) is None:
+            return False
+    return True
+
+
+async def run_load_test(flows: int, concurrency: int, base_url: Optional[str] = None, timeout: float = 120.0) -> dict:
+    """
+    Run ``flows`` wizard flows with at most ``concurrency`` in flight
+
+    Args:
+        flows: Total number of complete flows to run
+        concurrency: Maximum number of flows running at once
+        base_url: Target server; when omitted the app is driven in-process
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Report dict with throughput, per-endpoint percentiles and error rates
+    """
+    if base_url:
+        transport = None
+    else:
+        from backend.src.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+
+    recorder = LoadRecorder()
+    product_image = _product_image_bytes()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_flow(client: httpx.AsyncClient, index: int):
+        async with semaphore:
+            if await run_flow(client, recorder, index, product_image):
+                recorder.flows_succeeded += 1
+            else:
+                recorder.flows_failed += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded_flow(client, i) for i in range(flows)))
+        duration = time.perf_counter() - start
+
+    config = {"flows": flows, "concurrency": concurrency, "target": base_url}
+    return recorder.report(config, duration)
+
+
+def prepare_local_app(workdir: Path):
+    """
+    Point the in-process app at a scratch database, uploads directory and the
+    fake Gemini provider
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    os.environ["GEMINI_PROVIDER"] = "fake"
+    os.chdir(workdir)
+    Path("uploads").mkdir(exist_ok=True)
+
+    from backend.src.main import app
+    from backend.src.database import get_db
+    from backend.src.models.base import Base
+
+    engine = create_engine(
+        f"sqlite:///{workdir / 'loadtest.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the storytelling wizard flow")
+    parser.add_argument("--flows", type=int, default=int(os.getenv("LOAD_TEST_FLOWS", "50")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("LOAD_TEST_CONCURRENCY", "10")))
+    parser.add_argument("--base-url", default=os.getenv("LOAD_TEST_BASE_URL"))
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    output_path = Path(args.output).resolve() if args.output else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if not args.base_url:
+            prepare_local_app(Path(workdir))
+        report = asyncio.run(run_load_test(args.flows, args.concurrency, args.base_url))
+
+    payload = json.dumps(report, indent=2)
+    if output_path:
+        output_path.write_text(payload)
+    else:
+        print(payload)
+
+    if report["flows"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ import sys
 # Import services
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
 
-from services.gemini_service import GeminiService
+from backend.src.services.gemini_service import GeminiService
 
 class TestImageGenerationPerformance:
     """Performance tests for image generation operations"""
@@ -0,0 +1,64 @@
+"""
+Load tests for the end-to-end storytelling wizard flow
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from load_harness import percentile, prepare_local_app, run_load_test
+
+LOAD_TEST_FLOWS = int(os.getenv("LOAD_TEST_FLOWS", "8"))
+LOAD_TEST_CONCURRENCY = int(os.getenv("LOAD_TEST_CONCURRENCY", "4"))
+
+WIZARD_ENDPOINTS = {
+    "POST /projects",
+    "POST /projects/{project_id}/character",
+    "POST /projects/{project_id}/product/upload",
+    "POST /projects/{project_id}/background",
+    "POST /projects/{project_id}/story",
+    "POST /projects/{project_id}/generate",
+}
+
+
+@pytest.fixture
+def local_app(tmp_path, monkeypatch):
+    """In-process app backed by a scratch database and the fake provider"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GEMINI_PROVIDER", "fake")
+    monkeypatch.setenv("GEMINI_FAKE_IMAGE_SIZE", "64")
+    engine = prepare_local_app(tmp_path)
+
+    from backend.src.main import app
+    yield app
+
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def test_percentile_nearest_rank():
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 95) == 95.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.slow
+def test_wizard_flow_under_concurrency(local_app):
+    """Every flow completes and the report covers every wizard endpoint"""
+    report = asyncio.run(run_load_test(LOAD_TEST_FLOWS, LOAD_TEST_CONCURRENCY))
+
+    assert report["flows"]["total"] == LOAD_TEST_FLOWS
+    assert report["flows"]["failed"] == 0
+    assert report["throughput"]["flows_per_second"] > 0
+    assert set(report["endpoints"]) == WIZARD_ENDPOINTS
+
+    for stats in report["endpoints"].values():
+        assert stats["count"] == LOAD_TEST_FLOWS
+        assert stats["error_rate"] == 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+    # The report must round-trip as JSON for CI consumption
+    assert json.loads(json.dumps(report)) == report
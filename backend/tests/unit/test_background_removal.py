@@ -0,0 +1,76 @@
+"""
+Unit tests for ingest-time product background removal
+"""
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from backend.src.services.background_removal import create_cutout, cutout_path, remove_background
+
+
+def _encode(image: Image.Image, format="PNG") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def _product_photo(format="PNG") -> bytes:
+    """A red bottle with a backdrop-coloured label, on a near-white backdrop"""
+    image = Image.new("RGB", (400, 300), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((150, 50, 250, 260), fill=(200, 20, 20))
+    draw.rectangle((170, 120, 230, 160), fill=(245, 245, 245))
+    return _encode(image, format)
+
+
+def test_backdrop_becomes_transparent_and_product_stays_opaque():
+    cutout = Image.open(BytesIO(remove_background(_product_photo())))
+
+    assert cutout.mode == "RGBA"
+    assert cutout.size == (400, 300)
+    alpha = cutout.getchannel("A")
+    assert alpha.getpixel((10, 10)) == 0
+    assert alpha.getpixel((200, 80)) == 255
+    # Enclosed backdrop-coloured areas belong to the product
+    assert alpha.getpixel((200, 140)) == 255
+
+
+def test_jpeg_uploads_are_supported():
+    cutout = Image.open(BytesIO(remove_background(_product_photo("JPEG"))))
+    assert cutout.getchannel("A").getpixel((5, 5)) == 0
+
+
+def test_images_without_clear_foreground_are_left_alone():
+    assert remove_background(_encode(Image.new("RGB", (64, 64), "blue"))) is None
+    assert remove_background(_encode(Image.new("RGBA", (64, 64), (0, 0, 0, 0)))) is None
+
+
+def test_cutout_is_stored_next_to_original(tmp_path):
+    original = tmp_path / "abc.jpg"
+    data = _product_photo("JPEG")
+    original.write_bytes(data)
+
+    path = create_cutout(original, data)
+    assert path == cutout_path(original) == tmp_path / "abc.cutout.png"
+    assert Image.open(path).mode == "RGBA"
+    assert create_cutout(tmp_path / "broken.png", b"not an image") is None
+
+
+def test_upload_stores_cutout(client):
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Cutout"}).json()["id"]
+
+    product = client.post(f"{project_url}/product/upload", files={"image": ("bottle.png", _product_photo(), "image/png")}).json()
+    assert product["cutout_url"] == product["image_url"].replace(".png", ".cutout.png")
+    assert Path(product["cutout_url"].lstrip("/")).is_file()
+
+    plain = client.post(f"{project_url}/product/upload", files={"image": ("flat.png", _encode(Image.new("RGB", (32, 32), "red")), "image/png")}).json()
+    assert plain["cutout_url"] is None
+
+
+def test_cutouts_can_be_disabled(client, monkeypatch):
+    monkeypatch.setenv("PRODUCT_CUTOUT_ENABLED", "false")
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "NoCutout"}).json()["id"]
+
+    product = client.post(f"{project_url}/product/upload", files={"image": ("bottle.png", _product_photo(), "image/png")}).json()
+    assert product["cutout_url"] is None
@@ -0,0 +1,156 @@
+"""
+Unit tests for batch generation
+"""
+import asyncio
+import json
+import threading
+
+
+def test_batch_generates_each_story_variant(client, png_bytes, ready_project):
+    project_url = ready_project()
+    other_product = client.post(f"{project_url}/product/upload", files={"image": ("q.png", png_bytes("green"), "image/png")}).json()
+
+    response = client.post(f"{project_url}/batch", json={
+        "items": [
+            {"story_text": "Ride in the rain"},
+            {"story_text": "Ride at night", "name": "Night"},
+            {"product_id": other_product["id"]},
+        ],
+        "concurrency": 2,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (3, 0)
+    assert [item["index"] for item in body["items"]] == [0, 1, 2]
+
+    project_ids = {item["project_id"] for item in body["items"]}
+    assert len(project_ids) == 3 and project_url.rsplit("/", 1)[1] not in project_ids
+    for item in body["items"]:
+        assert item["status"] == "succeeded"
+        assert len(item["images"]) == 3
+
+    # Each item is a regular project that can be regenerated on its own
+    night = body["items"][1]["project_id"]
+    assert client.post(f"/api/v1/projects/{night}/generate").status_code == 200
+
+
+def test_batch_validates_before_generating(client, ready_project):
+    project_url = ready_project(story=False)
+
+    assert client.post(f"{project_url}/batch", json={"items": []}).status_code == 422
+    missing_story = client.post(f"{project_url}/batch", json={"items": [{"story_text": "Fine"}, {}]})
+    assert missing_story.status_code == 400
+    assert "story" in missing_story.json()["detail"]
+    unknown = client.post(f"{project_url}/batch", json={"items": [{"story_text": "x", "product_id": "9999"}]})
+    assert unknown.status_code == 422
+    assert client.post("/api/v1/projects/missing/batch", json={"items": [{}]}).status_code == 404
+
+
+def test_batch_reports_item_failures(client, ready_project, monkeypatch):
+    from backend.src.services.gemini_service import GeminiService
+
+    project_url = ready_project()
+    original = GeminiService.iter_fused_images
+
+    def flaky(self, character_img, product_img, background_img, story, *args):
+        if story == "Broken":
+            raise RuntimeError("upstream unavailable")
+        return original(self, character_img, product_img, background_img, story, *args)
+
+    monkeypatch.setattr(GeminiService, "iter_fused_images", flaky)
+    body = client.post(f"{project_url}/batch", json={"items": [{"story_text": "Broken"}, {"story_text": "Fine"}]}).json()
+
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert body["items"][0]["status"] == "failed"
+    assert body["items"][0]["error"] == "upstream unavailable"
+    assert body["items"][1]["status"] == "succeeded"
+
+
+def test_batch_rejects_products_of_other_projects(client, png_bytes, ready_project):
+    project_url = ready_project()
+    other_url = ready_project()
+    foreign = client.post(f"{other_url}/product/upload", files={"image": ("f.png", png_bytes("blue"), "image/png")}).json()
+
+    response = client.post(f"{project_url}/batch", json={"items": [{"product_id": foreign["id"]}]})
+
+    assert response.status_code == 422
+    assert foreign["id"] in response.json()["detail"]
+
+
+def test_batch_streams_item_results(client, ready_project):
+    project_url = ready_project()
+    response = client.post(f"{project_url}/batch?stream=ndjson", json={
+        "items": [{"story_text": "Ride in the rain"}, {"story_text": "Ride at night"}],
+    })
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["type"] for event in events] == ["item", "item", "done"]
+    assert sorted(event["index"] for event in events[:2]) == [0, 1]
+    assert all(event["status"] == "succeeded" for event in events[:2])
+    assert (events[-1]["succeeded"], events[-1]["failed"]) == (2, 0)
+
+
+
+def test_failed_item_leaves_no_partial_project(client, ready_project):
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    from backend.src.models.story import Story
+
+    project_url = ready_project()
+    before = client.get("/api/v1/projects").json()
+
+    def fail_broken_story(session, flush_context, instances):
+        if any(isinstance(row, Story) and row.story_text == "Broken" for row in session.new):
+            raise RuntimeError("disk full")
+
+    # The item's project row is flushed before its components, so this
+    # fails part way through building it
+    event.listen(Session, "before_flush", fail_broken_story)
+    try:
+        body = client.post(f"{project_url}/batch", json={"items": [{"story_text": "Broken"}, {"story_text": "Fine"}]}).json()
+    finally:
+        event.remove(Session, "before_flush", fail_broken_story)
+
+    assert [item["status"] for item in body["items"]] == ["failed", "succeeded"]
+    assert body["items"][0]["error"] == "disk full" and body["items"][0]["project_id"] is None
+    projects = client.get("/api/v1/projects").json()
+    assert len(projects["items"]) == len(before["items"]) + 1
+
+
+def test_closing_the_stream_cancels_unfinished_items(client, ready_project, db_session_factory, monkeypatch):
+    from starlette.requests import Request
+
+    from backend.src.api.batch import BatchRequest, generate_batch
+    from backend.src.main import app
+    from backend.src.models.image import Image
+    from backend.src.services.gemini_service import GeminiService
+
+    project_id = ready_project().rsplit("/", 1)[1]
+    original = GeminiService.iter_fused_images
+    release = threading.Event()
+
+    def slow(self, character_png, product_png, background_png, story, *args):
+        if story == "Slow":
+            release.wait(5)
+        return original(self, character_png, product_png, background_png, story, *args)
+
+    monkeypatch.setattr(GeminiService, "iter_fused_images", slow)
+    db = db_session_factory()
+
+    async def run():
+        batch = BatchRequest(items=[{"story_text": "Fast"}, {"story_text": "Slow"}])
+        response = await generate_batch(project_id, batch, Request({"type": "http", "app": app}), "ndjson", db)
+        first = json.loads(await response.body_iterator.__anext__())
+        # The client disconnects while the slow item is still generating
+        await response.body_iterator.aclose()
+        release.set()
+        await asyncio.sleep(0.2)
+        return first
+
+    first = asyncio.run(run())
+    assert (first["type"], first["status"]) == ("item", "succeeded")
+    stored = {row.project_id for row in db.query(Image.project_id)}
+    assert stored == {int(first["project_id"])}
+    db.close()
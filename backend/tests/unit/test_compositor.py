@@ -0,0 +1,59 @@
+"""
+Unit tests for local pre-compositing of fusion inputs
+"""
+from PIL import Image
+
+from backend.src.services.compositor import DEFAULT_LAYOUT, LAYOUTS, composite, feathered_mask, layout_for
+from backend.src.services.gemini_service import GeminiService
+
+
+def test_composite_is_bounded_rgb():
+    background = Image.new("RGB", (2048, 1024), "blue")
+    result = composite(Image.new("RGB", (300, 600), "red"), Image.new("RGB", (200, 200), "green"), background, max_size=512)
+
+    assert result.mode == "RGB"
+    assert result.size == (512, 256)
+
+
+def test_transparent_layers_keep_background_visible():
+    background = Image.new("RGB", (200, 200), "blue")
+    invisible = Image.new("RGBA", (50, 50), (255, 0, 0, 0))
+    result = composite(invisible, invisible, background)
+
+    assert set(result.getdata()) == {(0, 0, 255)}
+
+
+def test_opaque_layers_are_feathered():
+    background = Image.new("RGB", (200, 200), "blue")
+    product = Image.new("RGB", (100, 100), "red")
+    result = composite(None, product, background, style="professional brand presentation")
+
+    placement = LAYOUTS["professional brand presentation"].product
+    center = (int(200 * placement.center_x), int(200 * (placement.bottom - placement.height / 2)))
+    assert result.getpixel(center) == (255, 0, 0)
+    # Layer edges blend rather than cut hard into the background
+    mask = feathered_mask((100, 100))
+    assert mask.getpixel((0, 0)) == 0 and mask.getpixel((50, 50)) == 255
+
+
+def test_unknown_style_uses_default_layout():
+    assert layout_for("something new") == DEFAULT_LAYOUT
+    assert layout_for(None) == DEFAULT_LAYOUT
+
+
+def test_precomposite_sends_single_reference_image(workdir, monkeypatch, png_bytes):
+    monkeypatch.setenv("FUSION_PRECOMPOSITE", "true")
+    service = GeminiService()
+    sent = []
+    generate_content = service.client.models.generate_content
+
+    def spy(model, contents, config=None):
+        sent.append(contents)
+        return generate_content(model, contents, config)
+
+    monkeypatch.setattr(service.client.models, "generate_content", spy)
+    images = service.generate_final_images(png_bytes("red"), png_bytes("green"), png_bytes("blue"), "A story")
+
+    assert len(images) == 3 and all("error" not in image for image in images)
+    assert [len(contents) for contents in sent] == [2, 2, 2]
+    assert sent[0][1].inline_data.mime_type == "image/jpeg"
@@ -0,0 +1,98 @@
+"""
+Unit tests for response compression
+"""
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from backend.src.compression import CompressionMiddleware, available_encoders, negotiate
+
+JSON_BODY = b'{"prompt": "' + b"Create a compelling brand storytelling image. " * 100 + b'"}'
+
+
+def _run(app, accept_encoding=b"gzip"):
+    """Drive one GET through ``app`` and collect the messages it sends"""
+    messages = []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding)]}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return dict(messages[0]["headers"]), messages[1:]
+
+
+def _app(content_type, chunks, status=200):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def test_negotiate_honours_q_values_and_server_preference():
+    encoders = {b"zstd": object, b"br": object, b"gzip": object}
+    assert negotiate(b"gzip, br", encoders) == b"br"
+    assert negotiate(b"gzip;q=1.0, br;q=0.5", encoders) == b"gzip"
+    assert negotiate(b"gzip, zstd;q=0", encoders) == b"gzip"
+    assert negotiate(b"*", encoders) == b"zstd"
+    assert negotiate(b"identity", encoders) is None
+
+
+def test_large_json_is_compressed_with_length():
+    headers, body = _run(CompressionMiddleware(_app(b"application/json", [JSON_BODY])))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body[0]["body"])
+    assert gzip.decompress(body[0]["body"]) == JSON_BODY
+
+
+def test_small_images_and_event_streams_pass_through():
+    for content_type, payload in ((b"application/json", b'{"id": "1"}'), (b"image/png", JSON_BODY),
+                                  (b"text/event-stream", JSON_BODY)):
+        headers, body = _run(CompressionMiddleware(_app(content_type, [payload])))
+        assert b"content-encoding" not in headers
+        assert body[0]["body"] == payload
+
+
+def test_streamed_chunks_are_flushed_individually():
+    chunks = [b'{"type": "image"}\n' * 100, b'{"type": "done"}\n', b""]
+    headers, body = _run(CompressionMiddleware(_app(b"application/x-ndjson", chunks)))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decompressor = zlib.decompressobj(31)
+    # Each chunk decodes on arrival, without waiting for the end of the stream
+    assert decompressor.decompress(body[0]["body"]) == chunks[0]
+    assert decompressor.decompress(body[1]["body"]) == chunks[1]
+    decompressor.decompress(body[2]["body"])
+    assert decompressor.eof
+
+
+def test_all_encoders_are_installed():
+    # brotli and zstandard are requirements; without them only gzip is negotiated
+    assert set(available_encoders()) == {b"gzip", b"br", b"zstd"}
+
+
+@pytest.mark.parametrize("encoding", [b"br", b"zstd"])
+def test_optional_encoders_round_trip(encoding):
+    headers, body = _run(CompressionMiddleware(_app(b"application/json", [JSON_BODY])), accept_encoding=encoding)
+    assert headers[b"content-encoding"] == encoding
+    if encoding == b"br":
+        import brotli
+        assert brotli.decompress(body[0]["body"]) == JSON_BODY
+    else:
+        import zstandard
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(body[0]["body"]) == JSON_BODY
+
+
+def test_api_responses_are_compressed(client):
+    project_id = client.post("/api/v1/projects", json={"name": "Campaign " * 200}).json()["id"]
+    response = client.get(f"/api/v1/projects/{project_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["name"].startswith("Campaign")
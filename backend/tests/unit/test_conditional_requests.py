@@ -0,0 +1,52 @@
+"""
+Unit tests for ETag / Last-Modified handling on read endpoints
+"""
+from backend.src.database import save_image
+
+
+def _project(client) -> str:
+    return client.post("/api/v1/projects", json={"name": "Campaign"}).json()["id"]
+
+
+def test_project_detail_revalidates(client):
+    project_id = _project(client)
+    url = f"/api/v1/projects/{project_id}"
+
+    first = client.get(url)
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    assert etag.startswith('W/"')
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # Saving a component moves the project's validators
+    client.post(f"{url}/story", json={"story_text": "New chapter"})
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["story_text"] == "New chapter"
+
+
+def test_image_list_changes_when_images_are_saved(client, db_session_factory):
+    project_id = _project(client)
+    url = f"/api/v1/projects/{project_id}/images"
+
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    # Different query, different representation
+    assert client.get(url, params={"fields": "id"}).headers["etag"] != etag
+
+    db = db_session_factory()
+    image = save_image(db, project_id, "/uploads/a.png", "Prompt", "final")
+    image_id = str(image.id)
+    db.close()
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+    image_url = f"{url}/{image_id}"
+    image_etag = client.get(image_url).headers["etag"]
+    assert client.get(image_url, headers={"If-None-Match": f'"x", {image_etag}'}).status_code == 304
@@ -0,0 +1,49 @@
+"""
+Unit tests for database setup helpers
+"""
+from sqlalchemy import create_engine, event, inspect, text
+
+from backend.src.database import count_images, save_image, save_project, upgrade_schema
+
+
+def test_upgrade_schema_upgrades_existing_tables():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, project_id INTEGER, image_url VARCHAR)"))
+
+    upgrade_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("products")}
+    assert {"cutout_url", "name", "description"} <= columns
+    # Tables that don't exist yet are left to create_all
+    assert not inspect(engine).has_table("projects")
+
+
+def test_upgrade_schema_adds_missing_indexes():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE images (id INTEGER PRIMARY KEY, project_id INTEGER, prompt TEXT, image_url VARCHAR, "
+            "image_type VARCHAR, created_at DATETIME, updated_at DATETIME)"
+        ))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("images")}
+    assert "ix_images_project_created" in indexes
+
+
+def test_count_images_counts_in_sql(db_session_factory):
+    db = db_session_factory()
+    project_id, other_id = save_project(db, "Counted").id, save_project(db, "Other").id
+    for index in range(3):
+        save_image(db, project_id, f"/uploads/{index}.png", "Prompt", "final")
+    save_image(db, other_id, "/uploads/other.png", "Prompt", "final")
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert count_images(db, project_id) == 3
+    assert count_images(db, "missing") == 0
+    assert all("count(" in statement.lower() for statement in statements)
+    db.close()
@@ -0,0 +1,58 @@
+"""
+Unit tests for variation count, fusion styles and draft mode on /generate
+"""
+from pathlib import Path
+
+from PIL import Image
+
+from backend.src.models.image import Image as ImageRecord
+
+
+def test_default_generates_three_styles(client, ready_project):
+    images = client.post(f"{ready_project()}/generate").json()["images"]
+    assert [image["fusion_style"] for image in images] == [
+        "seamlessly integrated composition",
+        "dramatic storytelling scene",
+        "professional brand presentation",
+    ]
+    assert not any(image["draft"] for image in images)
+    assert {image["prompt_template_id"] for image in images} == {"fusion@v1"}
+
+
+def test_variations_and_styles(client, ready_project):
+    project_url = ready_project()
+
+    one = client.post(f"{project_url}/generate", json={"variations": 1}).json()["images"]
+    assert [image["fusion_style"] for image in one] == ["seamlessly integrated composition"]
+
+    custom = client.post(f"{project_url}/generate", json={"styles": ["minimal", " neon "], "variations": 3}).json()["images"]
+    assert [image["fusion_style"] for image in custom] == ["minimal", "neon", "minimal"]
+
+
+def test_draft_mode_is_single_low_resolution_variation(client, ready_project, monkeypatch, db_session_factory):
+    from backend.src.services import gemini_service
+
+    monkeypatch.setattr(gemini_service, "DRAFT_SIZE", 32)
+    project_url = ready_project()
+
+    images = client.post(f"{project_url}/generate", json={"mode": "draft", "styles": ["sketch", "bold"]}).json()["images"]
+    assert len(images) == 1
+    assert images[0]["draft"] and images[0]["fusion_style"] == "sketch"
+    assert Image.open(Path(images[0]["image_url"].lstrip("/"))).size == (32, 32)
+
+    db = db_session_factory()
+    try:
+        record = db.query(ImageRecord).filter(ImageRecord.id == int(images[0]["id"])).one()
+        assert (record.image_type, record.prompt_template_id) == ("draft", "fusion@v1")
+    finally:
+        db.close()
+
+
+def test_generation_limits(client, ready_project):
+    project_url = ready_project()
+
+    assert client.post(f"{project_url}/generate", json={"variations": 5}).status_code == 422
+    assert client.post(f"{project_url}/generate", json={"variations": 0}).status_code == 422
+    assert client.post(f"{project_url}/generate", json={"styles": ["a", "b", "c", "d", "e"]}).status_code == 422
+    assert client.post(f"{project_url}/generate", json={"styles": ["x" * 201]}).status_code == 422
+    assert client.post(f"{project_url}/generate", json={"mode": "turbo"}).status_code == 422
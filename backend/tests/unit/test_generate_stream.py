@@ -0,0 +1,58 @@
+"""
+Unit tests for streamed /generate responses
+"""
+import base64
+import json
+from email.parser import BytesParser
+from email.policy import HTTP
+from io import BytesIO
+
+from PIL import Image
+
+
+def test_ndjson_stream_inlines_each_image(client, ready_project):
+    project_url = ready_project()
+
+    response = client.post(f"{project_url}/generate?stream=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    images, done = events[:-1], events[-1]
+    assert done == {"type": "done", "count": 3}
+    assert [event["index"] for event in images] == [0, 1, 2]
+    for event in images:
+        assert event["type"] == "image"
+        assert event["content_type"] == "image/png"
+        assert Image.open(BytesIO(base64.b64decode(event["data"]))).size == (64, 64)
+
+    # Streamed images are persisted exactly like the JSON response
+    with open(images[0]["image_url"].lstrip("/"), "rb") as f:
+        assert f.read() == base64.b64decode(images[0]["data"])
+
+
+def test_multipart_stream_sends_metadata_and_binary_parts(client, ready_project):
+    project_url = ready_project()
+
+    response = client.post(f"{project_url}/generate?stream=multipart")
+    assert response.status_code == 200
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/mixed; boundary=")
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + response.content
+    )
+    parts = list(message.iter_parts())
+    assert [part.get_content_type() for part in parts] == ["application/json", "image/png"] * 3 + ["application/json"]
+
+    metadata = json.loads(parts[0].get_payload(decode=True))
+    assert parts[1]["Content-ID"] == f"<{metadata['id']}>"
+    assert Image.open(BytesIO(parts[1].get_payload(decode=True))).format == "PNG"
+    assert json.loads(parts[-1].get_payload(decode=True)) == {"type": "done", "count": 3}
+
+
+def test_stream_validates_before_streaming(client):
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Empty"}).json()["id"]
+
+    assert client.post(f"{project_url}/generate?stream=ndjson").status_code == 400
+    assert client.post(f"{project_url}/generate?stream=xml").status_code == 422
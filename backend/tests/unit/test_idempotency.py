@@ -0,0 +1,101 @@
+"""
+Unit tests for Idempotency-Key handling
+"""
+import asyncio
+
+from backend.src import idempotency
+from backend.src.idempotency import claim_key
+from backend.src.models.idempotency_key import IdempotencyKey
+
+
+def test_retried_generate_replays_the_original_response(client, monkeypatch):
+    from backend.src.services.gemini_service import GeminiService
+
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Campaign"}).json()["id"]
+    client.post(f"{project_url}/character", json={"details": "A cyclist", "personality": "bold"})
+    client.post(f"{project_url}/product/generate", json={"name": "Bottle", "description": "Steel"})
+    client.post(f"{project_url}/background", json={"scene_details": "Mountain road", "lighting": "dawn"})
+    client.post(f"{project_url}/story", json={"story_text": "Ride further"})
+
+    calls = []
+    original = GeminiService.iter_final_images
+
+    def counting(self, *args, **kwargs):
+        calls.append(1)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(GeminiService, "iter_final_images", counting)
+    headers = {"Idempotency-Key": "generate-1"}
+    first = client.post(f"{project_url}/generate", headers=headers)
+    retry = client.post(f"{project_url}/generate", headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert len(calls) == 1
+
+
+def test_key_reuse_for_a_different_request_is_rejected(client):
+    headers = {"Idempotency-Key": "create-1"}
+    first = client.post("/api/v1/projects", json={"name": "One"}, headers=headers)
+    assert client.post("/api/v1/projects", json={"name": "One"}, headers=headers).json() == first.json()
+
+    reused = client.post("/api/v1/projects", json={"name": "Two"}, headers=headers)
+    assert reused.status_code == 422
+    assert reused.json()["error_code"] == "IDEMPOTENCY_KEY_REUSED"
+    assert client.post("/api/v1/projects", json={"name": "x"}, headers={"Idempotency-Key": "k" * 300}).status_code == 400
+
+
+def test_requests_without_a_key_are_not_deduplicated(client):
+    ids = {client.post("/api/v1/projects", json={"name": "Same"}).json()["id"] for _ in range(2)}
+    assert len(ids) == 2
+
+
+def test_server_errors_release_the_key(client, monkeypatch):
+    from backend.src.api import projects
+
+    def failing(db, name):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(projects, "save_project", failing)
+    headers = {"Idempotency-Key": "create-2"}
+    assert client.post("/api/v1/projects", json={"name": "One"}, headers=headers).status_code == 500
+
+    monkeypatch.undo()
+    assert client.post("/api/v1/projects", json={"name": "One"}, headers=headers).status_code == 201
+
+
+def test_claims_report_in_progress_and_take_over_abandoned_keys(db_session_factory):
+    db = db_session_factory()
+    assert claim_key(db, "k", "f", ttl_seconds=60, lock_seconds=60) == ("claimed", None)
+    assert claim_key(db, "k", "f", ttl_seconds=60, lock_seconds=60) == ("in_progress", None)
+    assert claim_key(db, "k", "other", ttl_seconds=60, lock_seconds=60) == ("mismatch", None)
+
+    # The holder never finished; after the lock timeout the key is claimed afresh
+    assert claim_key(db, "k", "f", ttl_seconds=60, lock_seconds=-1) == ("claimed", None)
+    assert db.query(IdempotencyKey).count() == 1
+    db.close()
+
+
+def test_key_storage_runs_off_the_event_loop(client, monkeypatch):
+    on_loop = []
+
+    def recording(original):
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(original.__name__)
+            except RuntimeError:
+                pass
+            return original(*args, **kwargs)
+        return wrapper
+
+    for name in ("claim_key", "complete_key", "release_key"):
+        monkeypatch.setattr(idempotency, name, recording(getattr(idempotency, name)))
+    headers = {"Idempotency-Key": "threaded-1"}
+    client.post("/api/v1/projects", json={"name": "One"}, headers=headers)
+    client.post("/api/v1/projects", json={"name": "One"}, headers=headers)
+    client.post("/api/v1/projects/missing/story", json={"story_text": "x"}, headers={"Idempotency-Key": "threaded-2"})
+
+    assert on_loop == []
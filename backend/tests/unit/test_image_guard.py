@@ -0,0 +1,80 @@
+"""
+Unit tests for guarded image decoding
+"""
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from backend.src.services import image_guard
+from backend.src.services.image_guard import UnsafeImageError, guarded_open, inspect_image
+
+
+def _encode(image: Image.Image, format="PNG") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def _png_header(width: int, height: int) -> bytes:
+    """A PNG that declares ``width`` x ``height`` but carries almost no data"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b"")
+
+
+def test_inspect_reads_the_header_only():
+    info = inspect_image(_encode(Image.new("RGBA", (64, 32))))
+
+    assert info == ("PNG", 64, 32, "RGBA")
+
+
+@pytest.mark.parametrize("data", [
+    _png_header(100_000, 100_000),  # decompression bomb
+    _png_header(40_000, 1),  # pathological aspect ratio
+    b"not an image",
+])
+def test_unsafe_images_are_rejected(data):
+    with pytest.raises(UnsafeImageError):
+        inspect_image(data)
+    with pytest.raises(UnsafeImageError):
+        guarded_open(data)
+
+
+def test_unsupported_formats_are_rejected():
+    with pytest.raises(UnsafeImageError, match="BMP"):
+        guarded_open(_encode(Image.new("RGB", (8, 8)), "BMP"))
+
+
+def test_jpeg_is_decoded_at_reduced_scale_within_the_budget(monkeypatch):
+    data = _encode(Image.new("RGB", (2000, 1500), "red"), "JPEG")
+    # Room for a ~500px bitmap, not the full 2000px one
+    monkeypatch.setattr(image_guard, "MAX_DECODE_BYTES", 600 * 600 * 4)
+
+    with pytest.raises(UnsafeImageError, match="memory budget"):
+        guarded_open(data)
+    image = guarded_open(data, max_size=400)
+    assert image.size == (400, 300)
+    assert image.getpixel((0, 0))[0] > 240
+
+
+def test_png_within_limits_keeps_its_mode():
+    image = guarded_open(_encode(Image.new("P", (16, 16))), max_size=8)
+
+    assert image.mode == "P"
+    assert image.size == (8, 8)
+
+
+def test_upload_rejects_bombs_before_saving(client, workdir):
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Bomb"}).json()["id"]
+
+    response = client.post(f"{project_url}/product/upload",
+                           files={"image": ("bomb.png", _png_header(100_000, 100_000), "image/png")})
+
+    assert response.status_code == 400
+    assert "Invalid image" in response.json()["detail"]
+    assert not list((workdir / "uploads").rglob("bomb*"))
@@ -0,0 +1,91 @@
+"""
+Unit tests for the CPU-bound image process pool
+"""
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from backend.src.services.background_removal import remove_background
+from backend.src.services import gemini_service
+from backend.src.services.gemini_service import GeminiService, composite_reference_jpeg, normalize_png
+from backend.src.services.image_guard import UnsafeImageError
+from backend.src.services.image_pool import ImagePool
+
+
+def _photo(size=(600, 400)) -> bytes:
+    image = Image.effect_noise(size, 40).convert("RGB")
+    image.paste((245, 245, 245), (0, 0, size[0], 40))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _shared_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ImagePool(workers=1, shm_min_bytes=1024)
+    pool.start(wait=True)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_results_match_inline(pool):
+    data = _photo()
+    before = _shared_blocks()
+
+    result = pool.call(normalize_png, data, 300)
+
+    assert result == normalize_png(data, 300)
+    assert Image.open(BytesIO(result)).size == (300, 200)
+    # Large argument and result both went through shared memory and were released
+    assert _shared_blocks() == before
+
+
+def test_small_payloads_and_none_results(pool):
+    tiny = BytesIO()
+    Image.new("RGBA", (8, 8)).save(tiny, format="PNG")
+
+    assert pool.call(remove_background, tiny.getvalue()) is None
+
+
+def test_worker_exceptions_are_reraised(pool):
+    with pytest.raises(UnsafeImageError):
+        pool.call(normalize_png, b"not an image" * 200, 64)
+
+
+def test_fusion_inputs_are_decoded_and_composited_in_workers(pool, monkeypatch, workdir):
+    monkeypatch.setattr(gemini_service, "image_pool", pool)
+    calls = []
+    call = pool.call
+    monkeypatch.setattr(pool, "call", lambda fn, *args: calls.append(fn.__name__) or call(fn, *args))
+    jpeg = BytesIO()
+    Image.new("RGB", (64, 48), "green").save(jpeg, format="JPEG")
+
+    character, product, background = GeminiService().decode_images(_photo(), jpeg.getvalue(), _photo((800, 600)))
+    reference = pool.call(composite_reference_jpeg, character, product, background, "dramatic storytelling scene")
+
+    assert calls == ["normalize_png"] * 3 + ["composite_reference_jpeg"]
+    assert [Image.open(BytesIO(data)).format for data in (character, product, background)] == ["PNG"] * 3
+    assert Image.open(BytesIO(product)).size == (64, 48)
+    assert reference == composite_reference_jpeg(character, product, background, "dramatic storytelling scene")
+    assert Image.open(BytesIO(reference)).format == "JPEG"
+
+
+def test_runs_inline_until_started():
+    pool = ImagePool(workers=2)
+    assert not pool.running
+
+    assert Image.open(BytesIO(pool.call(normalize_png, _photo(), 100))).size == (100, 67)
+    pool.shutdown()
+
+
+def test_disabled_pool_never_starts():
+    pool = ImagePool(workers=0)
+    pool.start()
+
+    assert not pool.running
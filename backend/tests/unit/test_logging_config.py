@@ -0,0 +1,81 @@
+"""
+Unit tests for structured logging
+"""
+import json
+import logging
+import queue
+
+from backend.src.logging_config import (
+    DeferredQueueHandler,
+    JsonFormatter,
+    RequestIdFilter,
+    SamplingFilter,
+    parse_logger_map,
+    request_id_var,
+)
+
+
+def _record(name="backend.src.test", level=logging.INFO, msg="hello %s", args=("world",), exc_info=None, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_formatter_includes_extra_fields_and_request_id():
+    record = _record(image_url="/uploads/final/a.png", request_id="req-1")
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "backend.src.test"
+    assert payload["request_id"] == "req-1"
+    assert payload["image_url"] == "/uploads/final/a.png"
+
+
+def test_deferred_queue_handler_keeps_exception_for_listener():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        import sys
+        record = _record(level=logging.ERROR, exc_info=sys.exc_info())
+
+    log_queue = queue.Queue()
+    DeferredQueueHandler(log_queue).handle(record)
+    queued = log_queue.get_nowait()
+
+    payload = json.loads(JsonFormatter().format(queued))
+    assert payload["message"] == "hello world"
+    assert "ValueError: boom" in payload["exc_info"]
+
+
+def test_request_id_filter_reads_context():
+    token = request_id_var.set("abc123")
+    try:
+        record = _record()
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+    assert record.request_id == "abc123"
+
+
+def test_sampling_filter_drops_info_but_never_warnings():
+    sampler = SamplingFilter({"backend.src.middleware": 0.0, "backend.src": 1.0})
+
+    assert not sampler.filter(_record(name="backend.src.middleware"))
+    assert sampler.filter(_record(name="backend.src.middleware", level=logging.WARNING))
+    assert sampler.filter(_record(name="backend.src.api.generate"))
+    assert sampler.filter(_record(name="httpx"))
+
+
+def test_parse_logger_map_ignores_malformed_entries():
+    assert parse_logger_map("a=DEBUG, b.c = WARNING,broken,=INFO") == {"a": "DEBUG", "b.c": "WARNING"}
+    assert parse_logger_map(None) == {}
+
+
+def test_request_id_header_round_trip(client):
+    response = client.get("/health", headers={"X-Request-ID": "client-supplied"})
+    assert response.headers["x-request-id"] == "client-supplied"
+
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
@@ -0,0 +1,49 @@
+"""
+Unit tests for the Prometheus metrics endpoint
+"""
+
+
+def _sample(body: str, name: str, **labels) -> float:
+    """Return the value of a metric sample matching all given labels"""
+    for line in body.splitlines():
+        if not line.startswith(name + "{"):
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_exposes_prometheus_format(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_request_duration_uses_route_template(client):
+    project_id = client.post("/api/v1/projects", json={"name": "Metrics"}).json()["id"]
+    client.post(f"/api/v1/projects/{project_id}/story", json={"story_text": "A story"})
+
+    body = client.get("/metrics").text
+    assert _sample(
+        body, "http_request_duration_seconds_count",
+        method="POST", route="/api/v1/projects/{project_id}/story", status="200",
+    ) >= 1
+    assert f"/api/v1/projects/{project_id}/story" not in body
+
+
+def test_generation_pipeline_metrics(client, ready_project, png_bytes):
+    before = client.get("/metrics").text
+    project_url = ready_project("Metrics")
+    assert client.post(f"{project_url}/generate").status_code == 200
+    after = client.get("/metrics").text
+
+    def delta(name, **labels):
+        return _sample(after, name, **labels) - _sample(before, name, **labels)
+
+    assert delta("gemini_request_duration_seconds_count", method="generate_final_images") == 3
+    assert delta("gemini_request_duration_seconds_count", method="generate_character_image") == 1
+    assert delta("image_bytes_saved_total", image_type="final") > 0
+    assert delta("image_bytes_saved_total", image_type="product") == len(png_bytes())
+    assert delta("db_query_duration_seconds_count", operation="INSERT") >= 8
+    assert "generation_queue_depth 0.0" in after
@@ -0,0 +1,72 @@
+"""
+Unit tests for the consolidated ASGI middleware
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.src.middleware import AppMiddleware, CORSPolicy
+
+
+def _client(origins, raise_server_exceptions=True) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {"ok": True}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(AppMiddleware, cors=CORSPolicy(origins), profiling=False)
+    return TestClient(app, raise_server_exceptions=raise_server_exceptions)
+
+
+def test_allowed_origin_is_echoed_with_credentials():
+    response = _client(["http://localhost:3000"]).get("/ok", headers={"Origin": "http://localhost:3000"})
+
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["vary"] == "Origin"
+
+
+def test_disallowed_origin_gets_no_cors_headers():
+    response = _client(["http://localhost:3000"]).get("/ok", headers={"Origin": "http://evil.example"})
+
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_wildcard_allows_any_origin():
+    response = _client(["*"]).get("/ok", headers={"Origin": "http://anywhere.example"})
+    assert response.headers["access-control-allow-origin"] == "http://anywhere.example"
+
+
+def test_preflight_is_answered_without_reaching_the_app():
+    response = _client(["http://localhost:3000"]).options("/ok", headers={
+        "Origin": "http://localhost:3000",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type, idempotency-key",
+    })
+
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-methods"] == "GET, POST, PUT, DELETE, OPTIONS"
+    assert response.headers["access-control-allow-headers"] == "content-type, idempotency-key"
+    assert response.headers["access-control-max-age"] == "86400"
+
+
+def test_preflight_rejects_unknown_origin_and_method():
+    client = _client(["http://localhost:3000"])
+    bad_origin = client.options("/ok", headers={"Origin": "http://evil.example", "Access-Control-Request-Method": "GET"})
+    bad_method = client.options("/ok", headers={"Origin": "http://localhost:3000", "Access-Control-Request-Method": "PATCH"})
+
+    assert bad_origin.status_code == 400
+    assert bad_method.status_code == 400
+
+
+def test_unhandled_error_returns_json_with_request_id():
+    response = _client(["*"], raise_server_exceptions=False).get("/boom", headers={"X-Request-ID": "req-42"})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Internal server error", "error_id": "req-42"}
+    assert response.headers["x-request-id"] == "req-42"
@@ -0,0 +1,78 @@
+"""
+Unit tests for generation preview frames and the preview broker
+"""
+import asyncio
+import base64
+import json
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from backend.src.services.previews import PreviewBroker, preview_broker, render_preview
+
+
+def test_render_preview_is_small_blurred_jpeg(png_bytes):
+    data = render_preview(png_bytes("red"), png_bytes((0, 255, 0, 128), mode="RGBA"), png_bytes("blue", (800, 600)), size=128)
+
+    preview = Image.open(BytesIO(data))
+    assert preview.format == "JPEG"
+    assert preview.size == (128, 96)
+
+
+def test_render_preview_skips_undecodable_inputs(png_bytes):
+    data = render_preview(b"mock_character_image_data", b"mock_product_image_data", png_bytes("blue", (96, 96)), size=64)
+    assert Image.open(BytesIO(data)).size == (64, 64)
+
+
+def test_broker_delivers_across_threads_and_drops_oldest():
+    broker = PreviewBroker(queue_size=2)
+
+    async def scenario():
+        queue = broker.subscribe("p1")
+        publisher = threading.Thread(target=lambda: [broker.publish("p1", {"n": n}) for n in range(3)])
+        publisher.start()
+        publisher.join()
+        await asyncio.sleep(0)
+        received = [queue.get_nowait() for _ in range(queue.qsize())]
+        broker.unsubscribe("p1", queue)
+        return received
+
+    assert asyncio.run(scenario()) == [{"n": 1}, {"n": 2}]
+    assert not broker.has_subscribers("p1")
+    # Publishing without subscribers is a no-op
+    broker.publish("p1", {"n": 3})
+
+
+def test_preview_stream_follows_generation(client, png_bytes):
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Preview"}).json()["id"]
+    project_id = project_url.rsplit("/", 1)[1]
+    client.post(f"{project_url}/character", json={"details": "A florist", "personality": "calm"})
+    client.post(f"{project_url}/product/upload", files={"image": ("p.png", png_bytes("yellow"), "image/png")})
+    client.post(f"{project_url}/background", json={"scene_details": "A market", "lighting": "noon"})
+    client.post(f"{project_url}/story", json={"story_text": "Flowers for everyone"})
+
+    result = {}
+    listener = threading.Thread(target=lambda: result.update(response=client.get(f"{project_url}/previews")))
+    listener.start()
+    deadline = time.monotonic() + 5
+    while not preview_broker.has_subscribers(project_id) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert client.post(f"{project_url}/generate").status_code == 200
+    listener.join(timeout=5)
+
+    response = result["response"]
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(block.split("data: ", 1)[1])
+        for block in response.text.split("\n\n") if "data: " in block
+    ]
+    assert [event["type"] for event in events] == ["preview", "image", "image", "image", "done"]
+    assert Image.open(BytesIO(base64.b64decode(events[0]["data"]))).format == "JPEG"
+    assert not preview_broker.has_subscribers(project_id)
+
+
+def test_preview_stream_unknown_project(client):
+    assert client.get("/api/v1/projects/missing/previews").status_code == 404
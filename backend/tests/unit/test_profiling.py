@@ -0,0 +1,109 @@
+"""
+Unit tests for the sampling profiler and per-request profiling hook
+"""
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.src.api.admin import router as admin_router
+from backend.src.middleware import AppMiddleware
+from backend.src.profiling import SamplingProfiler, run_in_threadpool
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def _busy_wait(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_app(profiling: bool) -> TestClient:
+    app = FastAPI()
+    app.include_router(admin_router, prefix="/api/v1")
+
+    @app.get("/work")
+    async def work():
+        _busy_wait(0.1)
+        return {"done": True}
+
+    @app.get("/offloaded")
+    async def offloaded():
+        await run_in_threadpool(_busy_wait, 0.1)
+        return {"done": True}
+
+    app.add_middleware(AppMiddleware, profiling=profiling)
+    return TestClient(app)
+
+
+def test_sampling_profiler_emits_folded_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    _busy_wait(0.1)
+    folded = profiler.stop()
+
+    assert profiler.samples > 0
+    lines = folded.splitlines()
+    assert any("test_profiling:_busy_wait" in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert ";" in stack or ":" in stack
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "secret")
+
+
+def test_request_profile_is_captured_and_retrievable(admin_token):
+    client = _profiled_app(profiling=True)
+
+    response = client.get("/work", headers={"X-Profile": "1", "X-Request-ID": "chosen-by-client", **ADMIN})
+    profile_id = response.headers["x-profile-id"]
+    assert profile_id != "chosen-by-client"
+
+    profile = client.get(f"/api/v1/admin/profiles/{profile_id}", headers=ADMIN)
+    assert profile.status_code == 200
+    assert "test_profiling:work" in profile.text
+    assert all(line.startswith(f"request:{profile_id};") for line in profile.text.splitlines())
+
+
+def test_threadpool_work_is_sampled(admin_token):
+    client = _profiled_app(profiling=True)
+
+    profile_id = client.get("/offloaded?profile=1", headers=ADMIN).headers["x-profile-id"]
+
+    profile = client.get(f"/api/v1/admin/profiles/{profile_id}", headers=ADMIN)
+    assert "test_profiling:_busy_wait" in profile.text
+
+
+def test_profile_query_flag_and_unprofiled_requests(admin_token):
+    client = _profiled_app(profiling=True)
+    assert "x-profile-id" in client.get("/work?profile=1", headers=ADMIN).headers
+    assert "x-profile-id" not in client.get("/work", headers=ADMIN).headers
+    assert "x-profile-id" not in client.get("/work?profile=1").headers
+
+
+def test_profiling_disabled_ignores_flag():
+    client = _profiled_app(profiling=False)
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "1"}).headers
+
+
+def test_profiling_without_token_fails_closed(monkeypatch):
+    monkeypatch.delenv("PROFILING_TOKEN", raising=False)
+    client = _profiled_app(profiling=True)
+
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "1"}).headers
+    assert client.get("/api/v1/admin/profile?seconds=0.05").status_code == 403
+
+
+def test_admin_profile_endpoint_requires_token(admin_token):
+    client = _profiled_app(profiling=True)
+
+    assert client.get("/api/v1/admin/profile?seconds=0.05").status_code == 403
+    response = client.get("/api/v1/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
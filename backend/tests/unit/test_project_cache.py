@@ -0,0 +1,63 @@
+"""
+Unit tests for the project snapshot cache
+"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from backend.src.database import get_project, get_story_text, get_character_image_url, save_character, save_project, save_story
+from backend.src.project_cache import ProjectCache, ProjectSnapshot, project_cache
+
+
+def _snapshot(project_id, name="Campaign") -> ProjectSnapshot:
+    now = datetime(2025, 1, 1)
+    return ProjectSnapshot(id=project_id, name=name, created_at=now, updated_at=now)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ProjectCache(max_entries=2)
+    for project_id in (1, 2):
+        cache.put(_snapshot(project_id), cache.version)
+    assert cache.get("1").id == 1
+    cache.put(_snapshot(3), cache.version)
+
+    assert len(cache) == 2
+    assert cache.get(2) is None
+    assert cache.get(1) and cache.get(3)
+
+
+def test_cache_drops_snapshots_loaded_before_an_invalidation():
+    cache = ProjectCache()
+    version = cache.version
+    cache.invalidate(1)
+    cache.put(_snapshot(1), version)
+    assert cache.get(1) is None
+
+
+def test_cache_entries_expire():
+    cache = ProjectCache(ttl_seconds=0)
+    cache.put(_snapshot(1), cache.version)
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_reads_are_served_from_cache_until_a_save(db_session_factory):
+    db = db_session_factory()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    project = save_project(db, "Campaign")
+    project_id = str(project.id)
+    save_story(db, project_id, "First draft")
+    assert get_story_text(db, project_id) == "First draft"
+
+    statements.clear()
+    assert get_project(db, project_id).name == "Campaign"
+    assert get_character_image_url(db, project_id) is None
+    assert get_story_text(db, project_id) == "First draft"
+    assert statements == []
+
+    save_character(db, project_id, "A chef", "calm", "/uploads/chef.png")
+    assert get_character_image_url(db, project_id) == "/uploads/chef.png"
+    assert len(project_cache) == 1
+    db.close()
@@ -0,0 +1,58 @@
+"""
+Unit tests for the near-duplicate prompt cache
+"""
+import pytest
+
+from backend.src.services.prompt_cache import SemanticPromptCache, cosine, embed, prompt_cache
+
+
+@pytest.fixture
+def cached_file(workdir):
+    path = workdir / "uploads" / "characters" / "a.png"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"png")
+    return "/uploads/characters/a.png"
+
+
+def test_embedding_similarity():
+    assert cosine(embed("a friendly barista in a cafe"), embed("friendly barista in a café")) > 0.95
+    assert cosine(embed("a friendly barista in a cafe"), embed("a grumpy mechanic in a garage")) < 0.5
+    assert embed("") == {}
+
+
+def test_near_duplicates_hit_and_other_inputs_miss(cached_file):
+    cache = SemanticPromptCache(threshold=0.85)
+    cache.store("character@v1", ("A friendly barista in a cafe", "warm"), cached_file)
+
+    assert cache.lookup("character@v1", ("friendly barista in a café", "Warm")) == cached_file
+    assert cache.lookup("character@v1", ("friendly barista in a caf", "warm")) == cached_file
+    # Every input must match, and namespaces (template versions) are separate
+    assert cache.lookup("character@v1", ("A friendly barista in a cafe", "cold")) is None
+    assert cache.lookup("character@v2", ("A friendly barista in a cafe", "warm")) is None
+    assert cache.lookup("character@v1", ("a friendly barista in a bakery", "warm")) is None
+
+
+def test_entries_are_bounded_and_dropped_when_file_is_gone(cached_file, workdir):
+    cache = SemanticPromptCache(max_entries=2)
+    for name in ("one", "two", "three"):
+        cache.store("background@v1", (f"scene {name}", "soft"), cached_file)
+    assert len(cache) == 2
+    assert cache.lookup("background@v1", ("scene one", "soft")) is None
+
+    (workdir / cached_file.lstrip("/")).unlink()
+    assert cache.lookup("background@v1", ("scene three", "soft")) is None
+    assert len(cache) == 1
+
+
+def test_character_generation_reuses_similar_prompt(client, monkeypatch):
+    monkeypatch.setenv("PROMPT_CACHE_ENABLED", "true")
+    prompt_cache.clear()
+    project_url = "/api/v1/projects/" + client.post("/api/v1/projects", json={"name": "Cache"}).json()["id"]
+
+    first = client.post(f"{project_url}/character", json={"details": "A friendly barista in a cafe", "personality": "warm"}).json()
+    second = client.post(f"{project_url}/character", json={"details": "friendly barista in a café", "personality": "Warm"}).json()
+    other = client.post(f"{project_url}/character", json={"details": "A grumpy mechanic", "personality": "warm"}).json()
+
+    assert second["image_url"] == first["image_url"]
+    assert other["image_url"] != first["image_url"]
+    prompt_cache.clear()
@@ -0,0 +1,48 @@
+"""
+Unit tests for prompt templates
+"""
+import pytest
+
+from backend.src.services.prompts import (
+    PromptTemplate, get_template, get_template_by_id, normalize_label, normalize_text, register,
+)
+
+
+def test_formatting_differences_render_identical_prompts():
+    template = get_template("character")
+    a = template.render(details="a  young barista\n with tattoos.", personality="Warm, Friendly ")
+    b = template.render(details="A young barista with tattoos", personality="warm, friendly")
+    assert a == b
+    assert "Create a photorealistic image of a character: A young barista with tattoos. Personality: warm, friendly." in a
+
+
+def test_text_keeps_inner_casing_labels_are_casefolded():
+    assert normalize_text("  the ACME ｂｏｔｔｌｅ ") == "The ACME bottle"
+    assert normalize_label("Dramatic  Storytelling Scene") == "dramatic storytelling scene"
+
+
+def test_presets_are_compiled_once_and_render_like_the_parent():
+    template = get_template("fusion")
+    preset = template.preset(style="Dramatic storytelling scene")
+
+    assert template.preset(style="dramatic   storytelling scene") is preset
+    assert preset.id == template.id == "fusion@v1"
+    assert preset.fields == {"story"}
+    assert preset.render(story="Bread.") == template.render(story="Bread", style="dramatic storytelling scene")
+
+
+def test_missing_fields_and_bad_placeholders_are_rejected():
+    with pytest.raises(KeyError):
+        get_template("background").render(scene_details="A beach")
+    with pytest.raises(ValueError):
+        PromptTemplate("bad", 1, "Width {width:>10}")
+
+
+def test_versions_are_immutable_and_latest_wins():
+    register(PromptTemplate("test-versions", 1, "Old {x}"))
+    register(PromptTemplate("test-versions", 2, "New {x}"))
+
+    assert get_template("test-versions").render(x="y") == "New Y"
+    assert get_template_by_id("test-versions@v1").render(x="y") == "Old Y"
+    with pytest.raises(ValueError):
+        register(PromptTemplate("test-versions", 2, "Changed {x}"))
@@ -0,0 +1,74 @@
+"""
+Unit tests for project and image read endpoints
+"""
+from backend.src.database import save_image
+
+
+def _project(client, name="Campaign") -> str:
+    return client.post("/api/v1/projects", json={"name": name}).json()["id"]
+
+
+def test_list_projects_pages_newest_first(client):
+    ids = [_project(client, f"Project {i}") for i in range(5)]
+
+    first = client.get("/api/v1/projects", params={"limit": 2}).json()
+    assert [item["id"] for item in first["items"]] == ids[::-1][:2]
+    second = client.get("/api/v1/projects", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    third = client.get("/api/v1/projects", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+
+    seen = [item["id"] for page in (first, second, third) for item in page["items"]]
+    assert seen == ids[::-1]
+    assert third["next_cursor"] is None
+
+
+def test_list_projects_rejects_bad_input(client):
+    assert client.get("/api/v1/projects", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/v1/projects", params={"limit": 0}).status_code == 422
+
+
+def test_project_detail_summarizes_components(client):
+    project_id = _project(client)
+    client.post(f"/api/v1/projects/{project_id}/character", json={"details": "A chef", "personality": "calm"})
+    client.post(f"/api/v1/projects/{project_id}/story", json={"story_text": "Dinner service"})
+
+    body = client.get(f"/api/v1/projects/{project_id}").json()
+    assert body["name"] == "Campaign"
+    assert body["character"]["image_url"]
+    assert body["product"] is None
+    assert body["story_text"] == "Dinner service"
+    assert body["image_count"] == 0
+    assert client.get("/api/v1/projects/9999").status_code == 404
+
+
+def test_list_images_selects_fields(client, db_session_factory):
+    project_id = _project(client)
+    db = db_session_factory()
+    for i in range(3):
+        save_image(db, project_id, f"/uploads/{i}.png", "A long prompt " * 50, "final", "cinematic")
+    db.close()
+
+    url = f"/api/v1/projects/{project_id}/images"
+    default = client.get(url).json()["items"]
+    assert len(default) == 3
+    assert "prompt" not in default[0] and default[0]["image_url"] == "/uploads/2.png"
+
+    slim = client.get(url, params={"fields": "id,image_url", "limit": 2}).json()
+    assert [set(item) for item in slim["items"]] == [{"id", "image_url"}] * 2
+    rest = client.get(url, params={"fields": "id,image_url", "cursor": slim["next_cursor"]}).json()
+    assert [item["image_url"] for item in rest["items"]] == ["/uploads/0.png"]
+
+    assert client.get(url, params={"fields": "prompt"}).json()["items"][0]["prompt"].startswith("A long prompt")
+    assert client.get(url, params={"image_type": "character"}).json()["items"] == []
+    assert client.get(url, params={"fields": "id,secret"}).status_code == 422
+
+
+def test_image_detail(client, db_session_factory):
+    project_id = _project(client)
+    db = db_session_factory()
+    image = save_image(db, project_id, "/uploads/a.png", "Prompt", "final", prompt_template_id="fusion@v1")
+    image_id = str(image.id)
+    db.close()
+
+    body = client.get(f"/api/v1/projects/{project_id}/images/{image_id}").json()
+    assert (body["prompt"], body["prompt_template_id"]) == ("Prompt", "fusion@v1")
+    assert client.get(f"/api/v1/projects/{_project(client)}/images/{image_id}").status_code == 404
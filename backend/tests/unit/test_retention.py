@@ -0,0 +1,133 @@
+"""
+Unit tests for image retention tiers
+"""
+from datetime import timedelta
+
+from PIL import Image as PILImage
+
+from backend.src.database import save_image, save_project
+from backend.src.models.base import utcnow
+from backend.src.models.image import Image
+from backend.src.services import retention
+from backend.src.services.retention import ARCHIVED, DOWNSCALED, apply_retention
+from backend.src.services.storage_gc import collect_garbage
+
+
+def _final_image(db, root, project_id, name, size=1024):
+    path = root / "final" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    PILImage.effect_noise((size, size), 64).convert("RGB").save(path, format="PNG")
+    return save_image(db, project_id, f"/uploads/final/{name}", "Prompt", "final")
+
+
+def _age(db, days, **columns):
+    past = utcnow() - timedelta(days=days)
+    db.query(Image).update({getattr(Image, column): past for column in columns}, synchronize_session=False)
+    db.commit()
+
+
+def test_unselected_images_step_down_and_restore_on_access(client, workdir, db_session_factory):
+    uploads = workdir / "uploads"
+    db = db_session_factory()
+    project_id = str(save_project(db, "Campaign").id)
+    chosen = _final_image(db, uploads, project_id, "chosen.png")
+    other = _final_image(db, uploads, project_id, "other.png")
+    chosen_id, other_id = str(chosen.id), str(other.id)
+    original_size = (uploads / "final" / "other.png").stat().st_size
+
+    assert client.post(f"/api/v1/projects/{project_id}/images/{chosen_id}/select").json()["selected"] is True
+
+    # Nothing is due yet
+    assert apply_retention(db, uploads) == (0, 0, 0)
+
+    _age(db, 10, created_at=True)
+    report = apply_retention(db, uploads, downscale_days=7, max_size=256)
+    assert (report.downscaled, report.archived) == (1, 0)
+    assert (uploads / "final" / "other.png").stat().st_size < original_size
+    with PILImage.open(uploads / "final" / "chosen.png") as image:
+        assert image.size == (1024, 1024)
+
+    _age(db, 40, updated_at=True)
+    report = apply_retention(db, uploads, archive_days=30, max_size=256)
+    assert report.archived == 1
+    assert not (uploads / "final" / "other.png").exists()
+    db.expire_all()
+    archived = db.get(Image, int(other_id))
+    assert archived.retention_tier == ARCHIVED and archived.archive_url.startswith("/uploads/archive/")
+
+    # The pack is referenced, so the reaper keeps it
+    collect_garbage(db, uploads, grace_seconds=0, pause_seconds=0)
+    assert (uploads / archived.archive_url[len("/uploads/"):]).exists()
+
+    response = client.get("/uploads/final/other.png")
+    assert response.status_code == 200
+    with PILImage.open(uploads / "final" / "other.png") as image:
+        assert max(image.size) == 256
+    db.expire_all()
+    restored = db.get(Image, int(other_id))
+    assert (restored.retention_tier, restored.archive_url) == (DOWNSCALED, None)
+    assert client.get("/uploads/final/missing.png").status_code == 404
+    db.close()
+
+
+def test_shared_and_placeholder_files_are_left_alone(workdir, db_session_factory):
+    uploads = workdir / "uploads"
+    placeholder = uploads / "mock-images" / "placeholder.png"
+    placeholder.parent.mkdir(parents=True)
+    PILImage.effect_noise((1024, 1024), 64).convert("RGB").save(placeholder, format="PNG")
+    placeholder_size = placeholder.stat().st_size
+    db = db_session_factory()
+    project_id = str(save_project(db, "Campaign").id)
+    # Failed fusions store the shared placeholder as a final image
+    save_image(db, project_id, "/uploads/mock-images/placeholder.png", "Prompt", "final")
+    save_image(db, project_id, "/uploads/mock-images/placeholder.png", "Prompt", "final")
+    shared = _final_image(db, uploads, project_id, "shared.png")
+    save_image(db, project_id, shared.image_url, "Prompt", "final")
+
+    _age(db, 10, created_at=True)
+    assert apply_retention(db, uploads, downscale_days=7, max_size=256).downscaled == 0
+    _age(db, 40, created_at=True, updated_at=True)
+    assert apply_retention(db, uploads, archive_days=30, max_size=256) == (0, 0, 0)
+
+    assert placeholder.stat().st_size == placeholder_size
+    with PILImage.open(uploads / "final" / "shared.png") as image:
+        assert image.size == (1024, 1024)
+    assert not (uploads / "archive").exists()
+    assert all(image.retention_tier is None for image in db.query(Image))
+    db.close()
+
+
+def test_select_endpoints(client, db_session_factory):
+    db = db_session_factory()
+    project_id = str(save_project(db, "Campaign").id)
+    image_id = str(save_image(db, project_id, "/uploads/final/a.png", "Prompt", "final").id)
+    db.close()
+
+    url = f"/api/v1/projects/{project_id}/images/{image_id}/select"
+    assert client.post(url).json()["selected"] is True
+    listed = client.get(f"/api/v1/projects/{project_id}/images").json()["items"][0]
+    assert listed["selected_at"] and listed["retention_tier"] is None
+    assert client.delete(url).json()["selected"] is False
+    assert client.post(f"/api/v1/projects/{project_id}/images/9999/select").status_code == 404
+
+
+def test_restore_lookup_only_for_retained_paths_and_races(client, workdir, monkeypatch):
+    lookups = []
+
+    def concurrent_winner(db, image_url, root):
+        # Another request extracted the file and moved the row out of the archive
+        lookups.append(image_url)
+        (root / "final").mkdir(exist_ok=True)
+        (root / "final" / "raced.png").write_bytes(b"restored")
+        return False
+
+    monkeypatch.setattr(retention, "restore_url", concurrent_winner)
+
+    assert client.get("/uploads/wp-login.php").status_code == 404
+    assert client.get("/uploads/products/typo.png").status_code == 404
+    assert lookups == []
+
+    response = client.get("/uploads/final/raced.png")
+    assert response.status_code == 200
+    assert response.content == b"restored"
+    assert lookups == ["/uploads/final/raced.png"]
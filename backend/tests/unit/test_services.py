@@ -9,7 +9,7 @@ from unittest.mock import Mock, patch
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
 
-from services.gemini_service import GeminiService
+from backend.src.services.gemini_service import GeminiService
 
 class TestGeminiService:
     """Test cases for GeminiService"""
@@ -0,0 +1,48 @@
+"""
+Unit tests for the orphaned upload reaper
+"""
+import os
+import time
+
+from backend.src.database import save_character, save_image, save_product, save_project
+from backend.src.services.storage_gc import collect_garbage, url_columns
+
+
+def _file(root, relative, age_seconds=7200, size=100):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_url_columns_cover_every_table():
+    names = {f"{column.table.name}.{column.name}" for column in url_columns()}
+    assert {"images.image_url", "characters.image_url", "products.cutout_url", "backgrounds.image_url"} <= names
+
+
+def test_deletes_only_old_unreferenced_files(workdir, db_session_factory):
+    uploads = workdir / "uploads"
+    db = db_session_factory()
+    project_id = save_project(db, "Campaign").id
+    save_character(db, project_id, "A chef", "calm", image_url="/uploads/characters/kept.png")
+    save_product(db, project_id, image_url="/uploads/products/p.jpg", cutout_url="/uploads/products/p.cutout.png")
+    save_image(db, project_id, "/uploads/final/kept.png", "Prompt", "final")
+
+    kept = [_file(uploads, name) for name in (
+        "characters/kept.png", "products/p.jpg", "products/p.cutout.png", "final/kept.png",
+        "mock-images/placeholder.png",
+    )]
+    fresh = _file(uploads, "final/in-flight.png", age_seconds=10)
+    orphans = [_file(uploads, "final/failed.png", size=300), _file(uploads, "characters/old.png", size=200)]
+
+    dry_run = collect_garbage(db, uploads, dry_run=True, grace_seconds=3600, batch_size=1, pause_seconds=0)
+    assert (dry_run.orphaned, dry_run.deleted, dry_run.bytes_reclaimed) == (2, 2, 500)
+    assert all(path.exists() for path in orphans)
+
+    report = collect_garbage(db, uploads, grace_seconds=3600, batch_size=1, pause_seconds=0)
+    assert (report.deleted, report.bytes_reclaimed, report.errors) == (2, 500, 0)
+    assert not any(path.exists() for path in orphans)
+    assert all(path.exists() for path in kept + [fresh])
+    db.close()
@@ -0,0 +1,66 @@
+"""
+Unit tests for OpenTelemetry tracing instrumentation
+"""
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from backend.src import tracing
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tracer_provider():
+    """Route spans to an in-memory exporter (the global provider can only be set once)"""
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(_exporter))
+    trace.set_tracer_provider(provider)
+    yield provider
+
+
+@pytest.fixture
+def spans():
+    _exporter.clear()
+    return _exporter
+
+
+def test_generate_request_spans_cover_each_stage(client, spans, ready_project):
+    project_url = ready_project("Traced")
+    spans.clear()
+
+    assert client.post(f"{project_url}/generate").status_code == 200
+
+    finished = spans.get_finished_spans()
+    names = [span.name for span in finished]
+    server = next(span for span in finished if span.name == "POST /api/v1/projects/{project_id}/generate")
+    assert server.attributes["http.status_code"] == 200
+
+    assert "db.get_project" in names
+    assert "db.load_components" in names
+    assert names.count("storage.read_image") == 3
+    assert "image.decode" in names
+    assert names.count("gemini.generate_content") == 3
+    assert names.count("storage.save_image") == 3
+    assert names.count("db.save_image") == 3
+    assert "db.select" in names and "db.insert" in names
+
+    # Every stage belongs to the request's trace
+    assert {span.context.trace_id for span in finished} == {server.context.trace_id}
+
+
+def test_incoming_trace_context_is_continued(client, spans):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    client.get("/health", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+
+    server = next(span for span in spans.get_finished_spans() if span.name == "GET /health")
+    assert format(server.context.trace_id, "032x") == trace_id
+
+
+def test_setup_tracing_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("OTEL_TRACES_EXPORTER", raising=False)
+    before = trace.get_tracer_provider()
+    tracing.setup_tracing()
+    assert trace.get_tracer_provider() is before
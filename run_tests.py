@@ -7,7 +7,11 @@ import subprocess
 import os
 from pathlib import Path
 
-def run_tests(test_type="all", coverage=True):
+BENCHMARK_BASELINES = Path("backend/tests/benchmarks/.baselines")
+BENCHMARK_STORAGE = f"file://{BENCHMARK_BASELINES}"
+BENCHMARK_THRESHOLD = os.getenv("BENCHMARK_THRESHOLD", "20%")
+
+def run_tests(test_type="all", coverage=True, save_baseline=False):
     """Run tests with specified configuration"""
 
     # Get the project root directory
@@ -28,6 +32,22 @@ def run_tests(test_type="all", coverage=True):
     elif test_type == "contract":
         cmd.append("backend/tests/contract/")
         cmd.append("-m contract")
+    elif test_type == "benchmark":
+        # Benchmarks are timing-sensitive, never run them under coverage
+        coverage = False
+        cmd.append("backend/tests/benchmarks/")
+        cmd.extend(["--benchmark-only", f"--benchmark-storage={BENCHMARK_STORAGE}"])
+        if save_baseline:
+            cmd.append("--benchmark-autosave")
+        else:
+            # Baselines are machine specific and not committed; without one,
+            # pytest-benchmark only warns and the regression gate never fires
+            if not any(BENCHMARK_BASELINES.glob("*/*.json")):
+                print(f"❌ No benchmark baseline in {BENCHMARK_BASELINES}/ to compare against.")
+                print("   Record one on this machine first: python run_tests.py benchmark --save-baseline")
+                return False
+            # Compare against the latest saved baseline and fail on regressions
+            cmd.extend(["--benchmark-compare", f"--benchmark-compare-fail=mean:{BENCHMARK_THRESHOLD}"])
     else:
         # Run all tests
         cmd.append("backend/tests/")
@@ -66,8 +86,8 @@ def main():
     """Main entry point"""
     if len(sys.argv) > 1:
         test_type = sys.argv[1]
-        if test_type not in ["unit", "integration", "contract", "all"]:
-            print("Usage: python run_tests.py [unit|integration|contract|all]")
+        if test_type not in ["unit", "integration", "contract", "benchmark", "all"]:
+            print("Usage: python run_tests.py [unit|integration|contract|benchmark|all] [--no-cov] [--save-baseline]")
             print("Default: all")
             sys.exit(1)
     else:
@@ -76,7 +96,10 @@ def main():
     # Check if coverage should be enabled
     coverage = "--no-cov" not in sys.argv
 
-    success = run_tests(test_type, coverage)
+    # Record a new benchmark baseline instead of comparing against the last one
+    save_baseline = "--save-baseline" in sys.argv
+
+    success = run_tests(test_type, coverage, save_baseline)
 
     if not success:
         sys.exit(1)